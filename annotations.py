@@ -0,0 +1,149 @@
+"""标注导出
+
+生成器在绘制时已经知道每个字段的取值、项目代码、状态和像素包围盒，
+这里把它们批量写成 JSONL（每行一份报告）或 COCO 格式，省去事后再跑 OCR 还原标签。
+
+多进程生成时每个区间先写自己的分片文件 annotations.part-<起始序号>.jsonl，
+全部完成后由 merge_annotation_parts 按序号合并。
+"""
+import contextlib
+import glob
+import json
+import os
+import uuid
+
+ANNOTATION_FORMATS = ("jsonl", "coco")
+
+# COCO 类别：按文字框类型划分
+COCO_CATEGORIES = ("title", "header", "label", "value", "text", "item_code", "item_name",
+                   "unit", "reference", "result", "flag")
+
+
+class JsonlWriter:
+    """带缓冲的 JSONL 写入器，积累 buffer_size 条后一次性写盘
+
+    先写同目录的临时文件，关闭时原子替换为 path：同一区间被两个进程重做时不会互相截断。
+    """
+
+    def __init__(self, path, buffer_size=256):
+        self.path = path
+        self.buffer_size = buffer_size
+        self._buffer = []
+        self._tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        self._file = open(self._tmp_path, "w", encoding="utf-8")
+
+    def write(self, record):
+        self._buffer.append(json.dumps(record, ensure_ascii=False))
+        if len(self._buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        if self._buffer:
+            self._file.write("\n".join(self._buffer) + "\n")
+            self._buffer.clear()
+
+    def close(self):
+        if self._file.closed:
+            return
+        self.flush()
+        self._file.close()
+        os.replace(self._tmp_path, self.path)
+
+    def discard(self):
+        """放弃写了一半的标注分片：关闭并删除临时文件，path 保持原样"""
+        if self._file.closed:
+            return
+        self._buffer.clear()
+        self._file.close()
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(self._tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+
+def annotation_record(truth, file_name):
+    """单份报告的标注记录：标注内容 + 对应的图片文件名"""
+    return dict(truth, file_name=file_name)
+
+
+def part_path(output_dir, start):
+    return os.path.join(output_dir, f"annotations.part-{start:09d}.jsonl")
+
+
+def _part_paths(output_dir):
+    return sorted(glob.glob(os.path.join(output_dir, "annotations.part-*.jsonl")))
+
+
+def _remove_stale_temps(output_dir):
+    """删除崩溃的进程没来得及替换的临时标注分片"""
+    for path in glob.glob(os.path.join(output_dir, "annotations.part-*.jsonl.*.tmp")):
+        os.remove(path)
+
+
+def clear_annotation_parts(output_dir):
+    """删除上次运行残留的标注分片"""
+    for path in _part_paths(output_dir):
+        os.remove(path)
+    _remove_stale_temps(output_dir)
+
+
+def _iter_part_records(paths):
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def to_coco(records):
+    """把标注记录转换为 COCO 字典（bbox 为 [x, y, 宽, 高]）"""
+    categories = [{"id": i, "name": name} for i, name in enumerate(COCO_CATEGORIES, 1)]
+    category_ids = {name: i for i, name in enumerate(COCO_CATEGORIES, 1)}
+    images, annotations = [], []
+    for image_id, record in enumerate(records, 1):
+        images.append({"id": image_id, "file_name": record["file_name"],
+                       "width": record["image"]["width"], "height": record["image"]["height"],
+                       "index": record["index"]})
+        for box in record["annotations"]:
+            x0, y0, x1, y1 = box["bbox"]
+            attributes = {k: v for k, v in box.items() if k not in ("kind", "bbox")}
+            annotations.append({
+                "id": len(annotations) + 1,
+                "image_id": image_id,
+                "category_id": category_ids[box["kind"]],
+                "bbox": [x0, y0, x1 - x0, y1 - y0],
+                "area": (x1 - x0) * (y1 - y0),
+                "iscrowd": 0,
+                "attributes": attributes,
+            })
+    return {"images": images, "annotations": annotations, "categories": categories}
+
+
+def merge_annotation_parts(output_dir, annotation_format="jsonl"):
+    """按序号合并各区间的标注分片，返回最终文件路径"""
+    if annotation_format not in ANNOTATION_FORMATS:
+        raise ValueError(f"未知的标注格式: {annotation_format}")
+    parts = _part_paths(output_dir)
+
+    if annotation_format == "jsonl":
+        out_path = os.path.join(output_dir, "annotations.jsonl")
+        with open(out_path, "w", encoding="utf-8") as out:
+            for path in parts:
+                with open(path, encoding="utf-8") as f:
+                    out.write(f.read())
+    else:
+        out_path = os.path.join(output_dir, "annotations.coco.json")
+        with open(out_path, "w", encoding="utf-8") as out:
+            json.dump(to_coco(_iter_part_records(parts)), out, ensure_ascii=False)
+
+    for path in parts:
+        os.remove(path)
+    _remove_stale_temps(output_dir)
+    return out_path
@@ -0,0 +1,356 @@
+"""扫描效果增强（旋转、模糊、噪声、JPEG 压缩痕迹、纸张纹理）
+
+原来这些效果由单独的脚本对已保存的 PNG 再处理一遍，每份样本多一次解码和编码。
+这里作为生成器的可选阶段，在同一个工作进程里紧接着绘制执行：画布转为 float32 的 NumPy 数组，
+各效果都是整幅数组上的向量化运算（没有逐像素的 Python 循环），最后再转回 PIL 图片交给编码器。
+
+每份报告的效果参数由报告种子决定（与数值、元数据使用不同的随机数流），同一 seed 下结果可复现。
+旋转会同步变换标注中的包围盒，实际使用的参数记录在标注的 "augment" 字段中。
+
+用法：
+    pipeline = AugmentPipeline([Rotate(1.5), PaperTexture(), GaussianBlur(), GaussianNoise(), JpegArtifacts()])
+    generator = BloodReportGenerator(augment=pipeline)      # 或 augment=scan_pipeline()
+"""
+import math
+
+import numpy as np
+from PIL import Image
+
+# 与数值、元数据使用不同的随机数流
+_STREAM = 0x41554731
+
+
+def _uniform(rng, value):
+    """value 为 (low, high) 时在区间内均匀取值，否则原样返回"""
+    if isinstance(value, (tuple, list)):
+        return float(rng.uniform(value[0], value[1]))
+    return float(value)
+
+
+class Augmentation:
+    """单个效果：sample 抽取参数，apply 作用于 float32 数组（H×W 或 H×W×3，取值 0~255）
+
+    probability 为每份报告应用该效果的概率。几何变换还需实现 transform_box。
+    """
+
+    name = "augmentation"
+
+    def __init__(self, probability=1.0):
+        self.probability = probability
+
+    def sample(self, rng, shape):
+        return {}
+
+    def apply(self, array, params):
+        raise NotImplementedError
+
+    def transform_box(self, box, params, shape):
+        """变换标注包围盒 [x0, y0, x1, y1]；不改变几何的效果原样返回"""
+        return box
+
+    def _args(self):
+        return {}
+
+    def __repr__(self):
+        args = ", ".join(f"{key}={value!r}" for key, value in dict(self._args(), probability=self.probability).items())
+        return f"{type(self).__name__}({args})"
+
+
+class Rotate(Augmentation):
+    """绕画布中心小角度旋转（模拟扫描歪斜），双线性插值，移出画布的区域填白"""
+
+    name = "rotate"
+
+    def __init__(self, max_degrees=1.5, fill=255.0, probability=1.0):
+        super().__init__(probability)
+        self.max_degrees = max_degrees
+        self.fill = fill
+
+    def _args(self):
+        return {"max_degrees": self.max_degrees, "fill": self.fill}
+
+    def sample(self, rng, shape):
+        return {"degrees": float(rng.uniform(-self.max_degrees, self.max_degrees))}
+
+    def apply(self, array, params):
+        height, width = array.shape[:2]
+        theta = math.radians(params["degrees"])
+        cos, sin = np.float32(math.cos(theta)), np.float32(math.sin(theta))
+        cx, cy = (width - 1) / 2, (height - 1) / 2
+        xs = np.arange(width, dtype=np.float32) - np.float32(cx)
+        ys = np.arange(height, dtype=np.float32) - np.float32(cy)
+        # 输出像素 (x, y) 取自原图的 (sx, sy)（逆时针旋转的逆映射）
+        sx = xs[None, :] * cos - ys[:, None] * sin + np.float32(cx)
+        sy = xs[None, :] * sin + ys[:, None] * cos + np.float32(cy)
+        x0 = np.floor(sx)
+        y0 = np.floor(sy)
+        fx = sx - x0
+        fy = sy - y0
+        index_type = np.int32 if height * width < 2 ** 31 else np.int64
+        x0 = x0.astype(index_type)
+        y0 = y0.astype(index_type)
+        inside = (x0 >= 0) & (x0 < width - 1) & (y0 >= 0) & (y0 < height - 1)
+        index = np.where(inside, y0 * width + x0, 0)
+
+        # 按 (H×W, 通道) 展平后四邻域取值，灰度图也当作单通道处理
+        flat = array.reshape(height * width, -1)
+        fx, fy = fx[..., None], fy[..., None]
+        top = flat.take(index, axis=0) * (1 - fx) + flat.take(index + 1, axis=0) * fx
+        bottom = flat.take(index + width, axis=0) * (1 - fx) + flat.take(index + width + 1, axis=0) * fx
+        result = np.where(inside[..., None], top * (1 - fy) + bottom * fy, np.float32(self.fill))
+        return result.reshape(array.shape)
+
+    def transform_box(self, box, params, shape):
+        height, width = shape[:2]
+        theta = math.radians(params["degrees"])
+        cos, sin = math.cos(theta), math.sin(theta)
+        cx, cy = (width - 1) / 2, (height - 1) / 2
+        x0, y0, x1, y1 = box
+        xs, ys = [], []
+        for x, y in ((x0, y0), (x1, y0), (x1, y1), (x0, y1)):
+            dx, dy = x - cx, y - cy
+            xs.append(cx + dx * cos + dy * sin)
+            ys.append(cy - dx * sin + dy * cos)
+        return [round(min(xs), 2), round(min(ys), 2), round(max(xs), 2), round(max(ys), 2)]
+
+
+class GaussianBlur(Augmentation):
+    """可分离高斯模糊（模拟失焦），sigma 为像素"""
+
+    name = "blur"
+
+    def __init__(self, sigma=(0.3, 1.0), probability=1.0):
+        super().__init__(probability)
+        self.sigma = sigma
+
+    def _args(self):
+        return {"sigma": self.sigma}
+
+    def sample(self, rng, shape):
+        return {"sigma": _uniform(rng, self.sigma)}
+
+    def apply(self, array, params):
+        sigma = params["sigma"]
+        radius = max(1, int(math.ceil(3 * sigma)))
+        offsets = np.arange(-radius, radius + 1)
+        kernel = np.exp(-0.5 * (offsets / sigma) ** 2)
+        kernel = (kernel / kernel.sum()).astype(np.float32)
+        for axis in (0, 1):
+            pad = [(0, 0)] * array.ndim
+            pad[axis] = (radius, radius)
+            padded = np.pad(array, pad, mode="edge")
+            size = array.shape[axis]
+            result = np.zeros_like(array)
+            for offset, weight in enumerate(kernel):
+                window = [slice(None)] * array.ndim
+                window[axis] = slice(offset, offset + size)
+                result += weight * padded[tuple(window)]
+            array = result
+        return array
+
+
+class GaussianNoise(Augmentation):
+    """加性高斯噪声（模拟传感器噪声），sigma 为灰度级
+
+    monochrome=True 时各通道共用同一幅亮度噪声（扫描件的常见情况，RGB 下也只需生成三分之一的随机数）。
+    """
+
+    name = "noise"
+
+    def __init__(self, sigma=(2.0, 6.0), monochrome=True, probability=1.0):
+        super().__init__(probability)
+        self.sigma = sigma
+        self.monochrome = monochrome
+
+    def _args(self):
+        return {"sigma": self.sigma, "monochrome": self.monochrome}
+
+    def sample(self, rng, shape):
+        return {"sigma": _uniform(rng, self.sigma), "seed": int(rng.integers(2 ** 63))}
+
+    def apply(self, array, params):
+        shape = array.shape[:2] if self.monochrome else array.shape
+        noise = np.random.default_rng(params["seed"]).standard_normal(shape, dtype=np.float32)
+        noise *= np.float32(params["sigma"])
+        array += noise[..., None] if array.ndim == 3 and self.monochrome else noise
+        return array
+
+
+class PaperTexture(Augmentation):
+    """纸张纹理：低频的明暗起伏 + 细颗粒，按乘法作用（白底变暗、黑字基本不变），RGB 时略微偏黄"""
+
+    name = "paper"
+
+    def __init__(self, strength=(0.03, 0.08), grain=0.03, scale=64, tint=(1.0, 0.985, 0.95), probability=1.0):
+        super().__init__(probability)
+        self.strength = strength
+        self.grain = grain
+        self.scale = scale
+        self.tint = tint
+
+    def _args(self):
+        return {"strength": self.strength, "grain": self.grain, "scale": self.scale, "tint": self.tint}
+
+    def sample(self, rng, shape):
+        return {"strength": _uniform(rng, self.strength), "seed": int(rng.integers(2 ** 63))}
+
+    def apply(self, array, params):
+        height, width = array.shape[:2]
+        rng = np.random.default_rng(params["seed"])
+        coarse = rng.random((height // self.scale + 2, width // self.scale + 2), dtype=np.float32)
+        # 粗网格按行、列两次线性插值放大到画布尺寸
+        y = np.arange(height, dtype=np.float32) / self.scale
+        x = np.arange(width, dtype=np.float32) / self.scale
+        y0, x0 = y.astype(np.int64), x.astype(np.int64)
+        fy, fx = (y - y0)[:, None], (x - x0)[None, :]
+        rows = coarse[y0] * (1 - fy) + coarse[y0 + 1] * fy
+        texture = rows[:, x0] * (1 - fx) + rows[:, x0 + 1] * fx
+        texture = texture * np.float32(params["strength"])
+        if self.grain:
+            texture += rng.random((height, width), dtype=np.float32) * np.float32(self.grain)
+        factor = 1 - texture
+        if array.ndim == 3:
+            array *= factor[..., None] * np.asarray(self.tint, dtype=np.float32)
+        else:
+            array *= factor
+        return array
+
+
+# IJG 标准量化表（质量 50）
+_LUMA_TABLE = np.array([
+    16, 11, 10, 16, 24, 40, 51, 61, 12, 12, 14, 19, 26, 58, 60, 55,
+    14, 13, 16, 24, 40, 57, 69, 56, 14, 17, 22, 29, 51, 87, 80, 62,
+    18, 22, 37, 56, 68, 109, 103, 77, 24, 35, 55, 64, 81, 104, 113, 92,
+    49, 64, 78, 87, 103, 121, 120, 101, 72, 92, 95, 98, 112, 100, 103, 99], dtype=np.float32).reshape(8, 8)
+_CHROMA_TABLE = np.array([
+    17, 18, 24, 47, 99, 99, 99, 99, 18, 21, 26, 66, 99, 99, 99, 99,
+    24, 26, 56, 99, 99, 99, 99, 99, 47, 66, 99, 99, 99, 99, 99, 99,
+    99, 99, 99, 99, 99, 99, 99, 99, 99, 99, 99, 99, 99, 99, 99, 99,
+    99, 99, 99, 99, 99, 99, 99, 99, 99, 99, 99, 99, 99, 99, 99, 99], dtype=np.float32).reshape(8, 8)
+
+
+def _dct_matrix():
+    k = np.arange(8)[:, None]
+    n = np.arange(8)[None, :]
+    matrix = np.cos((2 * n + 1) * k * np.pi / 16) * np.sqrt(2 / 8)
+    matrix[0] /= np.sqrt(2)
+    return matrix.astype(np.float32)
+
+
+_DCT = _dct_matrix()
+
+
+def _quality_table(table, quality):
+    scale = 5000 / quality if quality < 50 else 200 - 2 * quality
+    return np.clip(np.floor((table * scale + 50) / 100), 1, 255).astype(np.float32)
+
+
+def _dct_quantize(plane, table):
+    """8×8 分块 DCT → 量化 → 反变换（整幅平面一次完成）"""
+    height, width = plane.shape
+    padded = np.pad(plane, ((0, -height % 8), (0, -width % 8)), mode="edge") - 128
+    blocks = padded.reshape(padded.shape[0] // 8, 8, padded.shape[1] // 8, 8).transpose(0, 2, 1, 3)
+    coefficients = _DCT @ blocks @ _DCT.T
+    coefficients = np.round(coefficients / table) * table
+    restored = (_DCT.T @ coefficients @ _DCT).transpose(0, 2, 1, 3).reshape(padded.shape) + 128
+    return restored[:height, :width]
+
+
+class JpegArtifacts(Augmentation):
+    """JPEG 压缩痕迹：在数组上直接做分块 DCT 量化（RGB 时转 YCbCr 并对色度 2×2 下采样），不经过编解码"""
+
+    name = "jpeg"
+
+    def __init__(self, quality=(30, 80), probability=1.0):
+        super().__init__(probability)
+        self.quality = quality
+
+    def _args(self):
+        return {"quality": self.quality}
+
+    def sample(self, rng, shape):
+        if isinstance(self.quality, (tuple, list)):
+            return {"quality": int(rng.integers(self.quality[0], self.quality[1] + 1))}
+        return {"quality": int(self.quality)}
+
+    def apply(self, array, params):
+        quality = min(100, max(1, params["quality"]))
+        luma_table = _quality_table(_LUMA_TABLE, quality)
+        if array.ndim == 2:
+            return _dct_quantize(array, luma_table)
+        chroma_table = _quality_table(_CHROMA_TABLE, quality)
+        r, g, b = array[..., 0], array[..., 1], array[..., 2]
+        y = 0.299 * r + 0.587 * g + 0.114 * b
+        cb = -0.168736 * r - 0.331264 * g + 0.5 * b
+        cr = 0.5 * r - 0.418688 * g - 0.081312 * b
+        height, width = y.shape
+        y = _dct_quantize(y, luma_table)
+        chroma = []
+        for plane in (cb, cr):
+            plane = np.pad(plane, ((0, height % 2), (0, width % 2)), mode="edge")
+            half = plane.reshape(plane.shape[0] // 2, 2, plane.shape[1] // 2, 2).mean(axis=(1, 3))
+            half = _dct_quantize(half + 128, chroma_table) - 128
+            chroma.append(half.repeat(2, axis=0).repeat(2, axis=1)[:height, :width])
+        cb, cr = chroma
+        array[..., 0] = y + 1.402 * cr
+        array[..., 1] = y - 0.344136 * cb - 0.714136 * cr
+        array[..., 2] = y + 1.772 * cb
+        return array
+
+
+class AugmentPipeline:
+    """按顺序组合的效果"""
+
+    def __init__(self, augmentations):
+        self.augmentations = list(augmentations)
+
+    def __repr__(self):
+        return f"AugmentPipeline({self.augmentations!r})"
+
+    def _rng(self, seed):
+        if seed is None:
+            return np.random.default_rng()
+        return np.random.Generator(np.random.PCG64(np.random.SeedSequence([seed, _STREAM])))
+
+    def apply(self, image, seed=None):
+        """增强一张 PIL 图片，返回 (新图片, [(效果, 参数)])
+
+        "1" 模式的二值图先转为 "L"（模糊、噪声需要灰度），输出也是 "L"。
+        """
+        rng = self._rng(seed)
+        if image.mode == "1":
+            image = image.convert("L")
+        array = np.asarray(image, dtype=np.float32)
+        applied = []
+        for augmentation in self.augmentations:
+            # 概率和参数总是抽取，某个效果是否生效不影响后面效果的参数
+            active = rng.random() < augmentation.probability
+            params = augmentation.sample(rng, array.shape)
+            if active:
+                array = augmentation.apply(array, params)
+                applied.append((augmentation, params))
+        array = np.clip(np.rint(array), 0, 255).astype(np.uint8)
+        return Image.fromarray(array, image.mode), applied
+
+    def augment_report(self, image, truth, seed=None):
+        """增强图片并同步更新标注：变换包围盒、记录所用参数，返回 (新图片, 新标注)"""
+        shape = (image.height, image.width)
+        image, applied = self.apply(image, seed)
+        annotations = []
+        for box in truth.get("annotations", []):
+            bbox = box["bbox"]
+            for augmentation, params in applied:
+                bbox = augmentation.transform_box(bbox, params, shape)
+            # 模板缓存中的静态标注是共享的，不能原地修改
+            annotations.append(dict(box, bbox=bbox))
+        truth = dict(truth, annotations=annotations,
+                     augment=[dict(params, name=augmentation.name) for augmentation, params in applied])
+        if "image" in truth:
+            truth["image"] = dict(truth["image"], mode=image.mode)
+        return image, truth
+
+
+def scan_pipeline(max_degrees=1.5):
+    """常用的扫描效果组合：歪斜 → 纸张纹理 → 失焦 → 传感器噪声 → JPEG 压缩"""
+    return AugmentPipeline([Rotate(max_degrees), PaperTexture(), GaussianBlur(probability=0.7),
+                            GaussianNoise(), JpegArtifacts(probability=0.8)])
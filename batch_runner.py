@@ -0,0 +1,77 @@
+"""多进程批量生成工具
+
+两个生成器共用：按序号切分批次，每个工作进程只构建一次生成器（字体、Faker 只加载一次），
+每份报告的随机种子由 (批次种子, 序号) 推导，因此并行结果与串行结果逐字节一致。
+"""
+import hashlib
+import multiprocessing
+import random
+
+
+def derive_seed(run_seed, index):
+    """由 (批次种子, 序号) 推导单份报告的确定性种子"""
+    digest = hashlib.sha256(f"{run_seed}:{index}".encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big")
+
+
+def new_run_seed():
+    """未指定种子时生成一个随机的批次种子"""
+    return random.SystemRandom().randrange(2 ** 63)
+
+
+def chunk_ranges(start, stop, chunk_size):
+    """把 [start, stop) 切分为若干个 [s, e) 区间"""
+    chunk_size = max(1, int(chunk_size))
+    for s in range(start, stop, chunk_size):
+        yield s, min(s + chunk_size, stop)
+
+
+# 每个工作进程持有一个生成器实例
+_worker_generator = None
+
+
+def _init_worker(factory, factory_kwargs):
+    global _worker_generator
+    _worker_generator = factory(**factory_kwargs)
+
+
+def _run_chunk(task):
+    method, start, stop, kwargs = task
+    return getattr(_worker_generator, method)(start, stop, **kwargs)
+
+
+def run_chunks(generator, factory, factory_kwargs, method, total,
+               workers=1, chunk_size=64, task_kwargs=None, with_stats=False, chunks=None, on_chunk=None):
+    """按区间调用 generator.<method>(start, stop, **task_kwargs)，返回按序号排列的结果
+
+    workers <= 1 时直接在当前进程串行执行；否则用进程池，每个进程通过
+    factory(**factory_kwargs) 构建自己的生成器。
+    with_stats=True 时 <method> 返回 (结果列表, 统计)，统计对象需提供 merge()；
+    此时返回 (结果列表, 合并后的统计)。
+    chunks 指定要执行的区间（默认把 [0, total) 按 chunk_size 切分）；
+    on_chunk(start, stop, 区间结果) 在每个区间完成后按序号顺序调用，用于记录检查点。
+    """
+    task_kwargs = task_kwargs or {}
+    chunks = list(chunk_ranges(0, total, chunk_size)) if chunks is None else list(chunks)
+    results = []
+    stats = None
+
+    def collect(chunk, chunk_result):
+        nonlocal stats
+        if with_stats:
+            chunk_result, chunk_stats = chunk_result
+            stats = chunk_stats if stats is None else stats.merge(chunk_stats)
+        if on_chunk is not None:
+            on_chunk(*chunk, chunk_result)
+        results.extend(chunk_result)
+
+    if workers <= 1:
+        for start, stop in chunks:
+            collect((start, stop), getattr(generator, method)(start, stop, **task_kwargs))
+    elif chunks:
+        tasks = [(method, start, stop, task_kwargs) for start, stop in chunks]
+        with multiprocessing.Pool(workers, initializer=_init_worker,
+                                  initargs=(factory, factory_kwargs)) as pool:
+            for chunk, chunk_result in zip(chunks, pool.imap(_run_chunk, tasks)):
+                collect(chunk, chunk_result)
+    return (results, stats) if with_stats else results
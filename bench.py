@@ -0,0 +1,329 @@
+"""性能基准测试
+
+用法：
+    python bench.py [份数]
+    python bench.py grid [--sizes 50,200] [--workers 1,2,4] [--layouts two_cols,one_col] [--json 结果.json]
+"""
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import generate_one_col
+import generate_two_cols
+from encoders import CANVAS_MODES, ImageEncoder
+from lab_values import VALUE_MODELS, make_value_engine
+
+
+def _rate(count, elapsed):
+    return count / elapsed if elapsed > 0 else float("inf")
+
+
+def _render(generator, n, report_time):
+    for _, data in generator.iter_report_data(0, n, 0, report_time):
+        generator.create_report_image(data, report_time)
+
+
+LAYOUTS = (
+    ("two_cols", generate_two_cols.BloodReportGenerator),
+    ("one_col", generate_one_col.BloodReportGenerator),
+)
+
+
+def _bench_render(n, generator_kwargs):
+    """按给定构造参数渲染 n 份报告（不含编码和写盘），返回 [(版式, 份/秒, 生成器)]"""
+    report_time = datetime.datetime(2024, 1, 1, 8, 0, 0)
+    rows = []
+    for layout, factory in LAYOUTS:
+        generator = factory(**generator_kwargs)
+        _render(generator, 1, report_time)  # 预热（构建模板）
+        start = time.perf_counter()
+        _render(generator, n, report_time)
+        rows.append((layout, _rate(n, time.perf_counter() - start), generator))
+    return rows
+
+
+def bench_template_cache(n=200):
+    """比较启用/关闭静态模板缓存时的渲染速度，返回 [(版式, 是否缓存, 份/秒)]"""
+    rows = []
+    for cached in (False, True):
+        for layout, rate, _ in _bench_render(n, {"template_cache": cached, "text_cache": False}):
+            rows.append((layout, cached, rate))
+    return rows
+
+
+def bench_text_cache(n=200):
+    """比较启用/关闭文字蒙版缓存时的渲染速度（均启用模板缓存），返回 [(版式, 是否缓存, 份/秒, 命中率)]"""
+    rows = []
+    for cached in (False, True):
+        for layout, rate, generator in _bench_render(n, {"template_cache": True, "text_cache": cached}):
+            hit_rate = generator.text_cache.stats()["hit_rate"] if cached else None
+            rows.append((layout, cached, rate, hit_rate))
+    return rows
+
+
+def bench_values(n=100000):
+    """比较两种数值模型批量生成检验数值的速度（两列版式），返回 [(方式, 份数, 份/秒)]"""
+    generator = generate_two_cols.BloodReportGenerator()
+    rates = []
+    for value_model in VALUE_MODELS:
+        engine = make_value_engine(generator.reference_table, value_model)
+        start = time.perf_counter()
+        engine.sample(n, 0)
+        rates.append((type(engine).__name__, n, _rate(n, time.perf_counter() - start)))
+    return rates
+
+
+ENCODER_GRID = (
+    ("png 默认(6)", ImageEncoder("png")),
+    ("png 1", ImageEncoder("png", compress_level=1)),
+    ("png 9", ImageEncoder("png", compress_level=9)),
+    ("jpeg q90", ImageEncoder("jpeg", quality=90)),
+    ("webp q90", ImageEncoder("webp", quality=90)),
+    ("raw", ImageEncoder("raw")),
+)
+
+
+def bench_encoders(n=10):
+    """比较各画布模式和编码格式的编码耗时与大小（两列版式），返回 [(模式, 编码, 毫秒/份, 字节/份)]"""
+    report_time = datetime.datetime(2024, 1, 1, 8, 0, 0)
+    rows = []
+    for mode in CANVAS_MODES:
+        generator = generate_two_cols.BloodReportGenerator(mode=mode)
+        images = [image for image, _ in generator.iter_reports(n, seed=0, report_time=report_time)]
+        for name, encoder in ENCODER_GRID:
+            start = time.perf_counter()
+            total_bytes = sum(len(encoder.encode(image)) for image in images)
+            elapsed = time.perf_counter() - start
+            rows.append((mode, name, elapsed / n * 1000, total_bytes / n))
+    return rows
+
+
+# 矢量输出基准：PNG 逐份文件与不经位图的多页文档
+VECTOR_OUTPUTS = ("files", "pdf", "svg")
+
+
+def _dir_bytes(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+def bench_vector(n=200):
+    """同样的报告数据分别写成 PNG 文件、多页 PDF、多页 SVG（单进程、同步写出，每种文档 n 页一个文件）
+
+    返回 [(版式, 输出, 毫秒/份, 字节/份)]；字节数为输出目录中全部文件的大小。生成器自身的汇总输出不打印。
+    """
+    report_time = datetime.datetime(2024, 1, 1, 8, 0, 0)
+    rows = []
+    for layout, factory in LAYOUTS:
+        generator = factory()
+        generate = getattr(generator, GRID_LAYOUTS[layout][1])
+        for sink in VECTOR_OUTPUTS:
+            with tempfile.TemporaryDirectory() as output_dir, contextlib.redirect_stdout(io.StringIO()):
+                generate(1, output_dir, seed=0, report_time=report_time, sink=sink, writers=0, progress=False)
+            with tempfile.TemporaryDirectory() as output_dir, contextlib.redirect_stdout(io.StringIO()):
+                start = time.perf_counter()
+                generate(n, output_dir, seed=0, report_time=report_time, sink=sink, shard_size=n, writers=0,
+                         progress=False)
+                elapsed = time.perf_counter() - start
+                rows.append((layout, "png" if sink == "files" else sink, elapsed / n * 1000,
+                             _dir_bytes(output_dir) / n))
+    return rows
+
+
+# 全新工作进程从启动到产出第一份报告的预算（秒）
+STARTUP_BUDGET_SECONDS = 1.0
+
+_STARTUP_SCRIPT = """
+import json, sys, time
+t0 = time.perf_counter()
+import {module} as m
+t1 = time.perf_counter()
+generator = m.BloodReportGenerator()
+t2 = time.perf_counter()
+next(iter(generator.iter_reports(1, seed=0)))
+t3 = time.perf_counter()
+print(json.dumps([t1 - t0, t2 - t1, t3 - t2]))
+"""
+
+
+def bench_startup(repeat=3):
+    """在全新的 Python 进程中测量 导入 / 构造 / 第一份报告 的耗时（取最小值）
+
+    返回 [(版式, 导入秒, 构造秒, 首份报告秒, 是否在预算内)]；失败（如找不到字体）时耗时为 None。
+    """
+    root = os.path.dirname(os.path.abspath(__file__))
+    rows = []
+    for layout, module in (("two_cols", "generate_two_cols"), ("one_col", "generate_one_col")):
+        best = None
+        for _ in range(repeat):
+            proc = subprocess.run([sys.executable, "-c", _STARTUP_SCRIPT.format(module=module)], cwd=root,
+                                  capture_output=True, text=True)
+            if proc.returncode != 0:
+                best = None
+                break
+            timings = json.loads(proc.stdout.strip().splitlines()[-1])
+            best = timings if best is None else [min(a, b) for a, b in zip(best, timings)]
+        if best is None:
+            rows.append((layout, None, None, None, False))
+        else:
+            rows.append((layout, *best, sum(best) <= STARTUP_BUDGET_SECONDS))
+    return rows
+
+
+# 网格基准的默认规模：份数 × 进程数
+GRID_SIZES = (50, 200)
+GRID_WORKERS = (1, 2, 4)
+GRID_LAYOUTS = {"two_cols": ("generate_two_cols", "generate_report"),
+                "one_col": ("generate_one_col", "generate_batch")}
+# 表格中列出的分阶段耗时（生成器计时 + 写出流水线的编码/写盘）
+GRID_STAGES = ("layout", "values", "metadata", "template", "draw", "annotate", "augment", "encode", "write")
+
+_GRID_SCRIPT = """
+import datetime, json, tempfile, time
+import {module} as m
+from canvas_pool import peak_rss
+generator = m.BloodReportGenerator(profile=True)
+with tempfile.TemporaryDirectory() as output_dir:
+    start = time.perf_counter()
+    generator.{method}({n}, output_dir=output_dir, workers={workers}, seed=0,
+                       report_time=datetime.datetime(2024, 1, 1, 8, 0, 0), progress=False)
+    elapsed = time.perf_counter() - start
+print(json.dumps({{"elapsed": elapsed, "stats": generator.last_stats.as_dict(), "rss": peak_rss()}}))
+"""
+
+
+def bench_grid(sizes=GRID_SIZES, workers=GRID_WORKERS, layouts=tuple(GRID_LAYOUTS)):
+    """固定种子、固定报告时间，在 版式 × 份数 × 进程数 的网格上完整生成报告（含编码和写入临时目录）
+
+    每个组合在全新的 Python 进程中运行，峰值 RSS 互不影响。返回字典列表：
+    layout / n / workers / reports_per_sec / p50_ms / p99_ms / rss_main / rss_worker（字节）/
+    stages {阶段: 秒}（各进程累计）；失败的组合 error 为子进程的错误输出。
+    """
+    root = os.path.dirname(os.path.abspath(__file__))
+    rows = []
+    for layout in layouts:
+        module, method = GRID_LAYOUTS[layout]
+        for n in sizes:
+            for worker_count in workers:
+                row = {"layout": layout, "n": n, "workers": worker_count}
+                script = _GRID_SCRIPT.format(module=module, method=method, n=n, workers=worker_count)
+                proc = subprocess.run([sys.executable, "-c", script], cwd=root, capture_output=True, text=True)
+                if proc.returncode != 0:
+                    row["error"] = proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "失败"
+                    rows.append(row)
+                    continue
+                result = json.loads(proc.stdout.strip().splitlines()[-1])
+                stats = result["stats"]
+                profile = stats.get("profile", {})
+                stages = {name: entry["seconds"] for name, entry in profile.get("stages", {}).items()}
+                stages["encode"] = stats["encode_seconds"]
+                stages["write"] = stats["write_seconds"]
+                row.update({"reports_per_sec": _rate(n, result["elapsed"]),
+                            "p50_ms": profile.get("latency_p50_ms"), "p99_ms": profile.get("latency_p99_ms"),
+                            "rss_main": result["rss"][0], "rss_worker": result["rss"][1] if worker_count > 1 else None,
+                            "stages": stages})
+                rows.append(row)
+    return rows
+
+
+def _mb(value):
+    return f"{value / 2 ** 20:.0f}" if value else "-"
+
+
+def _ms(value):
+    return f"{value:.1f}" if value is not None else "-"
+
+
+def grid_main(argv):
+    parser = argparse.ArgumentParser(prog="bench.py grid", description="份数 × 进程数 网格基准")
+    parser.add_argument("--sizes", default=",".join(map(str, GRID_SIZES)), help="逗号分隔的份数")
+    parser.add_argument("--workers", default=",".join(map(str, GRID_WORKERS)), help="逗号分隔的进程数")
+    parser.add_argument("--layouts", default=",".join(GRID_LAYOUTS), help="逗号分隔的版式")
+    parser.add_argument("--json", help="把结果另存为 JSON 文件，便于比较前后两次的数字")
+    args = parser.parse_args(argv)
+    layouts = args.layouts.split(",")
+    for layout in layouts:
+        if layout not in GRID_LAYOUTS:
+            parser.error(f"未知的版式: {layout}")
+    rows = bench_grid([int(x) for x in args.sizes.split(",")], [int(x) for x in args.workers.split(",")], layouts)
+
+    print("网格基准（seed=0，完整生成并写入临时目录）")
+    print(f"{'版式':<10}{'份数':>6}{'进程':>6}{'份/秒':>10}{'p50 ms':>10}{'p99 ms':>10}"
+          f"{'RSS MB':>9}{'工作进程 MB':>12}")
+    for row in rows:
+        head = f"{row['layout']:<10}{row['n']:>6}{row['workers']:>6}"
+        if "error" in row:
+            print(f"{head}  失败: {row['error']}")
+            continue
+        print(f"{head}{row['reports_per_sec']:>10.1f}{_ms(row['p50_ms']):>10}{_ms(row['p99_ms']):>10}"
+              f"{_mb(row['rss_main']):>9}{_mb(row['rss_worker']):>12}")
+
+    print()
+    print("分阶段耗时（毫秒/份，各进程累计；编码/写盘在后台写线程中，与渲染重叠）")
+    print(f"{'版式':<10}{'份数':>6}{'进程':>6}" + "".join(f"{name:>10}" for name in GRID_STAGES))
+    for row in rows:
+        if "error" in row:
+            continue
+        cells = "".join(f"{row['stages'].get(name, 0.0) / row['n'] * 1000:>10.2f}" for name in GRID_STAGES)
+        print(f"{row['layout']:<10}{row['n']:>6}{row['workers']:>6}{cells}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(rows, f, ensure_ascii=False, indent=2)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] == "grid":
+        grid_main(argv[1:])
+        return
+    n = int(argv[0]) if argv else 200
+
+    print(f"启动耗时（全新进程，预算 {STARTUP_BUDGET_SECONDS:.1f} 秒）")
+    print(f"{'版式':<10}{'导入':>8}{'构造':>8}{'首份报告':>10}{'预算内':>8}")
+    for layout, imported, constructed, first, ok in bench_startup():
+        if imported is None:
+            print(f"{layout:<10}{'失败（找不到字体？）':>34}")
+        else:
+            print(f"{layout:<10}{imported:>8.3f}{constructed:>8.3f}{first:>10.3f}{'是' if ok else '否':>8}")
+
+    print()
+    print(f"静态模板缓存（渲染 {n} 份）")
+    print(f"{'版式':<10}{'模板缓存':<10}{'份/秒':>10}")
+    for layout, cached, rate in bench_template_cache(n):
+        print(f"{layout:<10}{'开' if cached else '关':<10}{rate:>10.1f}")
+
+    print()
+    print(f"文字蒙版缓存（渲染 {n} 份，启用模板缓存）")
+    print(f"{'版式':<10}{'文字缓存':<10}{'份/秒':>10}{'命中率':>10}")
+    for layout, cached, rate, hit_rate in bench_text_cache(n):
+        hit_text = f"{hit_rate:.1%}" if hit_rate is not None else "-"
+        print(f"{layout:<10}{'开' if cached else '关':<10}{rate:>10.1f}{hit_text:>10}")
+
+    print()
+    print("检验数值生成（两列版式，不含渲染）")
+    print(f"{'方式':<20}{'份数':>10}{'份/秒':>14}")
+    for method, count, rate in bench_values(n * 500):
+        print(f"{method:<20}{count:>10}{rate:>14.0f}")
+
+    print()
+    print("画布模式与编码格式（两列版式）")
+    print(f"{'模式':<6}{'编码':<14}{'毫秒/份':>10}{'KB/份':>10}")
+    for mode, name, ms, size in bench_encoders(max(1, n // 10)):
+        print(f"{mode:<6}{name:<14}{ms:>10.1f}{size / 1024:>10.1f}")
+
+    print()
+    print(f"矢量输出（{n} 份，单进程同步写出，含数据生成）")
+    print(f"{'版式':<10}{'输出':<6}{'毫秒/份':>10}{'KB/份':>10}")
+    for layout, output, ms, size in bench_vector(n):
+        print(f"{layout:<10}{output:<6}{ms:>10.1f}{size / 1024:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
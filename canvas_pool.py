@@ -0,0 +1,101 @@
+"""画布复用与内存统计
+
+每份报告都新建一张画布（两列版式 RGB 约 17 MB）再创建 ImageDraw，分配器反复申请、释放大块内存，
+工作进程多时 RSS 不断上涨。复用模式下每个进程持有一个画布池：取出画布后把缓存的静态模板直接贴进去
+（原地覆盖像素，不分配新内存），写线程编码完成后把画布放回池中。
+
+池的容量按写出流水线中同时存活的图片数确定：写线程数 + 队列长度 + 2（正在绘制的一张、等待入队的一张）。
+画布按需创建，最多保留 容量 张；池空时不会阻塞而是再新建一张（超出容量的记入 overflow），所以出错时
+也不会死锁。正常情况下 overflow 为 0，每个进程的画布内存不超过 容量 × 单张画布大小。
+"""
+import sys
+import threading
+
+from PIL import Image, ImageDraw
+
+# Pillow 每个像素实际占用的字节数（RGB 按 4 字节存储）
+_BYTES_PER_PIXEL = {"RGB": 4, "L": 1, "1": 1}
+
+
+def canvas_bytes(mode, size):
+    """单张画布的像素内存（字节）"""
+    return _BYTES_PER_PIXEL.get(mode, 4) * size[0] * size[1]
+
+
+def pool_capacity(writers, max_pending):
+    """写出流水线中同时存活的画布数上限"""
+    return writers + max_pending + 2 if writers else 1
+
+
+def peak_rss():
+    """返回 (本进程, 已结束子进程中最大者) 的峰值常驻内存（字节），不支持的平台（Windows）返回 (None, None)"""
+    try:
+        import resource
+    except ImportError:
+        return None, None
+    scale = 1 if sys.platform == "darwin" else 1024  # Linux 上 ru_maxrss 的单位是 KB
+    return (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale,
+            resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale)
+
+
+class CanvasPool:
+    """同一尺寸、模式的画布池，线程安全（写线程归还，绘制线程取出）"""
+
+    def __init__(self, mode, size, capacity, background="white"):
+        self.mode = mode
+        self.size = size
+        self.capacity = capacity
+        self.background = background
+        self._lock = threading.Lock()
+        self._free = []
+        self._owned = set()
+        self._draws = {}
+        self.created = 0
+        self.in_use = 0
+        self.peak_in_use = 0
+        self.overflow = 0
+
+    def acquire(self, template=None):
+        """取出一张画布并原地重置：有模板时贴上模板，否则填充底色；返回 (画布, ImageDraw)"""
+        with self._lock:
+            if self._free:
+                image = self._free.pop()
+                fresh = False
+            else:
+                image = Image.new(self.mode, self.size, self.background)
+                self._owned.add(id(image))
+                self.created += 1
+                self.overflow = max(self.overflow, self.created - self.capacity)
+                fresh = True
+            self.in_use += 1
+            self.peak_in_use = max(self.peak_in_use, self.in_use)
+        if template is not None:
+            image.paste(template)
+        elif not fresh:
+            image.paste(self.background, (0, 0) + self.size)
+        draw = self._draws.get(id(image))
+        if draw is None:
+            draw = self._draws[id(image)] = ImageDraw.Draw(image)
+        return image, draw
+
+    def release(self, image):
+        """归还画布；不是本池的图片（如增强后的新图片）直接忽略，超出容量的画布不再保留"""
+        if id(image) not in self._owned:
+            return
+        with self._lock:
+            self.in_use -= 1
+            if len(self._free) < self.capacity:
+                self._free.append(image)
+                return
+            self._owned.discard(id(image))
+            self.created -= 1
+        self._draws.pop(id(image), None)
+
+    @property
+    def nbytes(self):
+        """池中现有画布占用的像素内存（字节）"""
+        return self.created * canvas_bytes(self.mode, self.size)
+
+    def stats(self):
+        return {"capacity": self.capacity, "created": self.created, "peak_in_use": self.peak_in_use,
+                "overflow": self.overflow, "bytes": self.nbytes}
@@ -0,0 +1,141 @@
+"""可续跑的批量生成检查点
+
+每份报告的随机数只由 (批次种子, 序号) 决定，报告时间由调用方传入，所以任意区间都可以单独重算。
+resume=True 时生成器在输出目录中写两个文件：
+
+    run_manifest.json   本批次的种子、报告时间和全部影响输出的参数
+    run_progress.jsonl  每完成一个区间追加一行 {"start", "stop", "result"}（写完即 fsync）
+
+进程崩溃后用同样的参数再跑一次，会读取清单沿用原来的种子和报告时间，只生成未完成的区间，
+结果与一次跑完逐字节一致。参数与清单不符时报错，而不是把两批不同的报告混在一个目录里。
+"""
+import datetime
+import json
+import os
+
+MANIFEST_FILENAME = "run_manifest.json"
+PROGRESS_FILENAME = "run_progress.jsonl"
+MANIFEST_VERSION = 1
+
+
+def _canonical(value):
+    """用于比较的规范 JSON（元组与列表视为相同）"""
+    return json.dumps(value, sort_keys=True, ensure_ascii=False, default=repr)
+
+
+class RunCheckpoint:
+    """一个输出目录的检查点：批次参数 + 已完成的区间
+
+    completed: {起始序号: (结束序号, 区间结果)}
+    """
+
+    def __init__(self, output_dir, run_seed, report_time, config, completed=None, finished=False):
+        self.output_dir = output_dir
+        self.run_seed = run_seed
+        self.report_time = report_time
+        self.config = config
+        self.completed = completed if completed is not None else {}
+        self.finished = finished
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.output_dir, MANIFEST_FILENAME)
+
+    @property
+    def progress_path(self):
+        return os.path.join(self.output_dir, PROGRESS_FILENAME)
+
+    @classmethod
+    def open(cls, output_dir, config, run_seed=None, report_time=None, new_seed=None):
+        """读取目录中的检查点，没有时新建
+
+        已有检查点时沿用其中的种子和报告时间；调用方显式给出的 run_seed / report_time 必须与之相同。
+        新建时 run_seed 为 None 则调用 new_seed() 生成，report_time 为 None 则取当前时间。
+        """
+        manifest_path = os.path.join(output_dir, MANIFEST_FILENAME)
+        if not os.path.exists(manifest_path):
+            if run_seed is None:
+                run_seed = new_seed()
+            if report_time is None:
+                report_time = datetime.datetime.now()
+            checkpoint = cls(output_dir, run_seed, report_time, config)
+            checkpoint._write_manifest()
+            return checkpoint
+
+        with open(manifest_path, encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("version") != MANIFEST_VERSION:
+            raise ValueError(f"检查点版本不符: {manifest_path}")
+        if _canonical(manifest["config"]) != _canonical(config):
+            raise ValueError(f"参数与检查点 {manifest_path} 不一致，请换一个输出目录或删除检查点后重跑")
+        saved_time = datetime.datetime.fromisoformat(manifest["report_time"])
+        if run_seed is not None and run_seed != manifest["run_seed"]:
+            raise ValueError(f"种子 {run_seed} 与检查点中的 {manifest['run_seed']} 不一致")
+        if report_time is not None and report_time != saved_time:
+            raise ValueError(f"报告时间 {report_time} 与检查点中的 {saved_time} 不一致")
+        checkpoint = cls(output_dir, manifest["run_seed"], saved_time, manifest["config"])
+        checkpoint._read_progress()
+        return checkpoint
+
+    def _write_manifest(self):
+        manifest = {"version": MANIFEST_VERSION, "run_seed": self.run_seed,
+                    "report_time": self.report_time.isoformat(), "config": self.config}
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2, default=repr)
+        os.replace(tmp_path, self.manifest_path)
+        # 新批次从空的进度文件开始
+        with open(self.progress_path, "w", encoding="utf-8"):
+            pass
+
+    def _read_progress(self):
+        if not os.path.exists(self.progress_path):
+            return
+        with open(self.progress_path, "rb+") as f:
+            data = f.read()
+            end = data.rfind(b"\n") + 1
+            if end < len(data):
+                # 崩溃时写了一半的最后一行：截掉，否则下一次追加会接在它后面，两行一起无法解析
+                f.truncate(end)
+        for line in data[:end].decode("utf-8").splitlines():
+            entry = json.loads(line)
+            if entry.get("finished"):
+                self.finished = True
+            else:
+                self.completed[entry["start"]] = (entry["stop"], entry["result"])
+
+    def _append(self, entry):
+        with open(self.progress_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def pending(self, chunks):
+        """chunks 中尚未完成的区间"""
+        return [(start, stop) for start, stop in chunks if self.completed.get(start, (None,))[0] != stop]
+
+    def record(self, start, stop, result):
+        """记录一个已完成的区间（其文件已全部写出）"""
+        self.completed[start] = (stop, list(result))
+        self._append({"start": start, "stop": stop, "result": list(result)})
+
+    def finish(self):
+        """整批完成（包括合并标注、索引）后调用，再次运行时直接返回"""
+        self.finished = True
+        self._append({"finished": True})
+
+    def results(self):
+        """按序号拼接各区间的结果"""
+        merged = []
+        for start in sorted(self.completed):
+            merged.extend(self.completed[start][1])
+        return merged
+
+
+def run_config(factory_kwargs, **options):
+    """检查点中记录的参数：生成器构造参数（编码器、增强取 repr，不含不影响输出的 profile / reuse_canvas）
+    + 本次运行的参数"""
+    config = {key: repr(value) if key in ("encoder", "augment") else value
+              for key, value in factory_kwargs.items() if key not in ("profile", "reuse_canvas")}
+    config.update(options)
+    return config
@@ -0,0 +1,193 @@
+"""命令行与配置文件入口
+
+    python cli.py --layout two_cols -n 10000 --workers 8 --sink shards --format webp -o out
+    python cli.py --config job.yaml --seed 42        # 命令行参数覆盖配置文件中的同名项
+    python cli.py -n 100000 --sink pdf --shard-size 5000   # 不栅格化，每 5000 份一个多页 PDF
+
+配置文件为 JSON 或 YAML（需要 PyYAML），键与长选项同名（横线、下划线均可），例如：
+
+    layout: one_col
+    count: 100000
+    workers: 8
+    sink: shards
+    format: jpeg
+    quality: 85
+    annotations: jsonl
+
+generate_two_cols.py / generate_one_col.py 直接运行时也走这里，版面默认为各自的版面。
+"""
+import argparse
+import datetime
+import importlib
+import json
+import sys
+
+from annotations import ANNOTATION_FORMATS
+from encoders import CANVAS_MODES, FORMATS, ImageEncoder
+from lab_values import CORRELATED, VALUE_MODELS
+from layout_engine import load_layout
+from shard_sink import DEFAULT_SHARD_SIZE
+from vector_output import VECTOR_FORMATS
+from work_queue import DEFAULT_LEASE_SECONDS
+from write_pipeline import DEFAULT_MAX_PENDING, DEFAULT_WRITERS
+
+try:
+    import yaml
+except ImportError:  # PyYAML 可选，只有读取 YAML 配置时需要
+    yaml = None
+
+# 生成器：(模块, 批量生成方法, 份数参数名, 默认输出目录, 默认 DPI)
+# 默认 DPI 与各生成器自带的编码器一致：两列版式写 200，一列版式原来就不写
+GENERATORS = {
+    "two_cols": ("generate_two_cols", "generate_report", "patient_count", "blood_reports", 200),
+    "one_col": ("generate_one_col", "generate_batch", "n", "batch_reports", None),
+}
+
+AUGMENT_PRESETS = ("none", "scan")
+
+
+def load_config(path):
+    """读取 JSON / YAML 配置文件，返回 {选项名: 值}（键中的横线换成下划线）"""
+    with open(path, encoding="utf-8") as f:
+        if path.endswith((".yaml", ".yml")):
+            if yaml is None:
+                raise RuntimeError(f"读取 YAML 配置需要安装 PyYAML: {path}")
+            config = yaml.safe_load(f) or {}
+        else:
+            config = json.load(f)
+    if not isinstance(config, dict):
+        raise ValueError(f"配置文件顶层应为键值表: {path}")
+    return {key.replace("-", "_"): value for key, value in config.items()}
+
+
+def build_parser(default_layout="two_cols"):
+    parser = argparse.ArgumentParser(description="批量生成血常规报告单图片")
+    parser.add_argument("--config", help="JSON / YAML 配置文件，命令行参数优先")
+
+    job = parser.add_argument_group("任务")
+    job.add_argument("--layout", default=default_layout,
+                     help="内置版面名（two_cols / one_col）或版面文件路径（默认 %(default)s）")
+    job.add_argument("--generator", choices=sorted(GENERATORS),
+                     help="使用哪个生成器，默认按版面名推断")
+    job.add_argument("-n", "--count", type=int, default=10, help="报告份数（默认 %(default)s）")
+    job.add_argument("--start", type=int, default=0, help="第一份报告的全局序号")
+    job.add_argument("--seed", type=int, help="批次种子，默认随机")
+    job.add_argument("--report-time", help="报告时间（ISO 格式，如 2024-01-01T08:00），默认当前时间")
+    job.add_argument("--resume", action="store_true", help="记录检查点，中断后可续跑")
+
+    run = parser.add_argument_group("并行")
+    run.add_argument("--workers", type=int, default=1, help="工作进程数（默认 %(default)s）")
+    run.add_argument("--chunk-size", type=int, default=64, help="每个任务区间的份数（默认 %(default)s）")
+    run.add_argument("--writers", type=int, default=DEFAULT_WRITERS, help="每个进程的写线程数，0 为同步写出")
+    run.add_argument("--max-pending", type=int, default=DEFAULT_MAX_PENDING, help="排队等待写出的图片数上限")
+    run.add_argument("--distributed", action="store_true", help="作为协调者使用共享目录中的租约队列")
+    run.add_argument("--lease-seconds", type=float, default=DEFAULT_LEASE_SECONDS, help="分布式租约时长（秒）")
+
+    output = parser.add_argument_group("输出")
+    output.add_argument("-o", "--output-dir", help="输出目录（默认按生成器为 blood_reports / batch_reports）")
+    output.add_argument("--sink", choices=("files", "shards", *VECTOR_FORMATS), default="files",
+                        help="每份报告一个文件、写入 tar 分片，或不栅格化直接写成多页 PDF / SVG（默认 %(default)s）")
+    output.add_argument("--shard-size", type=int, default=DEFAULT_SHARD_SIZE, help="每个分片（多页文档）的份数")
+    output.add_argument("--format", choices=sorted(FORMATS), default="png", help="图片编码格式（默认 %(default)s）")
+    output.add_argument("--quality", type=int, default=90, help="JPEG / WebP 质量")
+    output.add_argument("--compress-level", type=int, help="PNG 压缩级别 0~9")
+    output.add_argument("--dpi", type=int, help="写入 PNG / JPEG 的 DPI（默认两列版式 200，一列版式不写）")
+    output.add_argument("--mode", choices=CANVAS_MODES, default="RGB", help="画布模式（默认 %(default)s）")
+    output.add_argument("--annotations", choices=ANNOTATION_FORMATS, help="另外导出带包围盒的标注")
+    output.add_argument("--no-progress", dest="progress", action="store_false", help="不显示进度条")
+
+    content = parser.add_argument_group("内容")
+    content.add_argument("--value-model", choices=VALUE_MODELS, default=CORRELATED,
+                         help="检验数值模型（默认 %(default)s）")
+    content.add_argument("--augment", choices=AUGMENT_PRESETS, default="none", help="扫描效果增强")
+    content.add_argument("--pools", action="store_true", help="预采样的患者信息池（仅两列版式）")
+    content.add_argument("--unique-ids", action="store_true", help="整批内病员号（病案号、条码）不重复")
+    content.add_argument("--reuse-canvas", action="store_true", help="复用画布，限制每个进程的画布内存")
+    content.add_argument("--profile", action="store_true", help="打印分阶段耗时")
+    return parser
+
+
+def _config_argv(parser, config, path):
+    """把配置项转换成命令行参数，交给解析器做与命令行相同的取值和类型检查"""
+    actions = {action.dest: action for action in parser._actions if action.option_strings}
+    argv = []
+    for key, value in config.items():
+        if value is None:
+            continue
+        action = actions[key]
+        option = action.option_strings[-1]
+        if action.nargs == 0:  # 开关
+            if not isinstance(value, bool):
+                parser.error(f"配置文件 {path} 中 {key} 应为 true / false: {value!r}")
+            if value == action.const:
+                argv.append(option)
+        else:
+            argv.append(f"{option}={value}")
+    return argv
+
+
+def parse_args(argv=None, default_layout="two_cols"):
+    """解析命令行；--config 指定的配置文件作为默认值，命令行中显式给出的参数优先"""
+    parser = build_parser(default_layout)
+    pre, _ = parser.parse_known_args(argv)
+    if pre.config:
+        config = load_config(pre.config)
+        config.pop("config", None)
+        known = {action.dest for action in parser._actions}
+        unknown = sorted(set(config) - known)
+        if unknown:
+            parser.error(f"配置文件 {pre.config} 中有未知的选项: {', '.join(unknown)}")
+        checked = parser.parse_args(_config_argv(parser, config, pre.config))
+        parser.set_defaults(**{key: getattr(checked, key) for key in config})
+    args = parser.parse_args(argv)
+
+    if args.generator is None:
+        name = args.layout if args.layout in GENERATORS else load_layout(args.layout).get("name")
+        if name not in GENERATORS:
+            parser.error(f"无法从版面 {args.layout} 推断生成器，请用 --generator 指定")
+        args.generator = name
+    if args.pools and args.generator != "two_cols":
+        parser.error("--pools 只适用于两列版式")
+    if args.sink in VECTOR_FORMATS and args.augment != "none":
+        parser.error("扫描效果增强作用于位图，不能与矢量输出同时使用")
+    if isinstance(args.report_time, str):
+        try:
+            args.report_time = datetime.datetime.fromisoformat(args.report_time)
+        except ValueError:
+            parser.error(f"报告时间格式不正确: {args.report_time}")
+    return args
+
+
+def make_generator(args):
+    """按参数构造生成器，返回 (生成器, 批量生成方法)"""
+    module_name, method, _, _, default_dpi = GENERATORS[args.generator]
+    module = importlib.import_module(module_name)
+    dpi = args.dpi if args.dpi is not None else default_dpi
+    encoder = ImageEncoder(args.format, compress_level=args.compress_level, quality=args.quality,
+                           dpi=(dpi, dpi) if dpi else None)
+    kwargs = {"layout": args.layout, "mode": args.mode, "unique_ids": args.unique_ids, "profile": args.profile,
+              "reuse_canvas": args.reuse_canvas, "value_model": args.value_model, "encoder": encoder}
+    if args.augment == "scan":
+        from augment import scan_pipeline
+        kwargs["augment"] = scan_pipeline()
+    if args.pools:
+        kwargs["pools"] = True
+    generator = module.BloodReportGenerator(**kwargs)
+    return generator, getattr(generator, method)
+
+
+def main(argv=None, default_layout="two_cols"):
+    args = parse_args(argv, default_layout)
+    _, _, count_name, default_dir, _ = GENERATORS[args.generator]
+    generator, generate = make_generator(args)
+    output_dir = args.output_dir or default_dir
+    generate(**{count_name: args.count}, output_dir=output_dir, workers=args.workers, seed=args.seed,
+             chunk_size=args.chunk_size, report_time=args.report_time, sink=args.sink, shard_size=args.shard_size,
+             annotation_format=args.annotations, writers=args.writers, max_pending=args.max_pending,
+             start=args.start, resume=args.resume, distributed=args.distributed,
+             lease_seconds=args.lease_seconds, progress=args.progress)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,177 @@
+"""中文字体查找
+
+生成器原来只探测几条写死的 Windows 字体路径，在 Linux/macOS 上找不到字体。
+这里先试调用方给出的候选路径（命中时不做任何扫描），找不到再查一份支持中文的字体索引：
+有 fontconfig 时用 fc-list :lang=zh，否则扫描系统字体目录并逐个检查能否绘制常用汉字。
+扫描结果写入缓存文件，字体目录没有变化时后续进程直接读缓存。
+
+环境变量：
+    BLOOD_REPORT_FONT       直接指定字体文件，优先于一切
+    BLOOD_REPORT_CACHE_DIR  索引缓存目录（默认 $XDG_CACHE_HOME/blood_report 或 ~/.cache/blood_report）
+"""
+import json
+import os
+import shutil
+import subprocess
+import sys
+
+INDEX_VERSION = 1
+INDEX_FILENAME = "font_index.json"
+FONT_EXTENSIONS = (".ttf", ".ttc", ".otf", ".otc")
+
+# 用来判断字体是否包含中文字形的样本字
+CJK_SAMPLE = "血常规报告"
+
+# 文件名包含这些片段的字体优先（按顺序）
+PREFERRED_NAMES = ("msyh", "simsun", "simhei", "notosanscjk", "notoserifcjk", "sourcehansans", "sourcehanserif",
+                   "wqy-microhei", "wqy-zenhei", "pingfang", "hiragino", "stheiti", "droidsansfallback")
+
+# 进程内缓存，同一进程多次构造生成器只读一次索引
+_index_memo = None
+
+
+def font_dirs():
+    """当前平台的系统/用户字体目录"""
+    home = os.path.expanduser("~")
+    if sys.platform.startswith("win"):
+        dirs = [os.path.join(os.environ.get("WINDIR", r"C:\Windows"), "Fonts")]
+        local = os.environ.get("LOCALAPPDATA")
+        if local:
+            dirs.append(os.path.join(local, "Microsoft", "Windows", "Fonts"))
+    elif sys.platform == "darwin":
+        dirs = ["/System/Library/Fonts", "/Library/Fonts", os.path.join(home, "Library", "Fonts")]
+    else:
+        dirs = ["/usr/share/fonts", "/usr/local/share/fonts", os.path.join(home, ".fonts"),
+                os.path.join(home, ".local", "share", "fonts")]
+    return [d for d in dirs if os.path.isdir(d)]
+
+
+def index_path():
+    cache_dir = os.environ.get("BLOOD_REPORT_CACHE_DIR")
+    if not cache_dir:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+        cache_dir = os.path.join(base, "blood_report")
+    return os.path.join(cache_dir, INDEX_FILENAME)
+
+
+def _dir_fingerprint(dirs):
+    """各字体目录（含子目录）的修改时间，安装/删除字体后会变化"""
+    fingerprint = {}
+    for root_dir in dirs:
+        for dirpath, _, _ in os.walk(root_dir):
+            try:
+                fingerprint[dirpath] = os.stat(dirpath).st_mtime
+            except OSError:
+                pass
+    return fingerprint
+
+
+def _preference(path):
+    name = os.path.basename(path).lower().replace(" ", "")
+    for rank, fragment in enumerate(PREFERRED_NAMES):
+        if fragment in name:
+            return rank, name
+    return len(PREFERRED_NAMES), name
+
+
+def _fc_list_cjk():
+    """fontconfig 给出的中文字体，没有 fc-list 时返回 None"""
+    if shutil.which("fc-list") is None:
+        return None
+    try:
+        output = subprocess.run(["fc-list", ":lang=zh", "--format=%{file}\\n"], capture_output=True,
+                                text=True, timeout=30, check=True).stdout
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return [line.strip() for line in output.splitlines()
+            if line.strip().lower().endswith(FONT_EXTENSIONS)]
+
+
+def has_cjk_glyphs(path, sample=CJK_SAMPLE):
+    """字体能否绘制样本汉字：缺字时 Pillow 画的是 .notdef 方框，与真实字形的尺寸不同"""
+    from PIL import ImageFont
+    try:
+        font = ImageFont.truetype(path, 24)
+        notdef = (font.getbbox("\U000FFFFD"), font.getlength("\U000FFFFD"))
+        return all((font.getbbox(char), font.getlength(char)) != notdef for char in sample)
+    except Exception:
+        return False
+
+
+def _scan_cjk(dirs):
+    fonts = []
+    for root_dir in dirs:
+        for dirpath, _, filenames in os.walk(root_dir):
+            for filename in filenames:
+                if filename.lower().endswith(FONT_EXTENSIONS):
+                    path = os.path.join(dirpath, filename)
+                    if has_cjk_glyphs(path):
+                        fonts.append(path)
+    return fonts
+
+
+def build_font_index(dirs=None):
+    """扫描字体目录，返回索引 {"version", "source", "dirs", "fonts"}（fonts 已按优先级排序）"""
+    dirs = font_dirs() if dirs is None else dirs
+    fonts = _fc_list_cjk()
+    source = "fontconfig"
+    if fonts is None:
+        fonts = _scan_cjk(dirs)
+        source = "scan"
+    return {"version": INDEX_VERSION, "source": source, "dirs": _dir_fingerprint(dirs),
+            "fonts": sorted(set(fonts), key=_preference)}
+
+
+def _save_index(index, path):
+    # 先写临时文件再替换，多个工作进程同时写也不会读到半个文件
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(index, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except OSError:
+        pass  # 缓存目录不可写时只是每次重新扫描
+
+
+def load_font_index(refresh=False):
+    """读取字体索引；缓存不存在、版本不符或字体目录有变化时重新扫描并写回"""
+    global _index_memo
+    if _index_memo is not None and not refresh:
+        return _index_memo
+    path = index_path()
+    index = None
+    if not refresh:
+        try:
+            with open(path, encoding="utf-8") as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            index = None
+        if index is not None and (index.get("version") != INDEX_VERSION
+                                  or index.get("dirs") != _dir_fingerprint(font_dirs())):
+            index = None
+    if index is None:
+        index = build_font_index()
+        _save_index(index, path)
+    _index_memo = index
+    return index
+
+
+def find_cjk_fonts(refresh=False):
+    """本机支持中文的字体文件列表（按优先级）"""
+    return [path for path in load_font_index(refresh)["fonts"] if os.path.exists(path)]
+
+
+def resolve_font(candidates=(), refresh=False):
+    """确定要使用的字体文件，找不到时返回 None
+
+    顺序：环境变量 BLOOD_REPORT_FONT、调用方给出的候选路径、字体索引中的第一个中文字体。
+    """
+    override = os.environ.get("BLOOD_REPORT_FONT")
+    if override and os.path.exists(override):
+        return override
+    for path in candidates:
+        if os.path.exists(path):
+            return path
+    fonts = find_cjk_fonts(refresh)
+    return fonts[0] if fonts else None
@@ -0,0 +1,465 @@
+"""批量检验数值生成（NumPy 向量化）
+
+参考范围预先整理成数组，一次生成 N 份报告的 性别、N×K 结果矩阵和 N×K 状态矩阵。
+
+随机数使用 PCG64，每份报告固定消耗 3K+1 个随机数，因此第 i 份报告的数据只由
+(种子, i) 决定：按任意区间切分（多进程、分片）生成的结果都与一次性生成的结果相同。
+
+LabValueEngine 每一项独立抽样，NEUT# 与 WBC×NEUT% 对不上、分类比率之和不是 100、
+MCHC 也不等于 HGB/HCT。CorrelatedValueModel（默认）只对基础指标从多元正态潜变量抽样，
+派生指标由基础指标计算，分类比率归一化，生成的数据满足这些生理关系；
+潜变量的均值和协方差按参考范围校准，每一项（包括派生指标）约有 variation_chance 的概率超出参考范围。
+"""
+from statistics import NormalDist
+
+import numpy as np
+
+from reference_table import SEXES
+
+# 分布模式
+TWO_COLS = "two_cols"  # 20% 异常：偏高 high*[1.05,1.3)，偏低 low*[0.7,0.95)，正常 [low*0.98, high*1.02)
+ONE_COL = "one_col"    # 20% 异常：在参考范围外偏移 (high-low)*[0.2,0.5)，正常 [low, high)
+
+# 数值模型
+INDEPENDENT = "independent"  # 每项独立抽样
+CORRELATED = "correlated"    # 相关模型（默认）：派生指标由基础指标计算
+VALUE_MODELS = (INDEPENDENT, CORRELATED)
+
+# 每次最多生成的行数，限制中间数组的内存
+BLOCK_ROWS = 65536
+
+# CorrelatedValueModel 的校准结果，键为 (项目代码, variation_chance, 下限, 上限)
+_CALIBRATIONS = {}
+
+# 两种版式的项目代码写法不同，统一成相关模型中的代码
+CODE_ALIASES = {"LYM%": "LYMPH%", "LYM#": "LYMPH#", "EOS%": "EO%", "EOS#": "EO#", "SD-RDW": "RDW-SD"}
+
+# 白细胞分类：(比率, 绝对值)，比率归一化到 100，绝对值 = WBC × 比率
+DIFFERENTIAL = (("NEUT%", "NEUT#"), ("LYMPH%", "LYMPH#"), ("MONO%", "MONO#"), ("EO%", "EO#"), ("BASO%", "BASO#"))
+
+# 红细胞指标：RBC、MCV、MCHC 为基础指标，HCT = RBC×MCV/10，HGB = MCHC×HCT/100，
+# 再由取整后的数值回算 MCHC = HGB/HCT、MCH = HGB/RBC，报告上的数值彼此一致
+RED_CELL = ("RBC", "MCV", "HCT", "HGB", "MCHC")
+
+# 基础指标潜变量之间的先验相关系数（未列出的为 0）；分类比率项对应归一化前的权重。
+# 校准时协方差从这里出发，只做满足各项异常率所需的最小调整
+LATENT_CORRELATIONS = {
+    ("RBC", "MCV"): -0.2,
+    ("RBC", "MCHC"): 0.2,
+    ("MCV", "MCHC"): 0.3,       # 缺铁：小细胞、低色素
+    ("MCV", "RDW-CV"): -0.4,    # 缺铁：小细胞、红细胞大小不一
+    ("MCV", "RDW-SD"): 0.2,
+    ("RDW-CV", "RDW-SD"): 0.6,
+    ("PLT", "MPV"): -0.4,
+    ("MPV", "PDW"): 0.7,
+    ("MPV", "P-LCR"): 0.8,
+    ("PDW", "P-LCR"): 0.6,
+    ("WBC", "PLT"): 0.2,
+    ("WBC", "NEUT%"): 0.5,      # 白细胞升高多为中性粒细胞升高
+    ("WBC", "LYMPH%"): -0.2,
+    ("NEUT%", "LYMPH%"): -0.3,
+    ("WBC", "CRP"): 0.4,        # 炎症指标
+    ("NEUT%", "CRP"): 0.3,
+    ("WBC", "ESR"): 0.2,
+    ("CRP", "ESR"): 0.5,
+    ("RBC", "ESR"): -0.3,       # 贫血时血沉加快
+}
+
+
+class LabValueEngine:
+    """按参考范围表批量生成检验数值
+
+    low / high 形状为 (2, K)，第 0 行为男性、第 1 行为女性的参考范围。
+    """
+
+    def __init__(self, low, high, mode=TWO_COLS, variation_chance=0.2):
+        low = np.asarray(low, dtype=np.float64)
+        high = np.asarray(high, dtype=np.float64)
+        if low.ndim == 1:
+            low = np.vstack([low, low])
+            high = np.vstack([high, high])
+        if low.shape != high.shape or low.shape[0] != len(SEXES):
+            raise ValueError(f"参考范围形状不正确: low{low.shape} high{high.shape}")
+        if mode not in (TWO_COLS, ONE_COL):
+            raise ValueError(f"未知的分布模式: {mode}")
+
+        if np.any(low > high):
+            raise ValueError("参考范围下限大于上限")
+
+        self.low = low
+        self.high = high
+        self.mode = mode
+        self.variation_chance = variation_chance
+        self.item_count = self.low.shape[1]
+        self.draws_per_row = 3 * self.item_count + 1
+
+    def _bit_generator(self, seed, start):
+        bit_generator = np.random.PCG64(seed)
+        if start:
+            bit_generator.advance(start * self.draws_per_row)
+        return bit_generator
+
+    def _sample_block(self, rng, n, sexes=None):
+        draws = rng.random((n, self.draws_per_row))
+        sex_draw = draws[:, 0]
+        u = draws[:, 1:].reshape(n, self.item_count, 3)
+        abnormal = u[:, :, 0] < self.variation_chance
+        upward = u[:, :, 1] < 0.5
+        base = u[:, :, 2]
+
+        if sexes is None:
+            sexes = (sex_draw >= 0.5).astype(np.int8)  # 与 random.choice(["男", "女"]) 一样各占一半
+        else:
+            sexes = np.asarray(sexes, dtype=np.int8)
+        low = self.low[sexes]
+        high = self.high[sexes]
+
+        if self.mode == TWO_COLS:
+            high_values = high * 1.05 + base * (high * 0.25)
+            low_values = low * 0.7 + base * (low * 0.25)
+            normal_values = low * 0.98 + base * (high * 1.02 - low * 0.98)
+            values = np.round(np.where(abnormal, np.where(upward, high_values, low_values), normal_values), 2)
+            status = np.where(abnormal, np.where(upward, 1, -1), 0).astype(np.int8)
+        else:
+            shift = (high - low) * (0.2 + base * 0.3)
+            normal_values = low + base * (high - low)
+            values = np.where(abnormal, np.where(upward, high + shift, low - shift), normal_values)
+            values = np.round(values, 2)
+            status = np.where(values < low, -1, np.where(values > high, 1, 0)).astype(np.int8)
+
+        return sexes, values, status
+
+    def sample(self, n, seed, start=0, sexes=None):
+        """生成序号 [start, start+n) 的数据
+
+        返回 (sexes, values, status)：
+            sexes  (n,)   int8，0=男 1=女（传入 sexes 时原样使用）
+            values (n, K) float64，保留两位小数
+            status (n, K) int8，1=偏高 -1=偏低 0=正常
+        """
+        rng = np.random.Generator(self._bit_generator(seed, start))
+        if n <= BLOCK_ROWS:
+            return self._sample_block(rng, n, sexes)
+
+        blocks = []
+        for offset in range(0, n, BLOCK_ROWS):
+            stop = min(offset + BLOCK_ROWS, n)
+            block_sexes = None if sexes is None else np.asarray(sexes)[offset:stop]
+            blocks.append(self._sample_block(rng, stop - offset, block_sexes))
+        return tuple(np.concatenate(parts) for parts in zip(*blocks))
+
+
+def _outside_rate(mean, spread, log_low, log_high):
+    """ln x ~ N(mean, spread²) 时 x 落在 (e^log_low, e^log_high) 之外的概率（log_low 可以是 -inf）"""
+    normal = NormalDist(mean, spread)
+    return normal.cdf(log_low) + 1 - normal.cdf(log_high)
+
+
+def _solve_spread(mean, log_low, log_high, chance):
+    """二分求对数标准差，使超出参考范围的概率为 chance（均值固定时概率随标准差单调增加）"""
+    low, high = 1e-3, 10.0
+    for _ in range(60):
+        middle = (low + high) / 2
+        if _outside_rate(mean, middle, log_low, log_high) < chance:
+            low = middle
+        else:
+            high = middle
+    return (low + high) / 2
+
+
+def _fit_factor(rows, log_target, weight, factor, ridge=1e-3, iterations=50):
+    """Levenberg-Marquardt：调整因子 F（协方差 = F·Fᵀ），使各项对数标准差 √(aᵢ F Fᵀ aᵢᵀ) 接近目标
+
+    rows 为各项对潜变量的线性系数 (K, D)，weight 把对数标准差的偏差换算成异常率的偏差。
+    目标互相矛盾时（例如两栏参考范围下 NEUT#、LYMPH# 的范围比 WBC×比率能达到的更宽）
+    按异常率的加权最小二乘折中；ridge 让 F 尽量靠近初值。
+    """
+    dim = factor.shape[0]
+    start = factor.copy()
+
+    def residual(candidate):
+        variance = np.einsum("kd,de,ke->k", rows, candidate @ candidate.T, rows)
+        return np.concatenate([weight * (0.5 * np.log(variance) - log_target),
+                               ridge * (candidate - start).ravel()]), variance
+
+    error, variance = residual(factor)
+    cost = error @ error
+    damping = 1e-2
+    for _ in range(iterations):
+        projected = rows @ factor
+        jacobian = (rows[:, :, None] * projected[:, None, :]).reshape(len(rows), dim * dim)
+        jacobian = np.vstack([jacobian * (weight / variance)[:, None], ridge * np.eye(dim * dim)])
+        gradient = jacobian.T @ error
+        normal = jacobian.T @ jacobian
+        while True:
+            step = np.linalg.solve(normal + damping * np.diag(np.diag(normal) + 1e-9), -gradient)
+            candidate = factor + step.reshape(dim, dim)
+            candidate_error, candidate_variance = residual(candidate)
+            candidate_cost = candidate_error @ candidate_error
+            if candidate_cost < cost:
+                break
+            damping *= 4
+            if damping > 1e8:
+                return factor
+        converged = cost - candidate_cost < 1e-10
+        factor, error, variance, cost = candidate, candidate_error, candidate_variance, candidate_cost
+        damping = max(damping / 3, 1e-7)
+        if converged:
+            break
+    return factor
+
+
+class CorrelatedValueModel:
+    """按参考范围表批量生成满足生理关系的检验数值
+
+    codes 为各项目代码（与 low / high 的列对应），low / high 的形状同 LabValueEngine。
+    基础指标取多元对数正态：ln x = log_mean[性别] + z·factor[性别]ᵀ，z 为独立标准正态。
+    派生指标（HCT、HGB、MCH、MCHC、分类绝对值、PCT）由取整后的基础指标计算，缺少输入项时按基础指标抽样。
+    状态一律按报告上的参考范围判断。
+
+    校准（见 _calibrate）：派生指标的对数是潜变量的线性函数（乘除关系精确，分类比率在均值处线性化），
+    先按最小二乘让每一项的对数均值接近参考范围的几何中心（下限为 0 的项接近 上限 减去单侧分位数），
+    再求每一项的目标对数标准差，使超出参考范围的概率为 variation_chance，
+    最后从 LATENT_CORRELATIONS 给出的协方差出发拟合因子。校准结果按参考范围缓存。
+    两栏参考范围下 NEUT#、LYMPH# 的范围比 WBC×比率能达到的更宽，只能折中：
+    WBC 约 30%、NEUT#、LYMPH#、MONO# 约 15% 被标异常，其余各项在 variation_chance 附近。
+
+    每份报告固定消耗 1 + 2⌈D/2⌉ 个随机数（D 为潜变量个数，正态数用 Box-Muller 变换得到），
+    与 LabValueEngine 一样可以按任意区间切分。
+    """
+
+    def __init__(self, codes, low, high, variation_chance=0.2):
+        low = np.asarray(low, dtype=np.float64)
+        high = np.asarray(high, dtype=np.float64)
+        if low.ndim == 1:
+            low = np.vstack([low, low])
+            high = np.vstack([high, high])
+        codes = [CODE_ALIASES.get(code, code) for code in codes]
+        if low.shape != high.shape or low.shape != (len(SEXES), len(codes)):
+            raise ValueError(f"参考范围形状不正确: low{low.shape} high{high.shape}，项目 {len(codes)} 个")
+        if len(set(codes)) != len(codes):
+            raise ValueError(f"项目代码重复: {codes}")
+        if np.any(low > high):
+            raise ValueError("参考范围下限大于上限")
+        if np.any(high <= 0):
+            raise ValueError("相关模型要求参考范围上限为正数")
+        if not 0 < variation_chance < 1:
+            raise ValueError(f"variation_chance 必须在 (0, 1) 之间: {variation_chance}")
+
+        self.codes = codes
+        self.low = low
+        self.high = high
+        self.variation_chance = variation_chance
+        self.item_count = len(codes)
+        column = {code: k for k, code in enumerate(codes)}
+        self._column = column
+
+        # 哪些派生关系的输入齐全
+        self.red_cell = all(code in column for code in RED_CELL)
+        self.differential = all(percent in column for percent, _ in DIFFERENTIAL)
+        derived = set()
+        if self.red_cell:
+            derived.update(("HCT", "HGB"))
+        if all(code in column for code in ("MCH", "HGB", "RBC")):
+            derived.add("MCH")
+        self.absolute = [(column[percent], column[count]) for percent, count in DIFFERENTIAL
+                         if percent in column and count in column and "WBC" in column]
+        derived.update(codes[count] for _, count in self.absolute)
+        self.platelet_crit = all(code in column for code in ("PLT", "MPV", "PCT"))
+        if self.platelet_crit:
+            derived.add("PCT")
+        self.derived = derived
+
+        # 基础指标（潜变量）
+        self.latent = [k for k, code in enumerate(codes) if code not in derived]
+        latent_codes = [codes[k] for k in self.latent]
+        self.latent_count = len(self.latent)
+        self.normals_per_row = self.latent_count + self.latent_count % 2
+        self.draws_per_row = 1 + self.normals_per_row
+
+        correlation = np.eye(self.latent_count)
+        position = {code: d for d, code in enumerate(latent_codes)}
+        for (a, b), rho in LATENT_CORRELATIONS.items():
+            if a in position and b in position:
+                correlation[position[a], position[b]] = correlation[position[b], position[a]] = rho
+        try:
+            np.linalg.cholesky(correlation)
+        except np.linalg.LinAlgError:
+            raise ValueError("潜变量相关矩阵不是正定矩阵，请检查 LATENT_CORRELATIONS") from None
+        self.correlation = correlation
+
+        # 按性别校准的对数均值 (2, D) 和因子 (2, D, D)；两种性别参考范围相同时只算一次
+        key = (tuple(codes), variation_chance)
+        calibrated = []
+        for sex in range(len(SEXES)):
+            bounds = key + (tuple(low[sex]), tuple(high[sex]))
+            if bounds not in _CALIBRATIONS:
+                _CALIBRATIONS[bounds] = self._calibrate(low[sex], high[sex])
+            calibrated.append(_CALIBRATIONS[bounds])
+        self.log_mean = np.stack([mean for mean, _ in calibrated])
+        self.factor = np.stack([factor for _, factor in calibrated])
+
+    def _linear_rows(self, latent_mean):
+        """各项对数值对潜变量的线性系数 (K, D) 和常数项 (K,)
+
+        乘除关系（HCT、HGB、MCH、PCT、分类绝对值）是精确的；
+        分类比率 ln(100·wₖ/Σw) 在 latent_mean 处对 ln w 线性化。
+        """
+        column = self._column
+        position = {k: d for d, k in enumerate(self.latent)}
+        rows = np.zeros((self.item_count, self.latent_count))
+        offset = np.zeros(self.item_count)
+        for k, d in position.items():
+            rows[k, d] = 1.0
+
+        def unit(code):
+            row = np.zeros(self.latent_count)
+            row[position[column[code]]] = 1.0
+            return row
+
+        if self.differential:
+            percent_columns = [column[percent] for percent, _ in DIFFERENTIAL]
+            weights = np.array([latent_mean[position[k]] for k in percent_columns])
+            log_total = np.log(np.exp(weights).sum())
+            share = np.exp(weights - log_total)
+            for k in percent_columns:
+                row = np.zeros(self.latent_count)
+                for j, share_j in zip(percent_columns, share):
+                    row[position[j]] -= share_j
+                row[position[k]] += 1.0
+                rows[k] = row
+                offset[k] = np.log(100.0) - log_total + share @ weights
+        for percent, count in self.absolute:
+            rows[count] = rows[percent] + unit("WBC")
+            offset[count] = offset[percent] - np.log(100.0)
+        if self.red_cell:
+            rows[column["HCT"]] = unit("RBC") + unit("MCV")
+            offset[column["HCT"]] = -np.log(10.0)
+            rows[column["HGB"]] = rows[column["HCT"]] + unit("MCHC")
+            offset[column["HGB"]] = -np.log(1000.0)
+        if "MCH" in self.derived:
+            rows[column["MCH"]] = rows[column["HGB"]] - rows[column["RBC"]]
+            offset[column["MCH"]] = offset[column["HGB"]] - offset[column["RBC"]]
+        if self.platelet_crit:
+            rows[column["PCT"]] = unit("PLT") + unit("MPV")
+            offset[column["PCT"]] = -np.log(10000.0)
+        return rows, offset
+
+    def _calibrate(self, low, high, rounds=5):
+        """按一种性别的参考范围求潜变量的对数均值 (D,) 和因子 (D, D)"""
+        chance = self.variation_chance
+        two_sided = low > 0
+        # 数值保留两位小数后再和参考范围比较，超出范围实际要越过 上限+0.005 / 下限-0.005
+        log_high = np.log(high + 0.005)
+        log_low = np.where(two_sided, np.log(np.maximum(low - 0.005, 1e-3)), -np.inf)
+        # 先验：几何中心、对数半宽（下限为 0 时按 上限/4 计算）
+        log_floor = np.log(np.where(two_sided, low, high / 4))
+        center = (log_floor + log_high) / 2
+        half_width = (log_high - log_floor) / 2
+        spread = half_width / NormalDist().inv_cdf(1 - chance / 2)
+        # 单侧项的标准差取先验值，均值使超出上限的概率为 chance
+        target_mean = np.where(two_sided, center, log_high - NormalDist().inv_cdf(1 - chance) * spread)
+        prior_mean = center[self.latent]
+        prior_spread = spread[self.latent]
+        factor = np.linalg.cholesky(self.correlation * np.outer(prior_spread, prior_spread))
+
+        latent_mean = prior_mean
+        ridge = 1e-3 * np.eye(self.latent_count)
+        for _ in range(rounds):
+            rows, offset = self._linear_rows(latent_mean)
+            system = np.vstack([rows / half_width[:, None], ridge])
+            target = np.concatenate([(target_mean - offset) / half_width, ridge @ prior_mean])
+            latent_mean = np.linalg.lstsq(system, target, rcond=None)[0]
+
+            rows, offset = self._linear_rows(latent_mean)
+            mean = rows @ latent_mean + offset
+            spread_target = np.array([_solve_spread(m, lo, hi, chance) for m, lo, hi in zip(mean, log_low, log_high)])
+            # 对数标准差偏差 → 异常率偏差的换算系数
+            slope = np.array([(_outside_rate(m, s * 1.0001, lo, hi) - chance) / 1e-4
+                              for m, s, lo, hi in zip(mean, spread_target, log_low, log_high)])
+            factor = _fit_factor(rows, np.log(spread_target), np.maximum(slope, 1e-3), factor)
+        return latent_mean, factor
+
+    def _bit_generator(self, seed, start):
+        bit_generator = np.random.PCG64(seed)
+        if start:
+            bit_generator.advance(start * self.draws_per_row)
+        return bit_generator
+
+    def _normals(self, uniforms):
+        """Box-Muller：每两个均匀随机数得到两个独立的标准正态数（消耗的随机数个数固定）"""
+        half = uniforms.shape[1] // 2
+        radius = np.sqrt(-2.0 * np.log1p(-uniforms[:, :half]))  # 1-u ∈ (0, 1]，避免 log(0)
+        angle = 2.0 * np.pi * uniforms[:, half:]
+        return np.concatenate([radius * np.cos(angle), radius * np.sin(angle)], axis=1)
+
+    def _sample_block(self, rng, n, sexes=None):
+        draws = rng.random((n, self.draws_per_row))
+        if sexes is None:
+            sexes = (draws[:, 0] >= 0.5).astype(np.int8)  # 与 LabValueEngine 一样各占一半
+        else:
+            sexes = np.asarray(sexes, dtype=np.int8)
+        normals = self._normals(draws[:, 1:])[:, :self.latent_count]
+        log_values = np.empty_like(normals)
+        for sex in range(len(SEXES)):
+            rows = sexes == sex
+            log_values[rows] = self.log_mean[sex] + normals[rows] @ self.factor[sex].T
+
+        values = np.empty((n, self.item_count))
+        values[:, self.latent] = np.round(np.exp(log_values), 2)
+        column = self._column
+
+        if self.differential:
+            # 分类比率：权重归一化到 100，取整误差计入占比最大的一项，保证合计正好 100.00
+            percent_columns = [column[percent] for percent, _ in DIFFERENTIAL]
+            weights = values[:, percent_columns]
+            percents = np.round(weights * (100.0 / weights.sum(axis=1, keepdims=True)), 2)
+            largest = np.argmax(percents, axis=1)
+            rows = np.arange(n)
+            percents[rows, largest] = 0.0
+            percents[rows, largest] = np.round(100.0 - percents.sum(axis=1), 2)
+            values[:, percent_columns] = percents
+        if self.absolute:
+            wbc = values[:, column["WBC"]]
+            for percent, count in self.absolute:
+                values[:, count] = np.round(wbc * values[:, percent] / 100.0, 2)
+        if self.red_cell:
+            rbc = values[:, column["RBC"]]
+            hct = values[:, column["HCT"]] = np.round(rbc * values[:, column["MCV"]] / 10.0, 2)
+            hgb = values[:, column["HGB"]] = np.round(values[:, column["MCHC"]] * hct / 100.0, 2)
+            values[:, column["MCHC"]] = np.round(hgb * 100.0 / hct, 2)
+        if "MCH" in self.derived:
+            values[:, column["MCH"]] = np.round(values[:, column["HGB"]] / values[:, column["RBC"]], 2)
+        if self.platelet_crit:
+            values[:, column["PCT"]] = np.round(values[:, column["PLT"]] * values[:, column["MPV"]] / 10000.0, 2)
+
+        low = self.low[sexes]
+        high = self.high[sexes]
+        status = np.where(values < low, -1, np.where(values > high, 1, 0)).astype(np.int8)
+        return sexes, values, status
+
+    def sample(self, n, seed, start=0, sexes=None):
+        """生成序号 [start, start+n) 的数据，返回值与 LabValueEngine.sample 相同"""
+        rng = np.random.Generator(self._bit_generator(seed, start))
+        if n <= BLOCK_ROWS:
+            return self._sample_block(rng, n, sexes)
+
+        blocks = []
+        for offset in range(0, n, BLOCK_ROWS):
+            stop = min(offset + BLOCK_ROWS, n)
+            block_sexes = None if sexes is None else np.asarray(sexes)[offset:stop]
+            blocks.append(self._sample_block(rng, stop - offset, block_sexes))
+        return tuple(np.concatenate(parts) for parts in zip(*blocks))
+
+
+def make_value_engine(reference_table, value_model=CORRELATED, mode=TWO_COLS):
+    """按参考范围表构造数值引擎
+
+    value_model="correlated"（默认）返回 CorrelatedValueModel，"independent" 返回按 mode 分布的 LabValueEngine。
+    """
+    if value_model not in VALUE_MODELS:
+        raise ValueError(f"未知的数值模型: {value_model}，可选 {VALUE_MODELS}")
+    low, high = reference_table.bound_lists()
+    if value_model == CORRELATED:
+        return CorrelatedValueModel([record.code for record in reference_table], low, high)
+    return LabValueEngine(low, high, mode=mode)
@@ -0,0 +1,327 @@
+"""声明式版面引擎
+
+两种报告原来各自在代码里写死像素坐标（col_widths、y_start、right_table_start ...）。
+这里把版面描述成数据（layouts/*.json，安装了 PyYAML 时也可以用 YAML），构造生成器时
+compile_layout 把它编译成一份绘制计划：所有坐标都已算成绝对像素，字体已加载成字体对象。
+之后每份报告只是在计划上跑一遍：静态部分画进模板，变化部分按预先算好的位置填值。
+新医院的版式只需要新写一份版面文件。
+
+版面文件结构：
+    name      版面名称（写入标注的 layout 字段）
+    canvas    {"width", "height", "background"}
+    fonts     {字体名: 字号}
+    elements  按绘制顺序排列的元素列表，每个元素可以有 id，供后面的元素用 {"below": id} 定位
+
+元素类型：
+    text    固定文字           {"text", "font", "x", "y", "kind"}
+    fields  "标签 + 取值" 列   {"font", "y", "pitch", "columns": [{"x", "fields": [[标签, 字段名或 null], ...]}]}
+    table   检验项目表格       {"y", "font", "header_font", "columns", "blocks", "row_height", ...}，见 _compile_table
+
+坐标写法：
+    x: 数字（负数表示距右边缘）、"center"（文字水平居中）、{"from": "center" | "right", "offset": n}
+    y: 数字（负数表示距下边缘）、{"from": "bottom", "offset": n}、{"below": 元素 id, "gap": n}
+"""
+import json
+import os
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+LAYOUT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "layouts")
+
+# 表格单元格类型 -> 标注类型
+CELL_KINDS = {"seq": "item_code", "seq_code": "item_code", "name": "item_name",
+              "unit": "unit", "reference": "reference"}
+
+
+def layout_path(name):
+    """内置版面的文件路径，如 layout_path("two_cols")"""
+    return os.path.join(LAYOUT_DIR, f"{name}.json")
+
+
+def load_layout(layout):
+    """读取版面描述：dict 原样返回；字符串为内置版面名或 .json/.yaml 文件路径"""
+    if isinstance(layout, dict):
+        return layout
+    path = layout if os.path.splitext(layout)[1] else layout_path(layout)
+    with open(path, encoding="utf-8") as f:
+        if path.endswith((".yaml", ".yml")):
+            if yaml is None:
+                raise RuntimeError(f"读取 YAML 版面需要安装 PyYAML: {path}")
+            return yaml.safe_load(f)
+        return json.load(f)
+
+
+def load_fonts(spec, font_path, loader):
+    """按版面中的字号加载字体，返回 {字体名: 字体对象}；loader(font_path, size) 负责实际加载"""
+    return {name: loader(font_path, size) for name, size in spec["fonts"].items()}
+
+
+def _text_width(text, font):
+    bbox = font.getbbox(text)
+    return bbox[2] - bbox[0]
+
+
+def _text_height(text, font):
+    bbox = font.getbbox(text)
+    return bbox[3] - bbox[1]
+
+
+def _advance(text, font):
+    return int(round(font.getlength(text)))
+
+
+def _draw_text(draw, text_cache, position, text, font, fill):
+    """绘制文本，返回像素包围盒（空文本返回 None）"""
+    if text_cache is not None:
+        return text_cache.draw_text(draw, position, text, font, fill)
+    if not text:
+        return None
+    draw.text(position, text, font=font, fill=fill)
+    return draw.textbbox(position, text, font=font)
+
+
+def _draw_number(draw, text_cache, position, text, font, fill):
+    """绘制数值：启用文字缓存时由缓存的单个数字拼接"""
+    if text_cache is not None:
+        return text_cache.draw_glyphs(draw, position, text, font, fill)
+    return _draw_text(draw, None, position, text, font, fill)
+
+
+def _annotate(annotations, bbox, kind, text, **attrs):
+    if annotations is None or bbox is None:
+        return
+    annotations.append(dict(kind=kind, text=text, bbox=list(bbox), **attrs))
+
+
+class DrawPlan:
+    """编译后的绘制计划
+
+    static_ops:   ("text", 坐标, 文字, 字体, 标注类型, 标注属性) 或 ("line", 端点, 颜色, 线宽)
+    variable_ops: ("field", 坐标, 字段名, 字体)
+                  或 ("result", 行号, 项目代码, 结果 x, 对齐, 格式, 箭头 x, y, 字体)
+    两者都按版面元素的顺序排列。
+    """
+
+    def __init__(self, name, width, height, background, fill, fonts, static_ops, variable_ops, flags):
+        self.name = name
+        self.width = width
+        self.height = height
+        self.background = background
+        self.fill = fill
+        self.fonts = fonts
+        self.static_ops = static_ops
+        self.variable_ops = variable_ops
+        self.flags = flags
+
+    def draw_static(self, draw, text_cache=None, annotations=None):
+        """绘制所有报告共用的不变内容"""
+        for op in self.static_ops:
+            if op[0] == "text":
+                _, position, text, font, kind, attrs = op
+                bbox = _draw_text(draw, text_cache, position, text, font, self.fill)
+                _annotate(annotations, bbox, kind, text, **attrs)
+            else:
+                _, points, color, width = op
+                draw.line(points, fill=color, width=width)
+
+    def draw_variable(self, draw, fields, results, text_cache=None, annotations=None):
+        """绘制每份报告不同的内容
+
+        fields:  {字段名: 文字}，缺少或为空的字段不绘制
+        results: 按参考范围表顺序的 [(值, 状态)]，状态 1=偏高 -1=偏低 0=正常
+        """
+        fill = self.fill
+        for op in self.variable_ops:
+            if op[0] == "field":
+                _, position, key, font = op
+                value = fields.get(key)
+                if value:
+                    bbox = _draw_text(draw, text_cache, position, value, font, fill)
+                    _annotate(annotations, bbox, "value", value, field=key)
+                continue
+
+            _, row, code, x, align, fmt, flag_x, y, font = op
+            value, status = results[row]
+            text = format(value, fmt) if fmt and isinstance(value, float) else str(value)
+            if align is not None:
+                # 居中：align 为 (列宽, 偏移)
+                x += (align[0] - _text_width(text, font)) // 2 + align[1]
+            bbox = _draw_number(draw, text_cache, (x, y), text, font, fill)
+            _annotate(annotations, bbox, "result", text, code=code, value=value, status=status)
+            if status != 0:
+                arrow = self.flags[status]
+                bbox = _draw_text(draw, text_cache, (flag_x, y), arrow, font, fill)
+                _annotate(annotations, bbox, "flag", arrow, code=code, status=status)
+
+
+class _Compiler:
+    def __init__(self, spec, fonts, reference_table, width, height, mode):
+        self.spec = spec
+        self.fonts = fonts
+        self.reference_table = reference_table
+        self.width = width
+        self.height = height
+        self.mode = mode
+        self.bottoms = {}
+        self.static_ops = []
+        self.variable_ops = []
+
+    def font(self, name):
+        try:
+            return self.fonts[name]
+        except KeyError:
+            raise ValueError(f"版面 {self.spec.get('name')} 引用了未定义的字体: {name}") from None
+
+    def color(self, color):
+        # 1 位图没有灰色，非白色一律画成黑色
+        if self.mode == "1" and color not in ("black", "white"):
+            return "black"
+        return color
+
+    def x(self, value, text_width=None):
+        if value == "center":
+            return (self.width - text_width) // 2
+        if isinstance(value, dict):
+            origin = {"left": 0, "center": self.width // 2, "right": self.width}[value.get("from", "left")]
+            return origin + value.get("offset", 0)
+        return value if value >= 0 else self.width + value
+
+    def y(self, value):
+        if isinstance(value, dict):
+            if "below" in value:
+                try:
+                    return self.bottoms[value["below"]] + value.get("gap", 0)
+                except KeyError:
+                    raise ValueError(f"版面元素引用了不存在或尚未定义的 id: {value['below']}") from None
+            origin = {"top": 0, "bottom": self.height}[value.get("from", "top")]
+            return origin + value.get("offset", 0)
+        return value if value >= 0 else self.height + value
+
+    def text(self, position, text, font, kind, **attrs):
+        self.static_ops.append(("text", position, text, font, kind, attrs))
+
+    def line(self, points, color, width):
+        self.static_ops.append(("line", points, self.color(color), width))
+
+    def compile(self):
+        for element in self.spec["elements"]:
+            kind = element["type"]
+            handler = getattr(self, f"_compile_{kind}", None)
+            if handler is None:
+                raise ValueError(f"未知的版面元素类型: {kind}")
+            bottom = handler(element)
+            if "id" in element:
+                self.bottoms[element["id"]] = bottom
+        flags = {int(status): text for status, text in self.spec.get("flags", {"1": "↑", "-1": "↓"}).items()}
+        canvas = self.spec.get("canvas", {})
+        return DrawPlan(self.spec["name"], self.width, self.height, canvas.get("background", "white"),
+                        self.spec.get("color", "black"), self.fonts, self.static_ops, self.variable_ops, flags)
+
+    def _compile_text(self, element):
+        font = self.font(element["font"])
+        text = element["text"]
+        x = self.x(element["x"], _text_width(text, font))
+        y = self.y(element["y"])
+        self.text((x, y), text, font, element.get("kind", "text"))
+        return y + _text_height(text, font)
+
+    def _compile_fields(self, element):
+        """标签为静态内容，取值紧接在标签之后；字段名为 null 的行只印标签"""
+        font = self.font(element["font"])
+        y0 = self.y(element["y"])
+        pitch = element["pitch"]
+        rows = 0
+        for column in element["columns"]:
+            x = self.x(column["x"])
+            for i, (label, key) in enumerate(column["fields"]):
+                y = y0 + i * pitch
+                if key is None:
+                    self.text((x, y), label, font, "text")
+                else:
+                    self.text((x, y), label, font, "label", field=key)
+                    self.variable_ops.append(("field", (x + _advance(label, font), y), key, font))
+            rows = max(rows, len(column["fields"]))
+        return y0 + rows * pitch
+
+    def _compile_table(self, element):
+        """检验项目表格
+
+        columns:     [{"width", "header", "cell", "dx", "align", "format"}]，cell 为 seq / seq_code / name /
+                     unit / reference / result 或 null
+        blocks:      [{"x", "rows": [起始行, 结束行)}]，并排的子表，行号为参考范围表中的顺序
+        header_dx:   表头相对列起点的偏移
+        separator:   {"offset", "width", "color"}，表头下方的横线（相对表头 y）
+        body_offset: 第一行相对表头 y 的偏移
+        row_rule:    {"offset", "width", "color"}，每行下方的横线（相对行 y），可省略
+        rule_x:      横线的 [起点 x, 终点 x]
+        flag:        {"column", "dx"}，↑/↓ 绘制在哪一列的起点附近
+        """
+        header_font = self.font(element["header_font"])
+        font = self.font(element["font"])
+        columns = element["columns"]
+        row_height = element["row_height"]
+        header_y = self.y(element["y"])
+        body_y = header_y + element["body_offset"]
+        rule_x0, rule_x1 = (self.x(x) for x in element["rule_x"])
+        records = list(self.reference_table)
+
+        blocks = []
+        for block in element["blocks"]:
+            col_x = [self.x(block["x"])]
+            for column in columns:
+                col_x.append(col_x[-1] + column["width"])
+            start, stop = block.get("rows", (0, len(records)))
+            blocks.append((col_x, range(start, stop)))
+
+        for col_x, _ in blocks:
+            for i, column in enumerate(columns):
+                if column.get("header"):
+                    self.text((col_x[i] + element.get("header_dx", 0), header_y), column["header"], header_font,
+                              "header")
+
+        separator = element["separator"]
+        separator_y = header_y + separator["offset"]
+        self.line([(rule_x0, separator_y), (rule_x1, separator_y)], separator.get("color", "black"),
+                  separator.get("width", 1))
+
+        flag = element["flag"]
+        row_rule = element.get("row_rule")
+        max_rows = 0
+        for col_x, rows in blocks:
+            for i, row in enumerate(rows):
+                record = records[row]
+                y = body_y + i * row_height
+                for c, column in enumerate(columns):
+                    cell = column.get("cell")
+                    x = col_x[c] + column.get("dx", 0)
+                    if cell == "result":
+                        align = (column["width"], column.get("dx", 0)) if column.get("align") == "center" else None
+                        flag_x = col_x[flag["column"]] + flag.get("dx", 0)
+                        self.variable_ops.append(("result", row, record.code, col_x[c] if align else x, align,
+                                                  column.get("format"), flag_x, y, font))
+                    elif cell is not None:
+                        text = {"seq": str(record.seq), "seq_code": f"{record.seq} {record.code}",
+                                "name": record.name, "unit": record.unit, "reference": record.ref_text}[cell]
+                        self.text((x, y), text, font, CELL_KINDS[cell], code=record.code)
+                if row_rule is not None:
+                    rule_y = y + row_rule["offset"]
+                    self.line([(rule_x0, rule_y), (rule_x1, rule_y)], row_rule.get("color", "black"),
+                              row_rule.get("width", 1))
+            max_rows = max(max_rows, len(rows))
+        return body_y + max_rows * row_height
+
+
+def compile_layout(spec, fonts, reference_table, width=None, height=None, mode="RGB"):
+    """把版面描述编译为 DrawPlan
+
+    fonts:           {字体名: 字体对象}（见 load_fonts）
+    reference_table: 表格行的项目定义（reference_table.ReferenceTable）
+    width/height:    覆盖版面中的画布尺寸
+    """
+    canvas = spec.get("canvas", {})
+    width = canvas["width"] if width is None else width
+    height = canvas["height"] if height is None else height
+    return _Compiler(spec, fonts, reference_table, width, height, mode).compile()
@@ -0,0 +1,135 @@
+"""预采样的患者/报告元数据池
+
+两列版式每份报告要调用 4 次 Faker 取姓名，另外还有十来次 random.choice/randint。
+池模式下先用 Faker 生成一批姓名（每个进程只做一次），之后整段序号的姓名、科室、诊断、编号等
+都用 NumPy 一次抽取，报告只按下标取值。
+
+和 LabValueEngine 一样，每份报告固定消耗 DRAWS_PER_ROW 个随机数，第 i 份报告的元数据只由
+(种子, i) 决定，按任意区间切分生成的结果都相同。
+
+unique_codes 把序号经过一个带密钥的置换映射为编号，同一批次内编号互不重复，看起来仍是随机的。
+"""
+import math
+
+import numpy as np
+
+from reference_table import SEXES
+
+DEFAULT_POOL_SIZE = 4096
+# 姓名池固定用这个种子生成，各进程的池内容一致
+POOL_SEED = 0
+# 与检验数值使用不同的随机数流
+_STREAM = 0x504F4F4C
+
+# 每份报告消耗的随机数：性别、姓名、病案、费别、标本编号、申请科室、送检医师、条码编号、年龄、
+# 床号×2、临床诊断、修改时间、检验者、审核者
+DRAWS_PER_ROW = 15
+
+_FEISTEL_ROUNDS = 4
+
+
+class NamePool:
+    """用 Faker 预先生成的姓名（男、女、不限性别各 size 个）"""
+
+    def __init__(self, fake, size=DEFAULT_POOL_SIZE, seed=POOL_SEED):
+        if size < 1:
+            raise ValueError(f"姓名池大小至少为 1: {size}")
+        fake.seed_instance(seed)
+        self.male = [fake.name_male() for _ in range(size)]
+        self.female = [fake.name_female() for _ in range(size)]
+        self.any = [fake.name() for _ in range(size)]
+        self.size = size
+
+
+def _pick(u, choices):
+    """按 [0, 1) 均匀数从 choices 中取值"""
+    idx = np.minimum((u * len(choices)).astype(np.int64), len(choices) - 1)
+    return [choices[i] for i in idx.tolist()]
+
+
+def _randint(u, low, high):
+    """按 [0, 1) 均匀数生成 [low, high] 内的整数"""
+    return (low + np.minimum((u * (high - low + 1)).astype(np.int64), high - low)).tolist()
+
+
+class PatientPool:
+    """按序号区间批量抽取两列版式的患者信息和底部信息
+
+    fee_types / departments / diagnoses 为候选取值，与逐份生成时使用的列表相同。
+    """
+
+    def __init__(self, fake, fee_types, departments, diagnoses, size=DEFAULT_POOL_SIZE, seed=POOL_SEED):
+        self.names = NamePool(fake, size, seed)
+        self.fee_types = list(fee_types)
+        self.departments = list(departments)
+        self.diagnoses = list(diagnoses)
+
+    def sample(self, start, stop, run_seed, sexes=None):
+        """抽取序号 [start, stop) 的元数据，返回 {列名: 列表}
+
+        sexes 为 "男"/"女" 列表（通常来自检验数值引擎），为 None 时在这里抽取。
+        底部的修改时间以 "修改小时"（报告时间之前 1~6 小时）给出。
+        """
+        n = stop - start
+        bit_generator = np.random.PCG64(np.random.SeedSequence([run_seed, _STREAM]))
+        if start:
+            bit_generator.advance(start * DRAWS_PER_ROW)
+        u = np.random.Generator(bit_generator).random((n, DRAWS_PER_ROW))
+
+        if sexes is None:
+            sexes = [SEXES[s] for s in (u[:, 0] >= 0.5).tolist()]
+        male = _pick(u[:, 1], self.names.male)
+        female = _pick(u[:, 1], self.names.female)
+        beds = zip(_randint(u[:, 9], 1, 50), _randint(u[:, 10], 1, 10))
+        return {
+            "姓名": [m if sex == "男" else f for sex, m, f in zip(sexes, male, female)],
+            "病案": [f"BA{x}" for x in _randint(u[:, 2], 100000, 999999)],
+            "费别": _pick(u[:, 3], self.fee_types),
+            "标本编号": [str(x) for x in _randint(u[:, 4], 30, 50)],
+            "性别": list(sexes),
+            "申请科室": _pick(u[:, 5], self.departments),
+            "送检医师": _pick(u[:, 6], self.names.any),
+            "条码编号": [f"TM{x}" for x in _randint(u[:, 7], 100000, 999999)],
+            "年龄": [str(x) for x in _randint(u[:, 8], 18, 80)],
+            "床号": [f"{bed}-{sub}" for bed, sub in beds],
+            "标本种类": ["全血"] * n,
+            "临床诊断": _pick(u[:, 11], self.diagnoses),
+            "修改小时": _randint(u[:, 12], 1, 6),
+            "检验者": _pick(u[:, 13], self.names.any),
+            "审核者": _pick(u[:, 14], self.names.any),
+        }
+
+
+def _round_keys(key):
+    return np.random.SeedSequence(key).generate_state(_FEISTEL_ROUNDS, dtype=np.uint64)
+
+
+def _feistel(x, half_bits, keys):
+    mask = np.uint64((1 << half_bits) - 1)
+    left, right = x >> np.uint64(half_bits), x & mask
+    for k in keys:
+        # 轮函数：乘法散列，结果截断到半宽
+        f = ((right + k) * np.uint64(0x9E3779B97F4A7C15)) >> np.uint64(64 - half_bits)
+        left, right = right, left ^ (f & mask)
+    return (left << np.uint64(half_bits)) | right
+
+
+def unique_codes(indices, low, high, key):
+    """把互不相同的序号映射为 [low, high] 内互不相同的整数
+
+    使用带密钥的 Feistel 置换并循环游走回到取值范围内，是 [0, 容量) 上的一一映射。
+    序号超出容量（high - low + 1）时抛出 ValueError。
+    """
+    capacity = high - low + 1
+    x = np.asarray(indices, dtype=np.uint64)
+    if x.size and int(x.max()) >= capacity:
+        raise ValueError(f"序号 {int(x.max())} 超出唯一编号容量 {capacity}（{low}-{high}）")
+    half_bits = max(1, math.ceil(math.log2(max(capacity, 2)) / 2))
+    keys = _round_keys(key)
+    with np.errstate(over="ignore"):
+        y = _feistel(x, half_bits, keys)
+        pending = y >= capacity
+        while pending.any():
+            y[pending] = _feistel(y[pending], half_bits, keys)
+            pending = y >= capacity
+    return (y + np.uint64(low)).astype(np.int64).tolist()
@@ -0,0 +1,109 @@
+"""批量生成的进度条（限频刷新）
+
+原来每生成一份报告打印一行，几十万份时终端输出本身就成了可观的开销，日志也被刷屏。
+ProgressBar 只在距上次刷新超过 interval 秒时才重绘一次：终端上用回车原地刷新，
+输出重定向到文件时每隔 10 秒追加一行。显示已完成份数、百分比、实时速度（份/秒，指数平滑）和预计剩余时间。
+
+计数有两种来源，可以混用：
+    update(n)         当前进程每生成一份报告调用（串行运行时逐份推进）
+    chunk_done(count) 主进程收到一个区间的结果时调用（并行运行时按区间推进），
+                      同时清零当前区间内逐份累计的数，避免串行运行时重复计数
+"""
+import sys
+import time
+
+# 实时速度的平滑系数：越大越跟随最近的速度
+_SMOOTHING = 0.3
+
+
+def format_duration(seconds):
+    """秒数格式化为 [H:]MM:SS"""
+    seconds = int(round(seconds))
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes:02d}:{seconds:02d}"
+
+
+class ProgressBar:
+    """total 份报告的进度条；initial 为已完成的份数（如续跑时已完成的区间）"""
+
+    def __init__(self, total, initial=0, stream=None, interval=None, width=30):
+        self.stream = sys.stderr if stream is None else stream
+        self.interactive = getattr(self.stream, "isatty", lambda: False)()
+        self.interval = interval if interval is not None else (0.2 if self.interactive else 10.0)
+        self.total = total
+        self.initial = initial
+        self.width = width
+        self.completed = initial  # 已收到结果的区间内的份数
+        self.live = 0             # 当前进程正在生成的区间内已完成的份数
+        self.rate = None
+        self.started = time.perf_counter()
+        self._last_draw = self.started
+        self._last_done = initial
+        self._closed = False
+        self._drawn = 0  # 终端上一次输出的长度，较短的新行用空格盖住旧内容
+
+    @property
+    def done(self):
+        return min(self.completed + self.live, self.total)
+
+    def update(self, n=1):
+        self.live += n
+        self._maybe_draw()
+
+    def chunk_done(self, count):
+        self.completed += count
+        self.live = 0
+        self._maybe_draw()
+
+    def _maybe_draw(self):
+        now = time.perf_counter()
+        if now - self._last_draw >= self.interval:
+            self._sample(now)
+            self._draw(now)
+
+    def _sample(self, now):
+        done = self.done
+        instant = (done - self._last_done) / (now - self._last_draw)
+        self.rate = instant if self.rate is None else _SMOOTHING * instant + (1 - _SMOOTHING) * self.rate
+        self._last_draw, self._last_done = now, done
+
+    def _line(self, now, final=False):
+        done = self.done
+        fraction = done / self.total if self.total else 1.0
+        filled = int(self.width * fraction)
+        bar = "#" * filled + "-" * (self.width - filled)
+        text = f"[{bar}] {done}/{self.total} {fraction:6.1%}"
+        elapsed = now - self.started
+        if final:
+            average = (done - self.initial) / elapsed if elapsed > 0 else 0.0
+            return f"{text}  {average:.1f} 份/秒  用时 {format_duration(elapsed)}"
+        if self.rate:
+            text += f"  {self.rate:.1f} 份/秒  剩余 {format_duration((self.total - done) / self.rate)}"
+        return text
+
+    def _draw(self, now):
+        if self.interactive:
+            line = self._line(now)
+            self.stream.write("\r" + line.ljust(self._drawn))
+            self._drawn = len(line)
+        else:
+            self.stream.write(self._line(now) + "\n")
+        self.stream.flush()
+
+    def close(self):
+        """结束时输出最终一行（平均速度和总用时）"""
+        if self._closed:
+            return
+        self._closed = True
+        line = self._line(time.perf_counter(), final=True)
+        if self.interactive:
+            line = "\r" + line.ljust(self._drawn)
+        self.stream.write(line + "\n")
+        self.stream.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,152 @@
+"""预解析的参考范围表
+
+项目定义（projects_left/projects_right、data_template）在生成器构造时编译一次，
+之后生成数值、判断 ↑/↓ 都只查表，不再解析字符串。参考值写错会在加载时直接报错，
+而不是悄悄变成 (0, 100)。
+"""
+import math
+import re
+
+SEXES = ("男", "女")
+
+_RANGE_RE = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*-\s*(\d+(?:\.\d+)?)\s*$")
+_SEGMENT_SPLIT_RE = re.compile(r"[；;，,]")
+
+
+def parse_range(text):
+    """解析 "low-high"，格式不对或 low > high 时抛出 ValueError"""
+    match = _RANGE_RE.match(text)
+    if not match:
+        raise ValueError(f"无法解析参考范围: {text!r}")
+    low, high = float(match.group(1)), float(match.group(2))
+    if low > high:
+        raise ValueError(f"参考范围下限大于上限: {text!r}")
+    return low, high
+
+
+def parse_reference_text(ref_str):
+    """把参考值文本解析为 {性别: (low, high)}
+
+    支持 "4-10"、"男：0-15"、"男：0-15；女：0-20"。只写了一个性别时，
+    另一性别沿用同一范围（与原 parse_reference_range 的行为一致）。
+    """
+    if not isinstance(ref_str, str) or not ref_str.strip():
+        raise ValueError(f"参考范围为空: {ref_str!r}")
+
+    shared = None
+    by_sex = {}
+    for segment in _SEGMENT_SPLIT_RE.split(ref_str):
+        segment = segment.strip()
+        if not segment:
+            continue
+        if "：" in segment or ":" in segment:
+            sex, _, range_text = segment.replace(":", "：").partition("：")
+            sex = sex.strip()
+            if sex not in SEXES:
+                raise ValueError(f"参考范围中的性别无法识别: {ref_str!r}")
+            by_sex[sex] = parse_range(range_text)
+        else:
+            shared = parse_range(segment)
+
+    if shared is None:
+        if not by_sex:
+            raise ValueError(f"无法解析参考范围: {ref_str!r}")
+        shared = next(iter(by_sex.values()))
+    return {sex: by_sex.get(sex, shared) for sex in SEXES}
+
+
+class ReferenceRange:
+    """单个检验项目的参考范围（按性别）"""
+
+    __slots__ = ("seq", "code", "name", "unit", "ref_text",
+                 "male_low", "male_high", "female_low", "female_high")
+
+    def __init__(self, seq, code, name, unit, ref_text, male, female):
+        for low, high in (male, female):
+            if not (math.isfinite(low) and math.isfinite(high)) or low > high:
+                raise ValueError(f"项目 {code} 的参考范围无效: {male} / {female}")
+        self.seq = seq
+        self.code = code
+        self.name = name
+        self.unit = unit
+        self.ref_text = ref_text
+        self.male_low, self.male_high = male
+        self.female_low, self.female_high = female
+
+    def bounds(self, gender="男"):
+        if gender == "女":
+            return self.female_low, self.female_high
+        return self.male_low, self.male_high
+
+    def flag(self, value, gender="男"):
+        """1=偏高 -1=偏低 0=正常"""
+        low, high = self.bounds(gender)
+        if value < low:
+            return -1
+        if value > high:
+            return 1
+        return 0
+
+    def __repr__(self):
+        return (f"ReferenceRange({self.seq}, {self.code!r}, 男 {self.male_low}-{self.male_high}, "
+                f"女 {self.female_low}-{self.female_high})")
+
+
+class ReferenceTable:
+    """按报告顺序排列的参考范围表"""
+
+    __slots__ = ("records", "_by_code")
+
+    def __init__(self, records):
+        self.records = list(records)
+        self._by_code = {}
+        for record in self.records:
+            if record.code in self._by_code:
+                raise ValueError(f"项目代码重复: {record.code}")
+            self._by_code[record.code] = record
+
+    @classmethod
+    def from_projects(cls, projects, sex_specific_refs=None):
+        """由 (seq, code, name, unit, ref, ...) 形式的项目定义编译
+
+        sex_specific_refs: {code: {性别: "low-high"}}，覆盖报告上印的参考值，用于按性别生成数值。
+        """
+        sex_specific_refs = sex_specific_refs or {}
+        records = []
+        for seq, code, name, unit, ref, *_ in projects:
+            try:
+                bounds = parse_reference_text(ref)
+                for sex, range_text in sex_specific_refs.get(code, {}).items():
+                    bounds[sex] = parse_range(range_text)
+            except ValueError as e:
+                raise ValueError(f"项目 {seq} {code}: {e}") from None
+            records.append(ReferenceRange(seq, code, name, unit, ref, bounds["男"], bounds["女"]))
+        return cls(records)
+
+    @classmethod
+    def from_data_template(cls, data_template):
+        """由 (名称, 单位, low, high) 形式的项目定义编译（不区分性别）"""
+        records = []
+        for seq, (name, unit, low, high) in enumerate(data_template, 1):
+            try:
+                bounds = (float(low), float(high))
+            except (TypeError, ValueError):
+                raise ValueError(f"项目 {seq} {name} 的参考范围不是数值: {low!r}-{high!r}") from None
+            code = name.split()[-1]  # 名称末尾为英文缩写，如 "白细胞计数 WBC"
+            records.append(ReferenceRange(seq, code, name, unit, f"{low}-{high}", bounds, bounds))
+        return cls(records)
+
+    def __len__(self):
+        return len(self.records)
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def __getitem__(self, code):
+        return self._by_code[code]
+
+    def bound_lists(self):
+        """返回 (low, high)，各为 [男性列表, 女性列表]，供 LabValueEngine 使用"""
+        low = [[r.male_low for r in self.records], [r.female_low for r in self.records]]
+        high = [[r.male_high for r in self.records], [r.female_high for r in self.records]]
+        return low, high
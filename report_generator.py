@@ -0,0 +1,554 @@
+"""两种版式共用的报告生成器基类
+
+版面已经是数据（见 layout_engine.py），两种报告剩下的差别只是 数据模板 和 每份报告的数据怎么抽样。
+ReportGenerator 负责其余的一切：字体和绘制计划、模板缓存、绘制与标注、画布池、逐份 / 流式产出、
+文件 / tar 分片 / 矢量文档三种区间写出，以及多进程、检查点、分布式队列和进度条的批量编排。
+
+子类（generate_one_col.py / generate_two_cols.py 中的 BloodReportGenerator）只提供：
+    build_reference_table()                      参考范围表（数据模板）
+    iter_report_data(start, stop, 种子, 报告时间)  逐份产出 (序号, 报告数据)，报告只由 (种子, 序号) 决定
+    variable_content(数据, 报告时间)              绘制计划的可变内容 (字段取值, [(结果, 状态)])
+    build_ground_truth(序号, 数据, 报告时间, 标注)  结构化标注
+    report_filename(序号, 标注, 报告时间)          sink="files" 时的文件名
+以及类属性 value_mode、font_candidates、font_fallback、default_dpi、id_range。
+"""
+import datetime
+import functools
+import os
+import random
+import sys
+import time
+
+from PIL import Image, ImageDraw, ImageFont
+
+from annotations import (ANNOTATION_FORMATS, JsonlWriter, annotation_record, clear_annotation_parts,
+                         merge_annotation_parts, part_path)
+from augment import AugmentPipeline
+from batch_runner import chunk_ranges, derive_seed, new_run_seed, run_chunks
+from canvas_pool import CanvasPool, peak_rss, pool_capacity
+from checkpoint import RunCheckpoint, run_config
+from encoders import CANVAS_MODES, ImageEncoder
+from font_resolver import resolve_font
+from lab_values import CORRELATED, TWO_COLS, make_value_engine
+from layout_engine import compile_layout, load_fonts, load_layout
+from progress import ProgressBar
+from shard_sink import (DEFAULT_SHARD_SIZE, INDEX_FILENAME, ShardSink, encode_label, finalize_index, sample_key,
+                        shard_path)
+from stage_timer import StageTimer
+from text_cache import TextMaskCache
+from vector_output import VECTOR_FORMATS, document_path, open_document, remove_partial_documents
+from work_queue import DEFAULT_LEASE_SECONDS, QUEUE_DIRNAME, run_queue
+from write_pipeline import DEFAULT_MAX_PENDING, DEFAULT_WRITERS, PipelineStats, WritePipeline
+
+
+NO_FONT_MESSAGE = "没有找到可用的中文字体，可用环境变量 BLOOD_REPORT_FONT 指定字体文件"
+
+
+class ReportGenerator:
+    """报告生成器基类，子类提供数据模板和每份报告的数据抽样（见模块说明）"""
+
+    status_tips = {0: "", 1: "↑", -1: "↓"}
+    # 数值引擎的分布模式（lab_values.TWO_COLS / ONE_COL）
+    value_mode = TWO_COLS
+    # 优先使用的字体，都不存在时从本机字体索引中找中文字体
+    font_candidates = []
+    # 找不到中文字体时退回 Pillow 默认字体（否则报错）
+    font_fallback = False
+    # 默认编码器写入 PNG 的 DPI，None 为不写
+    default_dpi = None
+    # unique_ids 模式下编号的取值范围
+    id_range = (100000, 999999)
+
+    def __init__(self, layout, width=None, height=None, template_cache=True, text_cache=True, mode="RGB",
+                 encoder=None, unique_ids=False, profile=False, augment=None, reuse_canvas=False,
+                 value_model=CORRELATED):
+        # 版面描述，width/height 可覆盖其中的画布尺寸
+        self.layout_spec = load_layout(layout)
+        self.width = self.layout_spec["canvas"]["width"] if width is None else width
+        self.height = self.layout_spec["canvas"]["height"] if height is None else height
+        self.bg_color = self.layout_spec["canvas"].get("background", "white")
+
+        # 画布模式（白底黑字，可用 "L" 或 "1" 减少内存和编码时间）与输出编码
+        if mode not in CANVAS_MODES:
+            raise ValueError(f"不支持的画布模式: {mode}")
+        self.mode = mode
+        if encoder is None:
+            encoder = ImageEncoder("png", dpi=self.default_dpi)
+        self.encoder = encoder
+        self.rng = random.Random()
+        # 同一批次内编号互不重复
+        self.unique_ids = unique_ids
+
+        # 分阶段计时（profile=True 时启用），最近一次批量生成的写出统计
+        self.profiler = StageTimer(profile)
+        self.last_stats = None
+        # 批量生成期间的进度条（只在主进程中设置，串行运行时逐份推进）
+        self.progress = None
+
+        # 扫描效果增强（augment.AugmentPipeline 或效果列表），在同一进程内紧接着绘制执行
+        self.augment = AugmentPipeline(augment) if isinstance(augment, (list, tuple)) else augment
+
+        # 画布复用：每个进程一个画布池，画布原地重置后反复使用（见 canvas_pool.py）
+        self.reuse_canvas = reuse_canvas
+        self._canvas_pool = None
+
+        # 静态模板缓存：不变的内容只绘制一次，每份报告从模板副本开始
+        self.use_template_cache = template_cache
+        self._template_cache = {}
+
+        # 文字蒙版缓存：重复出现的文字只栅格化一次
+        self.text_cache = TextMaskCache() if text_cache else None
+
+        # 字体和绘制计划在第一次用到时才加载，只分发任务的主进程不必付出这部分开销
+        self.font_path = None
+        self._fonts = None
+        self._plan = None
+
+        # 参考范围只在构造时编译一次，写错会在这里直接报错
+        self.reference_table = self.build_reference_table()
+
+        # 批量数值生成：一次生成整批数据（见 lab_values.py）
+        self.value_model = value_model
+        self.value_engine = make_value_engine(self.reference_table, value_model, self.value_mode)
+
+    # 子类提供
+
+    def build_reference_table(self):
+        raise NotImplementedError
+
+    def iter_report_data(self, start, stop, run_seed, report_time):
+        """逐份产出序号 [start, stop) 的 (序号, 报告数据)（不绘制）"""
+        raise NotImplementedError
+
+    def variable_content(self, data, report_time):
+        """绘制计划的可变内容：(字段取值, [(结果, 状态)])"""
+        raise NotImplementedError
+
+    def build_ground_truth(self, index, data, report_time, annotations=None):
+        """整理单份报告的结构化标注"""
+        raise NotImplementedError
+
+    def report_filename(self, index, truth, report_time):
+        """sink="files" 时单份报告的文件名"""
+        raise NotImplementedError
+
+    # 字体与绘制计划
+
+    @property
+    def fonts(self):
+        """按版面描述的字号加载字体（第一次使用时）
+
+        每个工作进程都会加载一次，所以这里不打印使用的字体（批量生成时由主进程打印一次，见 run_batch）。
+        """
+        if self._fonts is None:
+            self.font_path = resolve_font(self.font_candidates)
+            try:
+                if not self.font_path:
+                    raise RuntimeError(NO_FONT_MESSAGE)
+                self._fonts = load_fonts(self.layout_spec, self.font_path, ImageFont.truetype)
+            except Exception as e:
+                if not self.font_fallback:
+                    raise
+                if self.font_path:
+                    print(f"字体加载失败: {e}，使用 Pillow 默认字体", file=sys.stderr)
+                self.font_path = None
+                self._fonts = {name: ImageFont.load_default() for name in self.layout_spec["fonts"]}
+        return self._fonts
+
+    @property
+    def plan(self):
+        """版面编译后的绘制计划：坐标、字体只计算一次"""
+        if self._plan is None:
+            self._plan = compile_layout(self.layout_spec, self.fonts, self.reference_table, self.width,
+                                        self.height, self.mode)
+        return self._plan
+
+    # 绘制
+
+    def template_key(self):
+        """静态模板的缓存键：版面 + 尺寸 + 字体"""
+        return (self.plan.name, self.width, self.height, self.mode) + tuple(
+            (name, getattr(font, "path", None), getattr(font, "size", None)) for name, font in self.fonts.items())
+
+    def get_template(self):
+        """获取静态模板图层（标题、字段标签、表头、项目名称、分隔线、底部说明等不变内容）及其标注"""
+        key = self.template_key()
+        cached = self._template_cache.get(key)
+        if cached is None:
+            template = Image.new(self.mode, (self.width, self.height), self.bg_color)
+            static_annotations = []
+            self.draw_static_layer(ImageDraw.Draw(template), static_annotations)
+            cached = self._template_cache[key] = (template, static_annotations)
+        return cached
+
+    def draw_static_layer(self, draw, annotations=None):
+        """绘制所有报告共用的不变内容"""
+        self.plan.draw_static(draw, self.text_cache, annotations)
+
+    def draw_variable_layer(self, draw, data, report_time, annotations=None):
+        """绘制每份报告不同的内容"""
+        fields, results = self.variable_content(data, report_time)
+        self.plan.draw_variable(draw, fields, results, self.text_cache, annotations)
+
+    def create_report_image(self, data, report_time, annotations=None, canvas_pool=None):
+        """创建报告单图片，启用模板缓存时只在模板副本上绘制变化的内容
+
+        传入列表 annotations 时，把每个文字框的标注（类型、文字、包围盒等）追加进去。
+        传入 canvas_pool 时从池中取画布原地重置，不新建图片；用完后需归还（release）。
+        """
+        with self.profiler.stage("template"):
+            if self.use_template_cache:
+                template, static_annotations = self.get_template()
+                if canvas_pool is not None:
+                    image, draw = canvas_pool.acquire(template)
+                else:
+                    image = template.copy()
+                    draw = ImageDraw.Draw(image)
+                if annotations is not None:
+                    annotations.extend(static_annotations)
+            else:
+                if canvas_pool is not None:
+                    image, draw = canvas_pool.acquire()
+                else:
+                    image = Image.new(self.mode, (self.width, self.height), self.bg_color)
+                    draw = ImageDraw.Draw(image)
+                self.draw_static_layer(draw, annotations)
+
+        with self.profiler.stage("draw"):
+            self.draw_variable_layer(draw, data, report_time, annotations)
+        return image
+
+    def render_data(self, index, data, report_time, seed=None, canvas_pool=None):
+        """绘制一份报告并整理标注，返回 (图片, 标注)；增强参数与报告种子 seed 绑定
+
+        传入 canvas_pool 时图片来自画布池，调用方处理完后要归还。
+        """
+        annotations = []
+        image = self.create_report_image(data, report_time, annotations, canvas_pool)
+        with self.profiler.stage("annotate"):
+            truth = self.build_ground_truth(index, data, report_time, annotations)
+        if self.augment is not None:
+            with self.profiler.stage("augment"):
+                canvas = image
+                image, truth = self.augment.augment_report(image, truth, seed)
+            if canvas_pool is not None:
+                canvas_pool.release(canvas)  # 增强结果是新图片，画布可以马上复用
+        return image, truth
+
+    def get_canvas_pool(self, writers, max_pending):
+        """复用模式下本进程的画布池（容量按写出流水线的参数确定），未启用复用时返回 None"""
+        if not self.reuse_canvas:
+            return None
+        capacity = pool_capacity(writers, max_pending)
+        if self._canvas_pool is None or self._canvas_pool.capacity < capacity:
+            self._canvas_pool = CanvasPool(self.mode, (self.width, self.height), capacity, self.bg_color)
+        return self._canvas_pool
+
+    # 逐份 / 流式产出
+
+    def iter_range(self, start, stop, run_seed, report_time, canvas_pool=None):
+        """逐份生成序号 [start, stop) 的报告，产出 (序号, 图片, 标注)
+
+        传入 canvas_pool 时图片来自画布池，调用方处理完后要归还。
+        """
+        with self.profiler.stage("layout"):
+            self.plan  # 第一次使用时加载字体、编译版面
+        for index, data in self.iter_report_data(start, stop, run_seed, report_time):
+            image, truth = self.render_data(index, data, report_time, derive_seed(run_seed, index), canvas_pool)
+            yield index, image, truth
+
+    def render_report(self, index, seed, report_time):
+        """只重算序号为 index 的一份报告，返回 (图片, 标注)
+
+        每份报告的随机数只由 (seed, index) 决定，不需要先生成前面的报告，耗时与 index 无关。
+        """
+        _, image, truth = next(self.iter_range(index, index + 1, seed, report_time))
+        return image, truth
+
+    def iter_reports(self, n, seed=None, start=0, report_time=None, chunk_size=64, raw=False):
+        """惰性产出 n 份报告的 (图片, 标注)，不写文件
+
+        每次只在内存中保留一个区间（chunk_size 份）的数值和一张图片。
+        raw=True 时产出未压缩的像素字节串（尺寸和模式见标注中的 image 字段）。
+        """
+        run_seed = new_run_seed() if seed is None else seed
+        if report_time is None:
+            report_time = datetime.datetime.now()
+        for chunk_start, chunk_stop in chunk_ranges(start, start + n, chunk_size):
+            for _, image, truth in self.iter_range(chunk_start, chunk_stop, run_seed, report_time):
+                yield (image.tobytes() if raw else image), truth
+
+    # 区间写出（多进程时在工作进程中执行）
+
+    def encode_image(self, image):
+        """按当前编码器编码为字节串"""
+        return self.encoder.encode(image)
+
+    def generate_range(self, start, stop, run_seed, report_time, output_dir, annotation_format=None,
+                       writers=DEFAULT_WRITERS, max_pending=DEFAULT_MAX_PENDING):
+        """生成序号 [start, stop) 的报告并保存，返回 (文件路径列表, 写出统计)
+
+        编码和写盘交给 writers 个后台线程，最多 max_pending 张图片排队等待写出。
+        annotation_format 不为 None 时，同时把本区间的标注批量写入标注分片。
+        """
+        writer = JsonlWriter(part_path(output_dir, start)) if annotation_format else None
+        pool = self.get_canvas_pool(writers, max_pending)
+        pipeline = WritePipeline(self.encoder, writers=writers, max_pending=max_pending,
+                                 release=pool.release if pool is not None else None)
+        paths = []
+        try:
+            for index, image, truth in self.profiler.timed(self.iter_range(start, stop, run_seed, report_time, pool)):
+                path = os.path.join(output_dir, self.report_filename(index, truth, report_time))
+                pipeline.submit(image, path)
+                if writer is not None:
+                    writer.write(annotation_record(truth, os.path.basename(path)))
+                if self.progress is not None:
+                    self.progress.update()
+                paths.append(path)
+            pipeline.close()  # 等待写完，写线程的错误在这里抛出
+        except BaseException:
+            # 出错时保留原来的异常；丢弃本区间写了一半的标注分片
+            pipeline.close(raise_error=False)
+            if writer is not None:
+                writer.discard()
+            raise
+        finally:
+            stats = pipeline.close(raise_error=False)
+            stats.peak_rss = peak_rss()[0]
+            if self.profiler.enabled:
+                stats.stages = self.profiler.drain()
+            if writer is not None:
+                writer.close()
+        return paths, stats
+
+    def generate_shard_range(self, start, stop, run_seed, report_time, output_dir, shard_size,
+                             annotation_format=None, writers=DEFAULT_WRITERS, max_pending=DEFAULT_MAX_PENDING):
+        """把序号 [start, stop) 的报告写入 tar 分片，返回 (写过的分片编号, 写出统计)
+
+        tar 成员必须按序写入，所以分片输出最多使用一个写线程。
+        """
+        writer = JsonlWriter(part_path(output_dir, start)) if annotation_format else None
+        pool = self.get_canvas_pool(min(writers, 1), max_pending)
+        pipeline = WritePipeline(self.encoder, writers=min(writers, 1), max_pending=max_pending,
+                                 release=pool.release if pool is not None else None)
+        sink = ShardSink(output_dir, shard_size, mtime=report_time.timestamp())
+        extension = self.encoder.extension
+
+        def append_sample(index, label):
+            return lambda data: sink.write(index, {extension: data, "json": label})
+
+        try:
+            for index, image, truth in self.profiler.timed(self.iter_range(start, stop, run_seed, report_time, pool)):
+                if writer is not None:
+                    shard = os.path.basename(shard_path(output_dir, index // shard_size))
+                    writer.write(annotation_record(truth, f"{shard}/{sample_key(index)}.{extension}"))
+                pipeline.submit(image, append_sample(index, encode_label(truth)))
+                if self.progress is not None:
+                    self.progress.update()
+            pipeline.close()  # 等待写完，写线程的错误在这里抛出
+        except BaseException:
+            # 出错时保留原来的异常；先停下写线程，再丢弃写了一半的分片，不留下截断的 tar
+            pipeline.close(raise_error=False)
+            sink.discard()
+            if writer is not None:
+                writer.discard()
+            raise
+        finally:
+            stats = pipeline.close(raise_error=False)
+            stats.peak_rss = peak_rss()[0]
+            if self.profiler.enabled:
+                stats.stages = self.profiler.drain()
+            shard_ids = sink.close()
+            if writer is not None:
+                writer.close()
+        return shard_ids, stats
+
+    def generate_document_range(self, start, stop, run_seed, report_time, output_dir, shard_size, sink="pdf",
+                                annotation_format=None, writers=DEFAULT_WRITERS, max_pending=DEFAULT_MAX_PENDING):
+        """把序号 [start, stop) 的报告作为矢量页面写入一个多页 PDF / SVG 文档，返回 ([文档路径], 写出统计)
+
+        不经过位图：同样的报告数据和绘制计划直接画在 vector_output.VectorPage 上，每页画完即写入文档。
+        文档按序写出，writers / max_pending 不起作用。
+        """
+        with self.profiler.stage("layout"):
+            plan = self.plan
+        path = document_path(output_dir, start // shard_size, sink)
+        name = os.path.basename(path)
+        stats = PipelineStats()
+        writer = document = None
+        try:
+            writer = JsonlWriter(part_path(output_dir, start)) if annotation_format else None
+            document = open_document(path, self.width, self.height, sink, background=plan.background)
+            static_annotations = []
+            plan.draw_static(document.template(), None, static_annotations)
+            for index, data in self.profiler.timed(self.iter_report_data(start, stop, run_seed, report_time)):
+                annotations = list(static_annotations)
+                fields, results = self.variable_content(data, report_time)
+                with self.profiler.stage("draw"):
+                    t0 = time.perf_counter()
+                    page = document.new_page()
+                    stats.write_seconds += time.perf_counter() - t0
+                    plan.draw_variable(page, fields, results, None, annotations)
+                if writer is not None:
+                    truth = self.build_ground_truth(index, data, report_time, annotations)
+                    writer.write(annotation_record(truth, f"{name}#page={index - start + 1}"))
+                stats.reports += 1
+                if self.progress is not None:
+                    self.progress.update()
+        except BaseException:
+            # 出错时丢弃写了一半的文档和标注分片，不留下截断的文件
+            if document is not None:
+                document.discard()
+            if writer is not None:
+                writer.discard()
+            raise
+        finally:
+            if document is not None:
+                t0 = time.perf_counter()
+                document.close()
+                stats.write_seconds += time.perf_counter() - t0
+                stats.bytes = document.bytes_written
+            stats.peak_rss = peak_rss()[0]
+            if self.profiler.enabled:
+                stats.stages = self.profiler.drain()
+            if writer is not None:
+                writer.close()
+        return [path], stats
+
+    # 批量编排（主进程）
+
+    def factory_kwargs(self):
+        """工作进程重建同样生成器的构造参数"""
+        return {"layout": self.layout_spec,
+                "width": self.width,
+                "height": self.height,
+                "unique_ids": self.unique_ids,
+                "profile": self.profiler.enabled,
+                "augment": self.augment,
+                "reuse_canvas": self.reuse_canvas,
+                "template_cache": self.use_template_cache,
+                "text_cache": self.text_cache is not None,
+                "value_model": self.value_model,
+                "mode": self.mode,
+                "encoder": self.encoder}
+
+    def run_batch(self, count, output_dir, workers=1, seed=None, chunk_size=64, report_time=None, sink="files",
+                  shard_size=DEFAULT_SHARD_SIZE, annotation_format=None, writers=DEFAULT_WRITERS,
+                  max_pending=DEFAULT_MAX_PENDING, start=0, resume=False, distributed=False,
+                  lease_seconds=DEFAULT_LEASE_SECONDS, progress=True):
+        """批量生成 count 份报告
+
+        workers > 1 时使用多进程并行生成；相同 seed 与 report_time 下输出与串行逐字节一致。
+        sink="files" 每份报告一个图片文件，返回文件路径列表；
+        sink="shards" 写入每个 shard_size 份的 tar 分片和 index.jsonl，返回索引文件路径；
+        sink="pdf" / "svg" 不栅格化，每 shard_size 份写成一个多页矢量文档（见 vector_output.py），返回文档路径列表。
+        annotation_format="jsonl" / "coco" 时另外导出带包围盒的标注文件（annotations.jsonl / annotations.coco.json）。
+        每个进程内编码和写盘由 writers 个后台线程完成（0 为同步写出），max_pending 限制排队的图片数；
+        结束时打印吞吐量和队列深度统计；profile=True 构造的生成器另外打印分阶段耗时。
+        合并后的统计保存在 self.last_stats。
+        start 为第一份报告的全局序号，生成序号 [start, start + count)：多台机器可以用同一 seed 和 report_time
+        各自生成不相交的区间（分片输出时 start 须为 shard_size 的整数倍）。
+        resume=True 时在输出目录记录检查点（见 checkpoint.py）；中断后用同样的参数重跑，沿用原来的种子和
+        报告时间，只生成未完成的区间。
+        distributed=True 时作为协调者：区间写入 <output_dir>/_queue 的租约文件队列（见 work_queue.py），
+        由本机启动的 workers 个工作进程和其他机器上的 `python work_queue.py worker <output_dir>/_queue`
+        共同领取；工作进程崩溃后其租约在 lease_seconds 秒后过期，区间由其他工作进程重做。
+        progress=True 时在 stderr 显示限频刷新的进度条（见 progress.py）：串行时逐份推进，并行时按区间推进。
+        """
+        if sink not in ("files", "shards") and sink not in VECTOR_FORMATS:
+            raise ValueError(f"未知的输出方式: {sink}")
+        if sink in VECTOR_FORMATS and self.augment is not None:
+            raise ValueError("扫描效果增强作用于位图，不能与矢量输出同时使用")
+        if annotation_format is not None and annotation_format not in ANNOTATION_FORMATS:
+            raise ValueError(f"未知的标注格式: {annotation_format}")
+        if start < 0:
+            raise ValueError(f"起始序号不能为负: {start}")
+        if sink != "files" and start % shard_size:
+            raise ValueError(f"分片或矢量输出时起始序号须为 shard_size 的整数倍: {start}")
+        if self.unique_ids and start + count > self.id_range[1] - self.id_range[0] + 1:
+            raise ValueError(f"unique_ids 模式下序号不能超过 {self.id_range[1] - self.id_range[0] + 1}")
+        # 字体只在主进程中确定并打印一次，找不到且不能退回默认字体时在启动工作进程之前报错
+        font_path = resolve_font(self.font_candidates)
+        if font_path is None and not self.font_fallback:
+            raise RuntimeError(NO_FONT_MESSAGE)
+        print(f"使用字体: {font_path}" if font_path else "没有找到中文字体，使用 Pillow 默认字体", file=sys.stderr)
+        if not os.path.exists(output_dir):
+            os.makedirs(output_dir)
+
+        started = time.perf_counter()
+        factory = type(self)
+        factory_kwargs = self.factory_kwargs()
+        # 分片 / 矢量输出时任务按分片边界切分，每个分片（文档）只由一个进程写
+        if sink != "files":
+            chunk_size = shard_size
+        chunks = list(chunk_ranges(start, start + count, chunk_size))
+        checkpoint = None
+        if resume:
+            config = run_config(factory_kwargs, start=start, count=count, chunk_size=chunk_size, sink=sink,
+                                annotation_format=annotation_format)
+            checkpoint = RunCheckpoint.open(output_dir, config, seed, report_time, new_run_seed)
+            if checkpoint.finished:
+                print(f"检查点显示本批次已全部完成: {checkpoint.manifest_path}")
+                return checkpoint.results() if sink != "shards" else os.path.join(output_dir, INDEX_FILENAME)
+            run_seed, report_time = checkpoint.run_seed, checkpoint.report_time
+            chunks = checkpoint.pending(chunks)
+        else:
+            run_seed = new_run_seed() if seed is None else seed
+            if report_time is None:
+                report_time = datetime.datetime.now()
+        task_kwargs = {"run_seed": run_seed, "report_time": report_time, "output_dir": output_dir,
+                       "annotation_format": annotation_format, "writers": writers, "max_pending": max_pending}
+        # 续跑时保留已完成区间的标注分片
+        if annotation_format is not None and not (checkpoint is not None and checkpoint.completed):
+            clear_annotation_parts(output_dir)
+        pending = sum(chunk_stop - chunk_start for chunk_start, chunk_stop in chunks)
+        bar = ProgressBar(count, initial=count - pending) if progress else None
+
+        def on_chunk(chunk_start, chunk_stop, chunk_result):
+            if checkpoint is not None:
+                checkpoint.record(chunk_start, chunk_stop, chunk_result)
+            if bar is not None:
+                bar.chunk_done(chunk_stop - chunk_start)
+
+        runner = run_chunks
+        if distributed:
+            runner = functools.partial(run_queue, queue_dir=os.path.join(output_dir, QUEUE_DIRNAME),
+                                       lease_seconds=lease_seconds)
+        run = functools.partial(runner, self, factory, factory_kwargs, workers=workers, task_kwargs=task_kwargs,
+                                with_stats=True, chunks=chunks, on_chunk=on_chunk)
+
+        self.progress = bar
+        try:
+            if sink == "shards":
+                task_kwargs["shard_size"] = shard_size
+                shard_ids, stats = run("generate_shard_range", count)
+                if checkpoint is not None:
+                    shard_ids = checkpoint.results()
+                result = finalize_index(output_dir, shard_ids)
+            elif sink in VECTOR_FORMATS:
+                task_kwargs.update(shard_size=shard_size, sink=sink)
+                result, stats = run("generate_document_range", count)
+                remove_partial_documents(output_dir)
+                if checkpoint is not None:
+                    result = checkpoint.results()
+            else:
+                result, stats = run("generate_range", count)
+                if checkpoint is not None:
+                    result = checkpoint.results()
+        finally:
+            self.progress = None
+            if bar is not None:
+                bar.close()
+        if sink == "shards":
+            print(f"已写入 {len(shard_ids)} 个分片，索引: {result}")
+        if annotation_format is not None:
+            merge_annotation_parts(output_dir, annotation_format)
+        if checkpoint is not None:
+            checkpoint.finish()
+        print(f"批次种子: {run_seed}，报告时间: {report_time.isoformat()}")
+        print(f"批量生成完成，共 {count} 份报告，目录: {output_dir}")
+        self.last_stats = stats or PipelineStats()
+        print(self.last_stats.summary(time.perf_counter() - started))
+        if self.last_stats.stages is not None:
+            print(self.last_stats.stages.summary())
+        return result
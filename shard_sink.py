@@ -0,0 +1,215 @@
+"""分片归档输出（WebDataset 风格的 tar 分片）
+
+数百万张零散 PNG 会拖垮文件系统（inode、ls、拷贝都很慢）。这里把样本按序号写入固定大小的
+tar 分片，每个样本包含 {key}.png 和 {key}.json 两个成员，key 为补零的全局序号，不会冲突。
+全部分片写完后生成 index.jsonl，记录每个成员在分片中的偏移和长度，可随机读取。
+
+目录结构：
+    shard-000000.tar
+    shard-000001.tar
+    ...
+    index.jsonl
+
+分片和临时索引都先写到同目录的临时文件，写完再原子替换：同一分片被两个进程重做时（如分布式租约被接手），
+各自写自己的临时文件，内容相同，最后谁替换都得到完整的分片。
+"""
+import contextlib
+import glob
+import io
+import json
+import os
+import tarfile
+import uuid
+
+INDEX_FILENAME = "index.jsonl"
+DEFAULT_SHARD_SIZE = 1000
+
+
+def sample_key(index):
+    """样本键：补零的全局序号"""
+    return f"{index:09d}"
+
+
+def encode_label(truth):
+    """标注编码为 UTF-8 JSON"""
+    return json.dumps(truth, ensure_ascii=False).encode("utf-8")
+
+
+def shard_path(output_dir, shard_id):
+    return os.path.join(output_dir, f"shard-{shard_id:06d}.tar")
+
+
+def _shard_index_path(output_dir, shard_id):
+    return os.path.join(output_dir, f"shard-{shard_id:06d}.idx.jsonl")
+
+
+def _temp_path(path):
+    return f"{path}.{uuid.uuid4().hex}.tmp"
+
+
+class ShardWriter:
+    """写单个 tar 分片，同时记录每个成员的数据偏移；关闭时才出现在 path"""
+
+    def __init__(self, path, mtime=0):
+        self.path = path
+        self.mtime = int(mtime)
+        self._tmp_path = _temp_path(path)
+        self._file = open(self._tmp_path, "wb")
+        self._tar = tarfile.open(fileobj=self._file, mode="w", format=tarfile.USTAR_FORMAT)
+        self.entries = []
+
+    def write(self, key, members):
+        """写入一个样本，members 为 {扩展名: 字节串}"""
+        entry = {"key": key}
+        for ext, data in members.items():
+            info = tarfile.TarInfo(f"{key}.{ext}")
+            info.size = len(data)
+            info.mtime = self.mtime
+            info.mode = 0o644
+            offset = self._file.tell() + tarfile.BLOCKSIZE  # 成员头部之后即为数据
+            self._tar.addfile(info, io.BytesIO(data))
+            entry[ext] = [offset, len(data)]
+        self.entries.append(entry)
+        return entry
+
+    def close(self):
+        if self._file.closed:
+            return
+        self._tar.close()
+        self._file.close()
+        os.replace(self._tmp_path, self.path)
+
+    def discard(self):
+        """放弃写了一半的分片：关闭并删除临时文件，path 保持原样"""
+        if self._file.closed:
+            return
+        self._file.close()
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(self._tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+
+class ShardSink:
+    """按序号逐个写入样本，跨过分片边界时自动切换到下一个分片
+
+    每个分片的样本必须由同一个 ShardSink 写完（按分片边界切分任务即可保证）。
+    每个分片旁边写一个临时索引，finalize_index 会把它们合并为 index.jsonl。
+    """
+
+    def __init__(self, output_dir, shard_size=DEFAULT_SHARD_SIZE, mtime=0):
+        self.output_dir = output_dir
+        self.shard_size = shard_size
+        self.mtime = mtime
+        self.shard_ids = []
+        self._writer = None
+        self._current_shard = None
+
+    def write(self, index, members):
+        """写入一个样本，members 为 {扩展名: 字节串}"""
+        shard_id = index // self.shard_size
+        if shard_id != self._current_shard:
+            self._close_current()
+            self._writer = ShardWriter(shard_path(self.output_dir, shard_id), self.mtime)
+            self._current_shard = shard_id
+            self.shard_ids.append(shard_id)
+        return self._writer.write(sample_key(index), members)
+
+    def _close_current(self):
+        if self._writer is not None:
+            _close_shard(self._writer, self.output_dir, self._current_shard)
+            self._writer = None
+
+    def close(self):
+        """关闭当前分片，返回写过的分片编号"""
+        self._close_current()
+        return self.shard_ids
+
+    def discard(self):
+        """出错时调用：丢弃正在写的分片（不写它的临时索引），之前已写完的分片保留，返回写完的分片编号"""
+        if self._writer is not None:
+            self._writer.discard()
+            self._writer = None
+            self.shard_ids.remove(self._current_shard)
+            self._current_shard = None
+        return self.shard_ids
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+
+def write_shards(samples, output_dir, shard_size=DEFAULT_SHARD_SIZE, mtime=0):
+    """把 (序号, {扩展名: 字节串}) 序列写入对应分片，返回写过的分片编号"""
+    with ShardSink(output_dir, shard_size, mtime) as sink:
+        for index, members in samples:
+            sink.write(index, members)
+    return sink.shard_ids
+
+
+def _close_shard(writer, output_dir, shard_id):
+    writer.close()
+    index_path = _shard_index_path(output_dir, shard_id)
+    tmp_path = _temp_path(index_path)
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        for entry in writer.entries:
+            f.write(json.dumps(dict(entry, shard=os.path.basename(writer.path))) + "\n")
+    os.replace(tmp_path, index_path)
+
+
+def finalize_index(output_dir, shard_ids):
+    """按分片顺序合并临时索引为 index.jsonl，返回索引文件路径"""
+    index_path = os.path.join(output_dir, INDEX_FILENAME)
+    with open(index_path, "w", encoding="utf-8") as out:
+        for shard_id in sorted(set(shard_ids)):
+            part_path = _shard_index_path(output_dir, shard_id)
+            with open(part_path, encoding="utf-8") as part:
+                out.write(part.read())
+            os.remove(part_path)
+    # 崩溃的进程没来得及替换的临时分片和临时索引
+    for path in glob.glob(os.path.join(output_dir, "shard-*.tmp")):
+        os.remove(path)
+    return index_path
+
+
+class ShardReader:
+    """按 index.jsonl 随机读取分片中的样本"""
+
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+        self._entries = {}
+        self.keys = []
+        with open(os.path.join(output_dir, INDEX_FILENAME), encoding="utf-8") as f:
+            for line in f:
+                entry = json.loads(line)
+                self._entries[entry["key"]] = entry
+                self.keys.append(entry["key"])
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def read(self, key, ext):
+        """读取某个样本的一个成员（如 "png"、"json"）的字节串"""
+        entry = self._entries[key]
+        offset, size = entry[ext]
+        with open(os.path.join(self.output_dir, entry["shard"]), "rb") as f:
+            f.seek(offset)
+            return f.read(size)
+
+    def read_label(self, key):
+        return json.loads(self.read(key, "json").decode("utf-8"))
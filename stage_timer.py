@@ -0,0 +1,108 @@
+"""分阶段计时（插桩计数器）
+
+generate_report 的时间花在哪里——数值生成、Faker/元数据、版面、模板复制、绘制、标注、编码、写盘——
+原来只能靠猜。生成器构造时传入 profile=True 后，各阶段用 StageTimer.stage(名称) 计时，
+累计耗时和调用次数，并记录每份报告在生产者一侧的耗时（用于 p50/p99）。
+
+未启用时 stage() 返回一个空的上下文管理器，timed() 原样返回迭代器，几乎没有额外开销。
+计时结果可跨区间/进程合并，随写出统计（PipelineStats.stages）一起返回主进程。
+"""
+import contextlib
+import math
+import time
+
+# 生成器中使用的阶段（按流水线顺序），summary 按此顺序输出
+STAGES = ("layout", "values", "metadata", "template", "draw", "annotate", "augment")
+
+_NULL_STAGE = contextlib.nullcontext()
+
+
+class _Stage:
+    __slots__ = ("timer", "name", "started")
+
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.timer.add(self.name, time.perf_counter() - self.started)
+
+
+class StageTimer:
+    """各阶段的累计耗时（秒）、调用次数，以及每份报告的耗时样本"""
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.seconds = {}
+        self.calls = {}
+        self.latencies = []
+
+    def stage(self, name):
+        """计时上下文：with timer.stage("draw"): ..."""
+        return _Stage(self, name) if self.enabled else _NULL_STAGE
+
+    def add(self, name, seconds, calls=1):
+        self.seconds[name] = self.seconds.get(name, 0.0) + seconds
+        self.calls[name] = self.calls.get(name, 0) + calls
+
+    def timed(self, iterable):
+        """包装逐份产出报告的迭代器，记录相邻两次产出之间的耗时
+
+        耗时包含生产者生成这一份报告和调用方处理它（提交写出、写标注）的时间，
+        区间开头的批量数值生成计入该区间第一份报告。
+        """
+        return self._timed(iterable) if self.enabled else iterable
+
+    def _timed(self, iterable):
+        mark = time.perf_counter()
+        for item in iterable:
+            yield item
+            now = time.perf_counter()
+            self.latencies.append(now - mark)
+            mark = now
+
+    def merge(self, other):
+        for name, seconds in other.seconds.items():
+            self.add(name, seconds, other.calls.get(name, 0))
+        self.latencies.extend(other.latencies)
+        return self
+
+    def drain(self):
+        """取出目前的计时结果并清零（每个区间结束时调用）"""
+        drained = StageTimer(self.enabled)
+        drained.seconds, drained.calls, drained.latencies = self.seconds, self.calls, self.latencies
+        self.seconds, self.calls, self.latencies = {}, {}, []
+        return drained
+
+    def percentile(self, q):
+        """每份报告耗时的 q 分位数（秒，最近秩法），没有样本时返回 None"""
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        rank = max(1, math.ceil(q / 100 * len(ordered)))
+        return ordered[rank - 1]
+
+    def _ordered_names(self):
+        known = [name for name in STAGES if name in self.seconds]
+        return known + sorted(name for name in self.seconds if name not in STAGES)
+
+    def as_dict(self):
+        p50, p99 = self.percentile(50), self.percentile(99)
+        return {"stages": {name: {"seconds": round(self.seconds[name], 4), "calls": self.calls[name]}
+                           for name in self._ordered_names()},
+                "reports": len(self.latencies),
+                "latency_p50_ms": None if p50 is None else round(p50 * 1000, 3),
+                "latency_p99_ms": None if p99 is None else round(p99 * 1000, 3)}
+
+    def summary(self):
+        """单行汇总：各阶段累计耗时与每份报告耗时的 p50/p99"""
+        parts = [f"{name} {self.seconds[name]:.2f}s" for name in self._ordered_names()]
+        text = "阶段耗时: " + (", ".join(parts) if parts else "无")
+        if self.latencies:
+            text += (f"; 每份耗时 p50 {self.percentile(50) * 1000:.1f}ms / "
+                     f"p99 {self.percentile(99) * 1000:.1f}ms")
+        return text
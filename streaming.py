@@ -0,0 +1,66 @@
+"""流式报告数据集
+
+把生成器的 iter_reports 包装成可迭代数据集，训练程序可以直接拉取 (图片, 标注)，不经过磁盘。
+安装了 PyTorch 时它就是一个 torch.utils.data.IterableDataset，DataLoader 的每个 worker
+分到一段连续的序号；由于每份报告只由 (种子, 序号) 决定，worker 数不影响产出的内容。
+"""
+from datetime import datetime
+
+try:
+    from torch.utils.data import IterableDataset as _DatasetBase
+    from torch.utils.data import get_worker_info
+except ImportError:
+    _DatasetBase = object
+
+    def get_worker_info():
+        return None
+
+from batch_runner import new_run_seed
+
+
+class ReportStream(_DatasetBase):
+    """惰性生成 n 份报告的可迭代数据集
+
+    用法：
+        from generate_two_cols import BloodReportGenerator
+        stream = ReportStream(BloodReportGenerator, n=100000, seed=42)
+        for image, truth in stream:
+            ...
+    """
+
+    def __init__(self, factory, n, seed=None, start=0, report_time=None, chunk_size=64, raw=False,
+                 factory_kwargs=None):
+        super().__init__()
+        self.factory = factory
+        self.factory_kwargs = factory_kwargs or {}
+        self.n = n
+        # 未指定种子/时间时在这里固定下来，保证多个 worker 使用同一批次种子和报告时间
+        self.seed = new_run_seed() if seed is None else seed
+        self.start = start
+        self.report_time = datetime.now() if report_time is None else report_time
+        self.chunk_size = chunk_size
+        self.raw = raw
+        self._generator = None
+
+    def __len__(self):
+        return self.n
+
+    def _worker_range(self):
+        """当前 worker 负责的序号区间"""
+        worker = get_worker_info()
+        if worker is None:
+            return self.start, self.start + self.n
+        per_worker = -(-self.n // worker.num_workers)
+        first = self.start + worker.id * per_worker
+        return first, min(first + per_worker, self.start + self.n)
+
+    def __iter__(self):
+        # 生成器（字体、Faker）在每个 worker 中只构建一次
+        if self._generator is None:
+            self._generator = self.factory(**self.factory_kwargs)
+        first, stop = self._worker_range()
+        if first >= stop:
+            return iter(())
+        return self._generator.iter_reports(stop - first, seed=self.seed, start=first,
+                                            report_time=self.report_time, chunk_size=self.chunk_size,
+                                            raw=self.raw)
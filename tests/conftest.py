@@ -0,0 +1,47 @@
+"""测试公共夹具
+
+生成器需要字体文件：本机没有中文字体时用环境变量 BLOOD_REPORT_FONT 指定任意 TrueType 字体即可
+（确定性、偏移等性质与字形无关），都没有时跳过用到生成器的测试。
+"""
+import datetime
+import os
+
+import pytest
+
+import generate_one_col
+import generate_two_cols
+from font_resolver import resolve_font
+
+# 固定的报告时间，使同一种子下的输出逐字节可比
+REPORT_TIME = datetime.datetime(2024, 1, 1, 8, 0, 0)
+
+GENERATORS = {
+    "one_col": (generate_one_col.BloodReportGenerator, "generate_batch"),
+    "two_cols": (generate_two_cols.BloodReportGenerator, "generate_report"),
+}
+
+
+def make_batch(layout, **generator_kwargs):
+    """构造生成器，返回 (生成器, 批量生成方法)"""
+    if resolve_font() is None:
+        pytest.skip("没有可用的字体，请用 BLOOD_REPORT_FONT 指定字体文件")
+    factory, method = GENERATORS[layout]
+    generator = factory(**generator_kwargs)
+    return generator, getattr(generator, method)
+
+
+def read_tree(directory, suffixes=(".png", ".tar", ".pdf", ".svg", ".jsonl", ".json")):
+    """目录中输出文件的 {相对路径: 字节串}（不含检查点）"""
+    contents = {}
+    for root, _, names in os.walk(directory):
+        for name in names:
+            if name.endswith(suffixes) and not name.startswith("run_"):
+                path = os.path.join(root, name)
+                with open(path, "rb") as f:
+                    contents[os.path.relpath(path, directory)] = f.read()
+    return contents
+
+
+@pytest.fixture(params=sorted(GENERATORS))
+def layout(request):
+    return request.param
@@ -0,0 +1,77 @@
+"""标注分片按序号合并为 JSONL / COCO"""
+import json
+import os
+
+import pytest
+
+from annotations import JsonlWriter, merge_annotation_parts, part_path
+
+from tests.conftest import REPORT_TIME, make_batch
+
+
+def _record(index):
+    return {"index": index, "file_name": f"report_{index}.png", "image": {"width": 100, "height": 50},
+            "annotations": [{"kind": "value", "text": str(index), "bbox": [index, 2, index + 10, 12]}]}
+
+
+def _write_parts(output_dir, chunks):
+    # 故意按与序号相反的顺序写出，模拟多进程完成的先后
+    for start, stop in reversed(chunks):
+        with JsonlWriter(part_path(output_dir, start), buffer_size=2) as writer:
+            for index in range(start, stop):
+                writer.write(_record(index))
+
+
+def test_jsonl_parts_merge_in_index_order(tmp_path):
+    _write_parts(str(tmp_path), [(0, 3), (3, 7), (7, 12)])
+    path = merge_annotation_parts(str(tmp_path), "jsonl")
+    with open(path, encoding="utf-8") as f:
+        assert [json.loads(line)["index"] for line in f] == list(range(12))
+    assert os.listdir(tmp_path) == ["annotations.jsonl"]
+
+
+def test_coco_merge_numbers_images_and_boxes(tmp_path):
+    _write_parts(str(tmp_path), [(0, 5), (5, 9)])
+    with open(merge_annotation_parts(str(tmp_path), "coco"), encoding="utf-8") as f:
+        coco = json.load(f)
+    assert [image["index"] for image in coco["images"]] == list(range(9))
+    assert [image["id"] for image in coco["images"]] == list(range(1, 10))
+    assert [box["id"] for box in coco["annotations"]] == list(range(1, 10))
+    assert coco["annotations"][4]["bbox"] == [4, 2, 10, 10]
+    assert coco["annotations"][4]["image_id"] == 5
+
+
+def test_parallel_run_merges_every_report_once(tmp_path):
+    _, generate = make_batch("one_col")
+    files = generate(7, output_dir=str(tmp_path), workers=2, chunk_size=2, seed=1, report_time=REPORT_TIME,
+                     annotation_format="jsonl", progress=False)
+    with open(tmp_path / "annotations.jsonl", encoding="utf-8") as f:
+        records = [json.loads(line) for line in f]
+    assert [record["index"] for record in records] == list(range(7))
+    assert [record["file_name"] for record in records] == [os.path.basename(path) for path in files]
+    assert not [name for name in os.listdir(tmp_path) if name.startswith("annotations.part-")]
+
+
+def test_failed_part_is_discarded(tmp_path):
+    """写到一半出错的标注分片不发布，也不留下临时文件"""
+    with pytest.raises(RuntimeError):
+        with JsonlWriter(part_path(str(tmp_path), 0), buffer_size=2) as writer:
+            for index in range(5):
+                writer.write(_record(index))
+            raise RuntimeError("渲染失败")
+    assert os.listdir(tmp_path) == []
+
+
+def test_render_error_leaves_no_annotation_part(tmp_path, monkeypatch):
+    generator, _ = make_batch("one_col")
+    render_data = generator.render_data
+
+    def failing_render(index, *args, **kwargs):
+        if index == 2:
+            raise RuntimeError("渲染失败")
+        return render_data(index, *args, **kwargs)
+
+    monkeypatch.setattr(generator, "render_data", failing_render)
+    with pytest.raises(RuntimeError, match="渲染失败"):
+        generator.generate_range(0, 4, 3, REPORT_TIME, str(tmp_path), annotation_format="jsonl")
+    assert not [name for name in os.listdir(tmp_path) if name.startswith("annotations.")]
@@ -0,0 +1,95 @@
+"""扫描效果增强：同一种子可复现，旋转与包围盒变换一致，各效果保持白底黑字的基本性质，标注不被原地修改"""
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw
+
+from augment import (AugmentPipeline, GaussianBlur, GaussianNoise, JpegArtifacts, PaperTexture, Rotate,
+                     scan_pipeline)
+
+from tests.conftest import REPORT_TIME, make_batch
+
+
+def _page(mode="L", size=(96, 64)):
+    image = Image.new(mode, size, "white")
+    ImageDraw.Draw(image).rectangle((20, 20, 50, 30), fill="black")
+    return image
+
+
+@pytest.mark.parametrize("mode", ["RGB", "L", "1"])
+def test_same_seed_same_result(mode):
+    pipeline = scan_pipeline()
+    first, first_params = pipeline.apply(_page(mode), seed=7)
+    second, second_params = pipeline.apply(_page(mode), seed=7)
+    other, _ = pipeline.apply(_page(mode), seed=8)
+    assert first.tobytes() == second.tobytes() and first_params == second_params
+    assert first.tobytes() != other.tobytes()
+    assert first.mode == ("L" if mode == "1" else mode) and first.size == (96, 64)
+
+
+def test_skipped_effect_does_not_shift_later_params():
+    params = []
+    for probability in (0.0, 1.0):
+        pipeline = AugmentPipeline([Rotate(probability=probability), GaussianNoise()])
+        _, applied = pipeline.apply(_page(), seed=3)
+        params.append(applied)
+    assert [augmentation.name for augmentation, _ in params[0]] == ["noise"]
+    assert params[0][-1][1] == params[1][-1][1]
+
+
+def test_rotation_matches_box_transform():
+    image = Image.new("L", (121, 101), "white")
+    ImageDraw.Draw(image).rectangle((85, 40, 89, 44), fill="black")
+    rotate = Rotate()
+    params = {"degrees": 12.0}
+    rotated = rotate.apply(np.asarray(image, dtype=np.float32), params)
+    ys, xs = np.nonzero(rotated < 128)
+    x0, y0, x1, y1 = rotate.transform_box([85, 40, 89, 44], params, rotated.shape)
+    assert xs.min() >= x0 - 1 and xs.max() <= x1 + 1 and ys.min() >= y0 - 1 and ys.max() <= y1 + 1
+    assert rotate.transform_box([85, 40, 89, 44], {"degrees": 0.0}, rotated.shape) == [85, 40, 89, 44]
+
+
+def test_blur_keeps_flat_areas_and_softens_edges():
+    array = np.asarray(_page(), dtype=np.float32)
+    blurred = GaussianBlur().apply(array.copy(), {"sigma": 1.0})
+    assert np.allclose(blurred[:10], 255, atol=1e-3)
+    assert np.abs(np.diff(blurred, axis=1)).max() < np.abs(np.diff(array, axis=1)).max()
+
+
+def test_monochrome_noise_is_shared_across_channels():
+    array = np.full((64, 64, 3), 128, dtype=np.float32)
+    noisy = GaussianNoise().apply(array, {"sigma": 4.0, "seed": 1})
+    assert np.array_equal(noisy[..., 0], noisy[..., 2])
+    assert abs(float(noisy[..., 0].std()) - 4.0) < 0.5
+
+
+def test_paper_darkens_background_only():
+    array = np.asarray(_page("RGB"), dtype=np.float32)
+    textured = PaperTexture().apply(array.copy(), {"strength": 0.08, "seed": 1})
+    assert textured[0, 0].max() < 255 and textured[0, 0, 2] < textured[0, 0, 0]
+    assert np.array_equal(textured[25, 30], [0, 0, 0])
+
+
+@pytest.mark.parametrize("mode", ["RGB", "L"])
+def test_jpeg_keeps_flat_image(mode):
+    array = np.full((20, 30, 3) if mode == "RGB" else (20, 30), 200, dtype=np.float32)
+    result = JpegArtifacts().apply(array.copy(), {"quality": 30})
+    assert result.shape == array.shape
+    assert np.abs(result - 200).max() < 1.5
+
+
+def test_augment_report_copies_annotations():
+    truth = {"annotations": [{"text": "WBC", "bbox": [20, 20, 50, 30]}], "image": {"mode": "1"}}
+    image, augmented = AugmentPipeline([Rotate(5.0)]).augment_report(_page("1"), truth, seed=2)
+    assert truth["annotations"][0]["bbox"] == [20, 20, 50, 30] and truth["image"]["mode"] == "1"
+    assert augmented["annotations"][0]["bbox"] != [20, 20, 50, 30]
+    assert augmented["augment"][0]["name"] == "rotate" and augmented["image"]["mode"] == image.mode == "L"
+
+
+def test_generator_augment_is_reproducible(layout):
+    reports = []
+    for _ in range(2):
+        generator, _ = make_batch(layout, mode="L", augment=scan_pipeline())
+        reports.append([(image.tobytes(), truth) for image, truth in
+                        generator.iter_reports(2, seed=6, report_time=REPORT_TIME)])
+    assert reports[0] == reports[1]
+    assert all(truth["augment"] for _, truth in reports[0])
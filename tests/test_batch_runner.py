@@ -0,0 +1,33 @@
+"""多进程批量生成：每份报告的随机数只由 (批次种子, 序号) 决定"""
+from batch_runner import chunk_ranges, derive_seed
+
+from tests.conftest import REPORT_TIME, make_batch, read_tree
+
+
+def test_chunk_ranges_cover_interval():
+    assert list(chunk_ranges(3, 10, 3)) == [(3, 6), (6, 9), (9, 10)]
+    assert list(chunk_ranges(0, 0, 4)) == []
+
+
+def test_derive_seed_is_stable_and_distinct():
+    assert derive_seed(42, 7) == derive_seed(42, 7)
+    assert len({derive_seed(42, index) for index in range(1000)}) == 1000
+    assert derive_seed(42, 0) != derive_seed(43, 0)
+
+
+def test_parallel_output_matches_serial(tmp_path, layout):
+    _, generate = make_batch(layout)
+    for workers in (1, 2):
+        generate(5, output_dir=str(tmp_path / f"w{workers}"), workers=workers, seed=7, chunk_size=2,
+                 report_time=REPORT_TIME, annotation_format="jsonl", progress=False)
+    serial, parallel = read_tree(tmp_path / "w1"), read_tree(tmp_path / "w2")
+    assert len(serial) == 6  # 5 张图片 + annotations.jsonl
+    assert serial == parallel
+
+
+def test_output_does_not_depend_on_chunk_size(tmp_path):
+    _, generate = make_batch("one_col")
+    for chunk_size in (1, 4):
+        generate(5, output_dir=str(tmp_path / f"c{chunk_size}"), seed=11, chunk_size=chunk_size,
+                 report_time=REPORT_TIME, progress=False)
+    assert read_tree(tmp_path / "c1") == read_tree(tmp_path / "c4")
@@ -0,0 +1,66 @@
+"""画布池：归还的画布被复用并原地重置，保留的画布不超过容量，复用不改变输出"""
+from PIL import Image, ImageDraw
+
+from canvas_pool import CanvasPool, canvas_bytes, pool_capacity
+
+from tests.conftest import REPORT_TIME, make_batch, read_tree
+
+SIZE = (40, 20)
+
+
+def test_released_canvas_is_reused_and_reset():
+    pool = CanvasPool("RGB", SIZE, capacity=2)
+    image, draw = pool.acquire()
+    draw.rectangle((0, 0, 10, 10), fill="black")
+    pool.release(image)
+
+    again, again_draw = pool.acquire()
+    assert again is image and again_draw is draw
+    assert again.getcolors() == [(SIZE[0] * SIZE[1], (255, 255, 255))]
+    assert pool.stats()["created"] == 1
+
+    pool.release(again)
+    template = Image.new("RGB", SIZE, "red")
+    ImageDraw.Draw(template).line((0, 0, 39, 19), fill="blue")
+    pasted, _ = pool.acquire(template)
+    assert pasted is image and pasted.tobytes() == template.tobytes()
+
+
+def test_pool_keeps_at_most_capacity_canvases():
+    pool = CanvasPool("L", SIZE, capacity=2)
+    images = [pool.acquire()[0] for _ in range(4)]
+    assert len({id(image) for image in images}) == 4
+    stats = pool.stats()
+    assert (stats["created"], stats["peak_in_use"], stats["overflow"]) == (4, 4, 2)
+
+    for image in images:
+        pool.release(image)
+    assert pool.in_use == 0
+    assert pool.created == 2 and len(pool._free) == 2
+    assert pool.nbytes == 2 * canvas_bytes("L", SIZE)
+    # 再取时只复用保留下来的两张
+    assert {id(pool.acquire()[0]) for _ in range(2)} <= {id(image) for image in images[:2]}
+
+
+def test_foreign_images_are_ignored():
+    pool = CanvasPool("RGB", SIZE, capacity=1)
+    pool.acquire()
+    pool.release(Image.new("RGB", SIZE))
+    assert pool.in_use == 1 and not pool._free
+
+
+def test_capacity_covers_pipeline():
+    assert pool_capacity(0, 16) == 1
+    assert pool_capacity(2, 16) == 20
+
+
+def test_reuse_canvas_does_not_change_output(layout, tmp_path):
+    trees = []
+    for reuse in (False, True):
+        generator, generate = make_batch(layout, reuse_canvas=reuse)
+        generate(5, str(tmp_path / str(reuse)), seed=3, report_time=REPORT_TIME, writers=1, max_pending=2,
+                 progress=False)
+        trees.append(read_tree(str(tmp_path / str(reuse))))
+    assert trees[0] == trees[1]
+    pool = generator.get_canvas_pool(writers=1, max_pending=2)
+    assert pool.overflow == 0 and 1 <= pool.created <= pool.capacity and pool.in_use == 0
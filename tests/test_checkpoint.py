@@ -0,0 +1,70 @@
+"""检查点续跑：中断后重跑只生成未完成的区间，结果与一次跑完逐字节一致"""
+import datetime
+
+import pytest
+
+from checkpoint import RunCheckpoint
+from tests.conftest import REPORT_TIME, make_batch, read_tree
+
+
+def _crash_after_first_chunk(monkeypatch, generator, method):
+    original = getattr(generator, method)
+    done = []
+
+    def crashing(start, stop, **kwargs):
+        if done:
+            raise RuntimeError("模拟进程崩溃")
+        done.append((start, stop))
+        return original(start, stop, **kwargs)
+
+    monkeypatch.setattr(generator, method, crashing)
+    return done
+
+
+@pytest.mark.parametrize("sink, method", [("files", "generate_range"), ("shards", "generate_shard_range")])
+def test_resume_after_crash_reproduces_output(tmp_path, monkeypatch, sink, method):
+    options = {"chunk_size": 2, "shard_size": 2, "sink": sink, "annotation_format": "jsonl", "progress": False}
+    _, generate = make_batch("one_col")
+    generate(6, output_dir=str(tmp_path / "clean"), seed=5, report_time=REPORT_TIME, **options)
+
+    generator, generate = make_batch("one_col")
+    done = _crash_after_first_chunk(monkeypatch, generator, method)
+    with pytest.raises(RuntimeError):
+        generate(6, output_dir=str(tmp_path / "resumed"), seed=5, report_time=REPORT_TIME, resume=True, **options)
+    assert done == [(0, 2)]
+    monkeypatch.undo()
+
+    # 续跑时不必再给种子和报告时间：沿用检查点中记录的值
+    resumed = []
+    original = getattr(generator, method)
+    monkeypatch.setattr(generator, method,
+                        lambda start, stop, **kwargs: resumed.append(start) or original(start, stop, **kwargs))
+    generate(6, output_dir=str(tmp_path / "resumed"), resume=True, **options)
+    assert resumed == [2, 4]
+    assert read_tree(tmp_path / "resumed") == read_tree(tmp_path / "clean")
+
+
+def test_resume_rejects_changed_parameters(tmp_path):
+    _, generate = make_batch("one_col")
+    generate(2, output_dir=str(tmp_path), seed=5, report_time=REPORT_TIME, resume=True, progress=False)
+    with pytest.raises(ValueError):
+        generate(3, output_dir=str(tmp_path), resume=True, progress=False)
+    with pytest.raises(ValueError):
+        generate(2, output_dir=str(tmp_path), seed=6, resume=True, progress=False)
+
+
+def test_partial_last_line_does_not_swallow_next_record(tmp_path):
+    """崩溃时写了一半的最后一行在打开时截掉，之后追加的记录仍能读回"""
+    report_time = datetime.datetime(2024, 1, 1)
+    checkpoint = RunCheckpoint.open(str(tmp_path), {"count": 6}, 5, report_time)
+    checkpoint.record(0, 2, ["a", "b"])
+    with open(checkpoint.progress_path, "a", encoding="utf-8") as f:
+        f.write('{"start": 2, "sto')
+
+    checkpoint = RunCheckpoint.open(str(tmp_path), {"count": 6})
+    assert checkpoint.pending([(0, 2), (2, 4), (4, 6)]) == [(2, 4), (4, 6)]
+    checkpoint.record(2, 4, ["c", "d"])
+
+    checkpoint = RunCheckpoint.open(str(tmp_path), {"count": 6})
+    assert checkpoint.pending([(0, 2), (2, 4), (4, 6)]) == [(4, 6)]
+    assert checkpoint.results() == ["a", "b", "c", "d"]
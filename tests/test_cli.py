@@ -0,0 +1,60 @@
+"""命令行：配置文件中的值与命令行一样检查，输出的 DPI 与生成器默认一致"""
+import json
+import os
+
+import pytest
+from PIL import Image
+
+import cli
+from font_resolver import resolve_font
+
+
+def _write_config(tmp_path, **config):
+    path = tmp_path / "job.json"
+    path.write_text(json.dumps(config), encoding="utf-8")
+    return str(path)
+
+
+@pytest.mark.parametrize("config", [
+    {"sink": "foo"},
+    {"format": "tiff"},
+    {"count": "ten"},
+    {"count": 10.5},
+    {"workers": True},
+    {"resume": "yes"},
+    {"no_such_option": 1},
+])
+def test_invalid_config_values_are_rejected(tmp_path, config):
+    with pytest.raises(SystemExit):
+        cli.parse_args(["--config", _write_config(tmp_path, **config)])
+
+
+def test_config_values_are_converted_and_overridden(tmp_path):
+    path = _write_config(tmp_path, count="20", sink="shards", resume=True, progress=False, seed=None)
+    args = cli.parse_args(["--config", path, "--sink", "files"])
+    assert args.count == 20
+    assert args.sink == "files"
+    assert args.resume is True and args.progress is False
+    assert args.seed is None
+
+
+@pytest.mark.parametrize("argv, dpi", [
+    (["--layout", "two_cols"], (200, 200)),
+    (["--layout", "one_col"], None),
+    (["--layout", "one_col", "--dpi", "300"], (300, 300)),
+])
+def test_encoder_dpi_defaults_per_layout(argv, dpi):
+    if resolve_font() is None:
+        pytest.skip("没有可用的字体，请用 BLOOD_REPORT_FONT 指定字体文件")
+    generator, _ = cli.make_generator(cli.parse_args(argv))
+    assert generator.encoder.dpi == dpi
+
+
+def test_cli_png_keeps_dpi(tmp_path):
+    if resolve_font() is None:
+        pytest.skip("没有可用的字体，请用 BLOOD_REPORT_FONT 指定字体文件")
+    cli.main(["-n", "1", "--seed", "1", "--no-progress", "-o", str(tmp_path)])
+    names = [name for name in os.listdir(tmp_path) if name.endswith(".png")]
+    assert len(names) == 1
+    with Image.open(os.path.join(tmp_path, names[0])) as image:
+        assert tuple(round(value) for value in image.info["dpi"]) == (200, 200)
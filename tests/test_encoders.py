@@ -0,0 +1,69 @@
+"""输出编码：PNG 各压缩级别无损，raw 为原始像素，save 与 encode 写出相同的字节，参数错误时报错"""
+import io
+import os
+
+import pytest
+from PIL import Image, ImageDraw, features
+
+from encoders import CANVAS_MODES, ImageEncoder
+
+from tests.conftest import REPORT_TIME, make_batch
+
+
+def _image(mode):
+    image = Image.new(mode, (64, 32), "white")
+    ImageDraw.Draw(image).text((4, 8), "WBC 5.12", fill="black")
+    return image
+
+
+@pytest.mark.parametrize("mode", CANVAS_MODES)
+@pytest.mark.parametrize("level", [None, 0, 1, 9])
+def test_png_is_lossless(mode, level):
+    image = _image(mode)
+    decoded = Image.open(io.BytesIO(ImageEncoder("png", compress_level=level).encode(image)))
+    assert decoded.mode == mode and decoded.tobytes() == image.tobytes()
+
+
+@pytest.mark.parametrize("mode", CANVAS_MODES)
+def test_raw_is_pixel_bytes(mode):
+    image = _image(mode)
+    assert ImageEncoder("raw").encode(image) == image.tobytes()
+
+
+@pytest.mark.parametrize("format", ["jpeg", "webp"])
+@pytest.mark.parametrize("mode", CANVAS_MODES)
+def test_lossy_formats_accept_every_canvas_mode(format, mode):
+    if format == "webp" and not features.check("webp"):
+        pytest.skip("Pillow 未编译 WebP 支持")
+    data = ImageEncoder(format, quality=80).encode(_image(mode))
+    assert Image.open(io.BytesIO(data)).format == format.upper()
+
+
+def test_png_dpi_is_written():
+    decoded = Image.open(io.BytesIO(ImageEncoder("png", dpi=(200, 200)).encode(_image("L"))))
+    assert tuple(round(value) for value in decoded.info["dpi"]) == (200, 200)
+
+
+@pytest.mark.parametrize("format", ["png", "jpeg", "raw"])
+def test_save_matches_encode(tmp_path, format):
+    encoder = ImageEncoder(format, compress_level=1 if format == "png" else None)
+    image = _image("RGB")
+    path = tmp_path / f"report.{encoder.extension}"
+    encoder.save(image, str(path))
+    assert path.read_bytes() == encoder.encode(image)
+
+
+@pytest.mark.parametrize("kwargs", [{"format": "bmp"}, {"compress_level": 10}, {"compress_level": -1},
+                                    {"format": "jpeg", "quality": 0}, {"quality": 101}])
+def test_invalid_arguments(kwargs):
+    with pytest.raises(ValueError):
+        ImageEncoder(**kwargs)
+
+
+def test_generator_uses_encoder_extension(layout, tmp_path):
+    _, generate = make_batch(layout, mode="L", encoder=ImageEncoder("jpeg", quality=85))
+    paths = generate(2, str(tmp_path), seed=1, report_time=REPORT_TIME, progress=False)
+    assert len(paths) == 2
+    for path in paths:
+        assert path.endswith(".jpg") and os.path.exists(path)
+        assert Image.open(path).format == "JPEG"
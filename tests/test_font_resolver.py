@@ -0,0 +1,95 @@
+"""中文字体查找：环境变量优先，候选路径命中时不扫描，字体索引写入缓存、字体目录变化后重新扫描"""
+import json
+import os
+
+import pytest
+
+import font_resolver
+from font_resolver import INDEX_FILENAME, find_cjk_fonts, has_cjk_glyphs, load_font_index, resolve_font
+
+DEJAVU = "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf"
+
+
+@pytest.fixture
+def font_dir(tmp_path, monkeypatch):
+    """只含假字体文件的字体目录；扫描时文件名含 cjk 的算作中文字体，不调用 fc-list"""
+    fonts = tmp_path / "fonts"
+    fonts.mkdir()
+    for name in ("DejaVuSans.ttf", "NotoSansCJK-Regular.ttc", "msyh-cjk.ttc"):
+        (fonts / name).write_bytes(b"")
+    scanned = []
+
+    def fake_check(path):
+        scanned.append(path)
+        return "cjk" in os.path.basename(path).lower()
+
+    monkeypatch.delenv("BLOOD_REPORT_FONT", raising=False)
+    monkeypatch.setenv("BLOOD_REPORT_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(font_resolver, "font_dirs", lambda: [str(fonts)])
+    monkeypatch.setattr(font_resolver, "_fc_list_cjk", lambda: None)
+    monkeypatch.setattr(font_resolver, "has_cjk_glyphs", fake_check)
+    monkeypatch.setattr(font_resolver, "_index_memo", None)
+    return fonts, scanned
+
+
+def test_index_is_sorted_by_preference_and_cached(font_dir, tmp_path):
+    fonts, scanned = font_dir
+    expected = [str(fonts / "msyh-cjk.ttc"), str(fonts / "NotoSansCJK-Regular.ttc")]
+    assert find_cjk_fonts() == expected
+    assert len(scanned) == 3
+    with open(tmp_path / "cache" / INDEX_FILENAME, encoding="utf-8") as f:
+        assert json.load(f)["source"] == "scan"
+
+    # 新进程（清掉进程内缓存）直接读缓存文件，不再扫描
+    font_resolver._index_memo = None
+    assert find_cjk_fonts() == expected
+    assert len(scanned) == 3
+
+
+def test_font_dir_change_triggers_rescan(font_dir):
+    fonts, scanned = font_dir
+    load_font_index()
+    (fonts / "wqy-microhei-cjk.ttc").write_bytes(b"")
+    stat = os.stat(fonts)
+    os.utime(fonts, (stat.st_atime, stat.st_mtime + 10))
+    font_resolver._index_memo = None
+    assert str(fonts / "wqy-microhei-cjk.ttc") in find_cjk_fonts()
+    assert len(scanned) == 3 + 4
+
+
+def test_missing_fonts_are_filtered(font_dir):
+    fonts, _ = font_dir
+    load_font_index()
+    os.remove(fonts / "msyh-cjk.ttc")
+    assert find_cjk_fonts() == [str(fonts / "NotoSansCJK-Regular.ttc")]
+
+
+def test_resolution_order(font_dir, monkeypatch, tmp_path):
+    fonts, scanned = font_dir
+    candidate = tmp_path / "candidate.ttf"
+    candidate.write_bytes(b"")
+    # 候选路径命中时不读索引
+    monkeypatch.setattr(font_resolver, "load_font_index", lambda refresh=False: pytest.fail("不应扫描"))
+    assert resolve_font([str(tmp_path / "missing.ttf"), str(candidate)]) == str(candidate)
+    monkeypatch.setenv("BLOOD_REPORT_FONT", str(fonts / "DejaVuSans.ttf"))
+    assert resolve_font([str(candidate)]) == str(fonts / "DejaVuSans.ttf")
+    # 环境变量指向不存在的文件时忽略
+    monkeypatch.setenv("BLOOD_REPORT_FONT", str(tmp_path / "missing.ttf"))
+    assert resolve_font([str(candidate)]) == str(candidate)
+
+
+def test_resolve_falls_back_to_index_or_none(font_dir, monkeypatch):
+    fonts, _ = font_dir
+    assert resolve_font(["/nonexistent/simsun.ttc"]) == str(fonts / "msyh-cjk.ttc")
+    monkeypatch.setattr(font_resolver, "_index_memo", {"fonts": []})
+    assert resolve_font(["/nonexistent/simsun.ttc"]) is None
+
+
+def test_has_cjk_glyphs(tmp_path):
+    broken = tmp_path / "broken.ttf"
+    broken.write_bytes(b"not a font")
+    assert not has_cjk_glyphs(str(broken))
+    if not os.path.exists(DEJAVU):
+        pytest.skip("没有 DejaVuSans")
+    assert not has_cjk_glyphs(DEJAVU)
+    assert has_cjk_glyphs(DEJAVU, sample="ABC")
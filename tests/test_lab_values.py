@@ -0,0 +1,66 @@
+"""相关数值模型：派生指标与基础指标在取整误差内一致，各项异常率校准到 variation_chance，按区间切分结果不变"""
+import numpy as np
+import pytest
+
+from lab_values import CODE_ALIASES, CORRELATED, DIFFERENTIAL, CorrelatedValueModel, make_value_engine
+
+from tests.conftest import make_batch
+
+N = 5000
+SEED = 11
+ROUNDING = 0.005 + 1e-9  # 两位小数取整的最大误差
+# 两栏参考范围下 NEUT#、LYMPH# 的范围比 WBC×比率能达到的更宽，校准只能折中（见 CorrelatedValueModel）
+COMPROMISE = {"two_cols": {"WBC": 0.30, "NEUT#": 0.15, "LYMPH#": 0.15, "MONO#": 0.16}}
+
+
+@pytest.fixture
+def correlated(layout):
+    generator, _ = make_batch(layout)
+    table = generator.reference_table
+    codes = [CODE_ALIASES.get(record.code, record.code) for record in table]
+    model = make_value_engine(table, "correlated")
+    _, values, _ = model.sample(N, SEED)
+    return {code: values[:, i] for i, code in enumerate(codes)}, model
+
+
+def test_differential_percentages_sum_to_100(correlated):
+    columns, _ = correlated
+    total = sum(columns[percent] for percent, _ in DIFFERENTIAL)
+    assert np.abs(total - 100).max() < 1e-6
+
+
+def test_absolute_counts_match_percentages(correlated):
+    columns, _ = correlated
+    for percent, count in DIFFERENTIAL:
+        expected = columns["WBC"] * columns[percent] / 100
+        assert np.abs(columns[count] - expected).max() <= ROUNDING, count
+
+
+def test_mchc_matches_hgb_over_hct(correlated):
+    columns, _ = correlated
+    expected = columns["HGB"] * 100 / columns["HCT"]
+    assert np.abs(columns["MCHC"] - expected).max() <= ROUNDING
+
+
+def test_chunking_does_not_change_values(correlated):
+    _, model = correlated
+    whole = model.sample(10, SEED)
+    parts = [model.sample(3, SEED, start=0), model.sample(7, SEED, start=3)]
+    for column, chunks in zip(whole, zip(*parts)):
+        np.testing.assert_array_equal(column, np.concatenate(chunks))
+
+
+@pytest.mark.parametrize("sex", [0, 1])
+def test_abnormal_rates_match_variation_chance(correlated, layout, sex):
+    _, model = correlated
+    _, _, status = model.sample(20000, SEED, sexes=np.full(20000, sex))
+    rates = (status != 0).mean(axis=0)
+    expected = COMPROMISE.get(layout, {})
+    for code, rate in zip(model.codes, rates):
+        assert abs(rate - expected.get(code, model.variation_chance)) < 0.04, (code, rate)
+
+
+def test_correlated_is_default(layout):
+    generator, _ = make_batch(layout)
+    assert generator.value_model == CORRELATED
+    assert isinstance(make_value_engine(generator.reference_table), CorrelatedValueModel)
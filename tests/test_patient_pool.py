@@ -0,0 +1,27 @@
+"""批次内唯一编号：unique_codes 是序号到取值范围的一一映射"""
+import pytest
+
+from patient_pool import unique_codes
+
+
+def test_full_capacity_is_a_permutation():
+    codes = unique_codes(range(1000), 100, 1099, key=12345)
+    assert sorted(codes) == list(range(100, 1100))
+
+
+def test_large_batch_never_repeats():
+    codes = unique_codes(range(200000), 100000, 999999, key=7)
+    assert len(set(codes)) == len(codes)
+    assert min(codes) >= 100000 and max(codes) <= 999999
+
+
+def test_codes_do_not_depend_on_chunking():
+    whole = unique_codes(range(0, 5000), 10000, 99999, key=99)
+    parts = unique_codes(range(0, 1234), 10000, 99999, key=99) + unique_codes(range(1234, 5000), 10000, 99999, key=99)
+    assert whole == parts
+    assert whole != unique_codes(range(0, 5000), 10000, 99999, key=100)
+
+
+def test_index_beyond_capacity_is_rejected():
+    with pytest.raises(ValueError):
+        unique_codes([10], 0, 9, key=1)
@@ -0,0 +1,49 @@
+"""进度条：逐份与按区间计数不重复，批量生成时 stdout 不再逐份刷屏、字体只提示一次"""
+import io
+
+from progress import ProgressBar, format_duration
+
+from tests.conftest import REPORT_TIME, make_batch
+
+
+def test_format_duration():
+    assert format_duration(65) == "01:05"
+    assert format_duration(3725) == "1:02:05"
+
+
+def test_chunk_done_replaces_live_count():
+    stream = io.StringIO()
+    bar = ProgressBar(10, initial=2, stream=stream, interval=0)
+    bar.update()
+    bar.update()
+    assert bar.done == 4
+    # 串行运行时同一区间先逐份推进，收到区间结果后不重复计数
+    bar.chunk_done(2)
+    assert bar.done == 4
+    bar.chunk_done(20)
+    assert bar.done == 10
+    bar.close()
+    bar.close()
+    lines = stream.getvalue().splitlines()
+    assert lines[-1].startswith("[" + "#" * 30 + "] 10/10")
+    assert "用时" in lines[-1]
+    assert sum("用时" in line for line in lines) == 1
+
+
+def test_rate_limited_redraw():
+    stream = io.StringIO()
+    bar = ProgressBar(1000, stream=stream, interval=3600)
+    for _ in range(1000):
+        bar.update()
+    assert stream.getvalue() == ""
+    bar.close()
+    assert len(stream.getvalue().splitlines()) == 1
+
+
+def test_batch_prints_no_per_report_lines(tmp_path, capsys, layout):
+    _, generate = make_batch(layout)
+    generate(4, output_dir=str(tmp_path), chunk_size=2, seed=1, report_time=REPORT_TIME)
+    out, err = capsys.readouterr()
+    assert len(out.splitlines()) <= 3
+    assert err.count("使用字体") == 1
+    assert "4/4" in err
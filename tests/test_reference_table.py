@@ -0,0 +1,58 @@
+"""参考范围表：参考值写错时在编译阶段抛出 ValueError，而不是悄悄变成默认范围"""
+import pytest
+
+import generate_one_col
+import generate_two_cols
+from reference_table import ReferenceTable, parse_range, parse_reference_text
+
+
+@pytest.mark.parametrize("text", ["", "abc", "4", "4-", "-10", "4~10", "10-4", "1-2-3"])
+def test_parse_range_rejects_malformed(text):
+    with pytest.raises(ValueError):
+        parse_range(text)
+
+
+@pytest.mark.parametrize("text", [None, "", "  ", "男：", "其他：0-15", "男：0-15；女：20-10", "；"])
+def test_parse_reference_text_rejects_malformed(text):
+    with pytest.raises(ValueError):
+        parse_reference_text(text)
+
+
+def test_parse_reference_text_by_sex():
+    assert parse_reference_text("4-10") == {"男": (4.0, 10.0), "女": (4.0, 10.0)}
+    assert parse_reference_text("男：0-15") == {"男": (0.0, 15.0), "女": (0.0, 15.0)}
+    assert parse_reference_text("男：0-15；女：0-20") == {"男": (0.0, 15.0), "女": (0.0, 20.0)}
+
+
+def test_from_projects_names_the_bad_item():
+    projects = [(1, "WBC", "白细胞", "10^9/L", "4-10"), (2, "RBC", "红细胞", "10^12/L", "5.5-3.5")]
+    with pytest.raises(ValueError, match="项目 2 RBC"):
+        ReferenceTable.from_projects(projects)
+    with pytest.raises(ValueError, match="项目 1 WBC"):
+        ReferenceTable.from_projects(projects[:1], {"WBC": {"女": "x-y"}})
+
+
+def test_from_data_template_rejects_bad_bounds():
+    with pytest.raises(ValueError, match="不是数值"):
+        ReferenceTable.from_data_template([("白细胞计数 WBC", "10^9/L", "a", 9.5)])
+    with pytest.raises(ValueError):
+        ReferenceTable.from_data_template([("白细胞计数 WBC", "10^9/L", 9.5, 3.5)])
+
+
+def test_duplicate_codes_are_rejected():
+    projects = [(1, "WBC", "白细胞", "10^9/L", "4-10"), (2, "WBC", "白细胞", "10^9/L", "4-10")]
+    with pytest.raises(ValueError, match="项目代码重复"):
+        ReferenceTable.from_projects(projects)
+
+
+def test_generator_construction_fails_on_bad_range():
+    class BadTwoCols(generate_two_cols.BloodReportGenerator):
+        projects_right = generate_two_cols.BloodReportGenerator.projects_right[:-1] + [
+            (25, "ESR", "血沉", "mm/h", "男：15-0")]
+
+    class BadOneCol(generate_one_col.BloodReportGenerator):
+        data_template = [("白细胞计数 WBC", "10^9/L", 9.5, 3.5)]
+
+    for factory in (BadTwoCols, BadOneCol):
+        with pytest.raises(ValueError):
+            factory()
@@ -0,0 +1,97 @@
+"""tar 分片：index.jsonl 中的偏移和长度指向分片内对应成员的数据"""
+import json
+import os
+import tarfile
+
+import pytest
+
+from shard_sink import INDEX_FILENAME, ShardReader, ShardWriter, finalize_index, sample_key, write_shards
+
+from tests.conftest import REPORT_TIME, make_batch
+
+
+def _check_index(output_dir):
+    with open(os.path.join(output_dir, INDEX_FILENAME), encoding="utf-8") as f:
+        entries = [json.loads(line) for line in f]
+    for entry in entries:
+        with tarfile.open(os.path.join(output_dir, entry["shard"])) as tar, \
+                open(os.path.join(output_dir, entry["shard"]), "rb") as raw:
+            for ext, location in entry.items():
+                if ext in ("key", "shard"):
+                    continue
+                offset, size = location
+                member = tar.getmember(f"{entry['key']}.{ext}")
+                assert member.offset_data == offset
+                raw.seek(offset)
+                assert raw.read(size) == tar.extractfile(member).read()
+    return entries
+
+
+def test_index_offsets_point_at_member_data(tmp_path):
+    samples = [(index, {"bin": os.urandom(index * 37 + 1), "json": b'{"i": %d}' % index}) for index in range(7)]
+    shard_ids = write_shards(samples, str(tmp_path), shard_size=3)
+    assert shard_ids == [0, 1, 2]
+    finalize_index(str(tmp_path), shard_ids)
+    entries = _check_index(str(tmp_path))
+    assert [entry["key"] for entry in entries] == [sample_key(index) for index in range(7)]
+    reader = ShardReader(str(tmp_path))
+    for index, members in samples:
+        assert reader.read(sample_key(index), "bin") == members["bin"]
+
+
+def test_generated_shards_match_file_output(tmp_path):
+    _, generate = make_batch("one_col")
+    options = {"seed": 3, "report_time": REPORT_TIME, "progress": False}
+    generate(5, output_dir=str(tmp_path / "shards"), sink="shards", shard_size=2, **options)
+    files = generate(5, output_dir=str(tmp_path / "files"), **options)
+    entries = _check_index(str(tmp_path / "shards"))
+    assert len(entries) == 5
+    reader = ShardReader(str(tmp_path / "shards"))
+    for index, path in enumerate(files):
+        with open(path, "rb") as f:
+            assert reader.read(sample_key(index), "png") == f.read()
+        assert reader.read_label(sample_key(index))["index"] == index
+
+
+def test_concurrent_writers_do_not_clobber(tmp_path):
+    """同一分片被两个进程重做时各写各的临时文件，关闭前目标路径不出现"""
+    path = str(tmp_path / "shard-000000.tar")
+    first, second = ShardWriter(path), ShardWriter(path)
+    for writer in (first, second):
+        writer.write("000000000", {"png": b"x" * 100})
+    assert not os.path.exists(path)
+    second.close()
+    first.write("000000001", {"png": b"y" * 100})
+    first.close()
+    with tarfile.open(path) as tar:
+        assert tar.getnames() == ["000000000.png", "000000001.png"]
+    assert os.listdir(tmp_path) == ["shard-000000.tar"]
+
+
+def test_failed_write_discards_current_shard(tmp_path):
+    """写到一半出错时正在写的分片不发布，之前写完的分片保留"""
+    def samples():
+        for index in range(5):
+            if index == 4:
+                raise RuntimeError("渲染失败")
+            yield index, {"bin": b"x" * 10}
+
+    with pytest.raises(RuntimeError):
+        write_shards(samples(), str(tmp_path), shard_size=3)
+    assert sorted(os.listdir(tmp_path)) == ["shard-000000.idx.jsonl", "shard-000000.tar"]
+
+
+def test_render_error_leaves_no_shard(tmp_path, monkeypatch):
+    """区间中途渲染出错时不留下截断的 tar 分片和分片索引"""
+    generator, _ = make_batch("one_col")
+    render_data = generator.render_data
+
+    def failing_render(index, *args, **kwargs):
+        if index == 2:
+            raise RuntimeError("渲染失败")
+        return render_data(index, *args, **kwargs)
+
+    monkeypatch.setattr(generator, "render_data", failing_render)
+    with pytest.raises(RuntimeError, match="渲染失败"):
+        generator.generate_shard_range(0, 4, 3, REPORT_TIME, str(tmp_path), shard_size=4)
+    assert os.listdir(tmp_path) == []
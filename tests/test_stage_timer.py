@@ -0,0 +1,90 @@
+"""分阶段计时：未启用时不记录，累计/合并/清零正确，分位数按最近秩法，批量生成时随写出统计返回"""
+import contextlib
+
+import pytest
+
+import stage_timer
+from stage_timer import STAGES, StageTimer
+from write_pipeline import PipelineStats
+
+from tests.conftest import REPORT_TIME, make_batch
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """每次读取前进 1 秒的假时钟"""
+    ticks = iter(range(1000))
+    monkeypatch.setattr(stage_timer.time, "perf_counter", lambda: float(next(ticks)))
+
+
+def test_disabled_timer_records_nothing():
+    timer = StageTimer()
+    assert isinstance(timer.stage("draw"), contextlib.nullcontext)
+    items = [1, 2]
+    assert timer.timed(items) is items
+    with timer.stage("draw"):
+        pass
+    assert timer.as_dict() == {"stages": {}, "reports": 0, "latency_p50_ms": None, "latency_p99_ms": None}
+    assert timer.summary() == "阶段耗时: 无"
+
+
+def test_stages_and_latencies(clock):
+    timer = StageTimer(enabled=True)
+    for _ in range(2):
+        with timer.stage("draw"):
+            pass
+    with timer.stage("values"):
+        pass
+    assert timer.seconds == {"draw": 2.0, "values": 1.0}
+    assert timer.calls == {"draw": 2, "values": 1}
+    assert list(timer.timed("abc")) == ["a", "b", "c"]
+    assert timer.latencies == [1.0, 1.0, 1.0]
+
+
+def test_percentile_is_nearest_rank():
+    timer = StageTimer(enabled=True)
+    assert timer.percentile(50) is None
+    timer.latencies = [0.004, 0.001, 0.003, 0.002]
+    assert timer.percentile(50) == 0.002
+    assert timer.percentile(99) == 0.004
+    assert timer.percentile(0) == 0.001
+
+
+def test_merge_drain_and_order():
+    first, second = StageTimer(enabled=True), StageTimer(enabled=True)
+    first.add("zeta", 1.0)
+    first.add("draw", 0.5)
+    second.add("draw", 0.25, calls=3)
+    second.add("values", 2.0)
+    second.latencies = [0.1]
+    drained = second.drain()
+    assert second.seconds == {} and second.latencies == [] and drained.enabled
+    first.merge(drained)
+    assert first.calls == {"zeta": 1, "draw": 4, "values": 1}
+    assert list(first.as_dict()["stages"]) == ["values", "draw", "zeta"]
+    assert first.summary() == "阶段耗时: values 2.00s, draw 0.75s, zeta 1.00s; 每份耗时 p50 100.0ms / p99 100.0ms"
+
+
+def test_profile_survives_stats_state():
+    stats = PipelineStats()
+    stats.stages = StageTimer(enabled=True)
+    stats.stages.add("draw", 1.5)
+    stats.stages.latencies = [0.2]
+    restored = PipelineStats.from_state(stats.to_state())
+    assert restored.as_dict()["profile"] == stats.as_dict()["profile"]
+
+
+def test_batch_profile(layout, tmp_path):
+    generator, generate = make_batch(layout, profile=True)
+    generate(3, str(tmp_path), seed=2, report_time=REPORT_TIME, chunk_size=2, progress=False)
+    profile = generator.last_stats.as_dict()["profile"]
+    assert profile["reports"] == 3
+    assert {"values", "template", "draw"} <= set(profile["stages"]) <= set(STAGES)
+    assert profile["stages"]["draw"]["calls"] == 3
+    assert profile["latency_p50_ms"] <= profile["latency_p99_ms"]
+
+
+def test_profile_off_by_default(layout, tmp_path):
+    generator, generate = make_batch(layout)
+    generate(1, str(tmp_path), seed=2, report_time=REPORT_TIME, progress=False)
+    assert generator.last_stats.stages is None
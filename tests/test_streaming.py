@@ -0,0 +1,53 @@
+"""流式数据集：与 iter_reports 的产出一致，按 worker 切分、改变区间大小都不改变内容"""
+from types import SimpleNamespace
+
+import pytest
+
+import streaming
+from streaming import ReportStream
+
+from tests.conftest import GENERATORS, REPORT_TIME, make_batch
+
+N = 5
+
+
+def _items(iterable):
+    return [(image if isinstance(image, bytes) else image.tobytes(), truth) for image, truth in iterable]
+
+
+@pytest.fixture
+def stream_factory(layout):
+    make_batch(layout)  # 没有字体时跳过
+    factory, _ = GENERATORS[layout]
+    return factory
+
+
+def test_stream_matches_iter_reports(stream_factory):
+    stream = ReportStream(stream_factory, n=N, seed=4, start=2, report_time=REPORT_TIME, chunk_size=2)
+    expected = stream_factory().iter_reports(N, seed=4, start=2, report_time=REPORT_TIME)
+    assert len(stream) == N
+    assert _items(stream) == _items(expected)
+
+
+def test_workers_split_the_range(stream_factory, monkeypatch):
+    whole = _items(ReportStream(stream_factory, n=N, seed=4, report_time=REPORT_TIME))
+    stream = ReportStream(stream_factory, n=N, seed=4, report_time=REPORT_TIME, chunk_size=1)
+    parts = []
+    for worker_id in range(3):
+        info = SimpleNamespace(id=worker_id, num_workers=3)
+        monkeypatch.setattr(streaming, "get_worker_info", lambda: info)
+        parts.append(_items(stream))
+    assert [len(part) for part in parts] == [2, 2, 1]
+    assert sum(parts, []) == whole
+
+
+def test_idle_worker_yields_nothing(stream_factory, monkeypatch):
+    monkeypatch.setattr(streaming, "get_worker_info", lambda: SimpleNamespace(id=3, num_workers=4))
+    assert list(ReportStream(stream_factory, n=2, seed=4, report_time=REPORT_TIME)) == []
+
+
+def test_seed_and_time_are_fixed_at_construction(stream_factory):
+    stream = ReportStream(stream_factory, n=2, raw=True)
+    first, second = _items(stream), _items(stream)
+    assert first == second
+    assert all(isinstance(image, bytes) for image, _ in stream)
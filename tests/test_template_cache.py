@@ -0,0 +1,26 @@
+"""静态模板缓存：与每份报告完整重绘逐像素一致，模板只绘制一次且不被渲染改动"""
+import pytest
+
+from encoders import CANVAS_MODES
+
+from tests.conftest import REPORT_TIME, make_batch
+
+
+def _reports(layout, **generator_kwargs):
+    generator, _ = make_batch(layout, text_cache=False, **generator_kwargs)
+    return [(image.tobytes(), truth) for image, truth in generator.iter_reports(3, seed=5, report_time=REPORT_TIME)]
+
+
+@pytest.mark.parametrize("mode", CANVAS_MODES)
+def test_template_cache_does_not_change_output(layout, mode):
+    assert _reports(layout, mode=mode, template_cache=True) == _reports(layout, mode=mode, template_cache=False)
+
+
+def test_template_is_built_once_and_left_untouched(layout):
+    generator, _ = make_batch(layout)
+    template, static_annotations = generator.get_template()
+    pixels, annotation_count = template.tobytes(), len(static_annotations)
+    list(generator.iter_reports(3, seed=5, report_time=REPORT_TIME))
+    assert len(generator._template_cache) == 1
+    assert generator.get_template()[0] is template
+    assert template.tobytes() == pixels and len(static_annotations) == annotation_count
@@ -0,0 +1,27 @@
+"""文字蒙版缓存：与直接绘制逐像素一致，clear() 清空全部缓存"""
+from PIL import Image, ImageDraw
+
+from text_cache import TextMaskCache
+
+from tests.conftest import REPORT_TIME, make_batch
+
+
+def _reports(layout, **generator_kwargs):
+    generator, _ = make_batch(layout, **generator_kwargs)
+    return [(image.tobytes(), truth) for image, truth in generator.iter_reports(3, seed=9, report_time=REPORT_TIME)]
+
+
+def test_text_cache_does_not_change_output(layout):
+    assert _reports(layout, text_cache=True) == _reports(layout, text_cache=False)
+
+
+def test_clear_resets_every_cache(layout):
+    generator, _ = make_batch(layout)
+    font = next(iter(generator.fonts.values()))
+    cache = TextMaskCache()
+    draw = ImageDraw.Draw(Image.new("RGB", (200, 50), "white"))
+    cache.draw_glyphs(draw, (0, 0), "12.5", font, "black")
+    assert cache.stats()["size"] and cache._advances and cache._inks
+    cache.clear()
+    assert cache.stats() == {"hits": 0, "misses": 0, "size": 0, "maxsize": cache.maxsize, "hit_rate": 0.0}
+    assert not cache._advances and not cache._inks
@@ -0,0 +1,105 @@
+"""矢量输出：PDF 交叉引用与流有效，内嵌的子集字体可以加载且字形不变，SVG 是合法的 XML，出错时不留下文档"""
+import io
+import os
+import re
+import xml.etree.ElementTree as ET
+import zlib
+
+import pytest
+from PIL import Image, ImageDraw, ImageFont
+
+from font_resolver import resolve_font
+from vector_output import TrueTypeFont
+
+from tests.conftest import REPORT_TIME, make_batch
+
+SVG_NS = "{http://www.w3.org/2000/svg}"
+
+
+def _generate(layout, output_dir, sink, n=3, shard_size=2):
+    generator, generate = make_batch(layout)
+    return generate(n, str(output_dir), seed=5, report_time=REPORT_TIME, sink=sink, shard_size=shard_size,
+                    progress=False)
+
+
+def _streams(data):
+    """(字典文本, 解压后的流) 列表，同时检查 /Length 与 endstream 对齐"""
+    streams = []
+    for match in re.finditer(rb"<< ([^\n]*?)/Length (\d+) >>\nstream\n", data):
+        length = int(match.group(2))
+        body = data[match.end():match.end() + length]
+        assert data[match.end() + length:].startswith(b"\nendstream")
+        if b"FlateDecode" in match.group(1):
+            body = zlib.decompress(body)
+        streams.append((match.group(1), body))
+    return streams
+
+
+def _render(font, char):
+    image = Image.new("L", (80, 80), 255)
+    ImageDraw.Draw(image).text((5, 5), char, font=font)
+    return image.tobytes()
+
+
+def test_pdf_xref_streams_and_subset_font(layout, tmp_path):
+    paths = _generate(layout, tmp_path, "pdf")
+    assert [os.path.basename(path) for path in paths] == ["reports-000000.pdf", "reports-000001.pdf"]
+    original = TrueTypeFont(resolve_font())
+    for path in paths:
+        with open(path, "rb") as f:
+            data = f.read()
+        xref_at = int(re.search(rb"startxref\n(\d+)\n%%EOF\n$", data).group(1))
+        lines = data[xref_at:].split(b"\n")
+        assert lines[0] == b"xref"
+        for obj_id in range(1, int(lines[1].split()[1])):
+            offset = int(lines[2 + obj_id][:10])
+            assert data[offset:].startswith(b"%d 0 obj" % obj_id)
+
+        streams = _streams(data)
+        fonts = [body for dictionary, body in streams if b"Length1" in dictionary]
+        cmaps = [body for _, body in streams if b"begincmap" in body]
+        assert fonts and len(fonts) == len(cmaps)
+        for font_data, cmap in zip(fonts, cmaps):
+            entries = b"\n".join(re.findall(rb"beginbfchar\n(.*?)\nendbfchar", cmap, re.S))
+            chars = "".join(chr(int(code, 16)) for code in re.findall(rb"<[0-9A-F]{4}> <([0-9A-F]{4})>", entries))
+            assert chars
+            subset = ImageFont.truetype(io.BytesIO(font_data), 40)
+            font_path = tmp_path / "subset.ttf"
+            font_path.write_bytes(font_data)
+            if TrueTypeFont(str(font_path)).postscript_name == original.postscript_name:
+                # 逐字比较：子集不带字距调整表，整串的间距可能不同，字形本身不应变化
+                full = ImageFont.truetype(resolve_font(), 40)
+                for char in chars:
+                    assert _render(subset, char) == _render(full, char), char
+
+
+def test_svg_parses(layout, tmp_path):
+    paths = _generate(layout, tmp_path, "svg")
+    pages = []
+    for path in paths:
+        root = ET.parse(path).getroot()
+        assert root.tag == SVG_NS + "svg"
+        groups = [g for g in root.findall(SVG_NS + "g") if g.get("id", "").startswith("page-")]
+        pages.append(len(groups))
+        assert root.find(SVG_NS + "style").text.count("@font-face") >= 1
+        assert root.findall(f".//{SVG_NS}text")
+    assert pages == [2, 1]
+
+
+@pytest.mark.parametrize("sink", ["pdf", "svg"])
+def test_failed_document_leaves_no_file(layout, tmp_path, monkeypatch, sink):
+    generator, _ = make_batch(layout)
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(generator.plan, "draw_static", fail)
+    with pytest.raises(RuntimeError, match="boom"):
+        generator.generate_document_range(0, 2, 5, REPORT_TIME, str(tmp_path), 2, sink=sink)
+    assert os.listdir(tmp_path) == []
+
+    monkeypatch.undo()
+    monkeypatch.setattr(generator.plan, "draw_variable", fail)
+    with pytest.raises(RuntimeError, match="boom"):
+        generator.generate_document_range(0, 2, 5, REPORT_TIME, str(tmp_path), 2, sink=sink)
+    assert os.listdir(tmp_path) == []
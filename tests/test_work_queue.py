@@ -0,0 +1,75 @@
+"""分布式队列：抢占锁被并发删除、租约被接手后原持有者不写完成记录，接手者崩溃时区间被重新领取"""
+import json
+import os
+import time
+
+from work_queue import WorkQueue, run_worker
+from write_pipeline import PipelineStats
+
+
+class _StolenGenerator:
+    """第一次生成期间租约被另一个工作进程接手；thief_finishes=False 时接手者随后崩溃（不再刷新租约）"""
+
+    def __init__(self, queue_dir, thief_finishes=True):
+        self.queue = WorkQueue(queue_dir)
+        self.thief_finishes = thief_finishes
+        self.calls = 0
+
+    def generate_range(self, start, stop):
+        self.calls += 1
+        result = [f"{i}.png" for i in range(start, stop)]
+        if self.calls == 1:
+            with open(self.queue.lease_path(start), "w", encoding="utf-8") as f:
+                json.dump({"job_id": "job", "worker": "thief", "attempt": 2}, f)
+            if self.thief_finishes:
+                with open(self.queue.done_path(start), "w", encoding="utf-8") as f:
+                    json.dump({"job_id": "job", "start": start, "stop": stop, "worker": "thief", "attempt": 2,
+                               "result": result}, f)
+        return result, PipelineStats()
+
+
+def _job(queue_dir, **kwargs):
+    job = {"job_id": "job", "module": __name__, "factory": "_StolenGenerator",
+           "factory_kwargs": {"queue_dir": queue_dir}, "method": "generate_range", "chunks": [(0, 2)],
+           "task_kwargs": {}, "lease_seconds": 60.0, "max_attempts": 3}
+    job.update(kwargs)
+    return job
+
+
+def test_steal_survives_concurrent_lock_removal(tmp_path, monkeypatch):
+    queue = WorkQueue(str(tmp_path))
+    job = _job(str(tmp_path), lease_seconds=1.0)
+    queue.create(job)
+    assert queue.try_claim(job, 0, "crashed") == 1
+    old = time.time() - 10
+    os.utime(queue.lease_path(0), (old, old))
+
+    read_lease = WorkQueue._read_lease
+
+    def racing_read(self, start):
+        # 模拟另一个工作进程判定这把抢占锁已过期并删掉
+        os.remove(self.lease_path(start) + ".steal")
+        return read_lease(self, start)
+
+    monkeypatch.setattr(WorkQueue, "_read_lease", racing_read)
+    assert queue.try_claim(job, 0, "thief") == 2
+    monkeypatch.undo()
+    assert queue.owns(0, "thief")
+
+
+def test_stolen_lease_writes_no_done_record(tmp_path):
+    queue = WorkQueue(str(tmp_path))
+    queue.create(_job(str(tmp_path)))
+    assert run_worker(str(tmp_path), worker_id="slow", poll_seconds=0.01) == 0
+    assert queue.done_record("job", 0)["worker"] == "thief"
+
+
+def test_chunk_is_reclaimed_when_thief_dies(tmp_path):
+    """接手者崩溃后不会写完成记录：原持有者等租约再次过期后重新领取，而不是把区间当作已完成"""
+    queue = WorkQueue(str(tmp_path))
+    queue.create(_job(str(tmp_path), factory_kwargs={"queue_dir": str(tmp_path), "thief_finishes": False},
+                      lease_seconds=0.3))
+    assert run_worker(str(tmp_path), worker_id="slow", poll_seconds=0.01) == 1
+    record = queue.done_record("job", 0)
+    assert (record["worker"], record["attempt"]) == ("slow", 3)
+    assert not os.path.exists(queue.lease_path(0))
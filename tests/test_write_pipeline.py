@@ -0,0 +1,85 @@
+"""写出流水线：写线程的错误在正常结束时抛出，但不覆盖渲染时的异常"""
+import threading
+
+import pytest
+
+from write_pipeline import WritePipeline
+
+from tests.conftest import REPORT_TIME, make_batch
+
+
+class FailingEncoder:
+    """等到 ready 被设置后编码失败，模拟写线程在渲染出错的同时出错"""
+
+    extension = "png"
+
+    def __init__(self):
+        self.ready = threading.Event()
+
+    def encode(self, image):
+        self.ready.wait(5)
+        raise OSError("磁盘已满")
+
+
+@pytest.mark.parametrize("writers", [0, 1])
+def test_writer_error_is_raised(writers):
+    encoder = FailingEncoder()
+    encoder.ready.set()
+    with pytest.raises(OSError):
+        pipeline = WritePipeline(encoder, writers=writers)
+        pipeline.submit(object(), lambda data: None)
+        pipeline.close()
+
+
+def test_close_without_raising_keeps_error_for_later():
+    encoder = FailingEncoder()
+    encoder.ready.set()
+    pipeline = WritePipeline(encoder, writers=1)
+    pipeline.submit(object(), lambda data: None)
+    pipeline.close(raise_error=False)
+    with pytest.raises(OSError):
+        pipeline.close()
+
+
+def test_image_is_released_when_encoding_fails():
+    encoder = FailingEncoder()
+    encoder.ready.set()
+    released = []
+    pipeline = WritePipeline(encoder, writers=0, release=released.append)
+    image = object()
+    with pytest.raises(OSError):
+        pipeline.submit(image, lambda data: None)
+    assert released == [image]
+
+
+def test_queued_images_are_released_after_writer_error():
+    """编码失败的图片和出错后排空的图片都要归还，画布池不会被耗尽"""
+    encoder = FailingEncoder()
+    released = []
+    pipeline = WritePipeline(encoder, writers=1, max_pending=4, release=released.append)
+    images = [object() for _ in range(3)]
+    for image in images:
+        pipeline.submit(image, lambda data: None)
+    encoder.ready.set()
+    with pytest.raises(OSError):
+        pipeline.close()
+    assert released == images
+
+
+@pytest.mark.parametrize("method", ["generate_range", "generate_shard_range"])
+def test_writer_error_does_not_mask_render_error(tmp_path, monkeypatch, method):
+    encoder = FailingEncoder()
+    generator, _ = make_batch("one_col", encoder=encoder)
+    iter_range = generator.iter_range
+
+    def broken(*args, **kwargs):
+        for count, item in enumerate(iter_range(*args, **kwargs)):
+            if count == 2:
+                encoder.ready.set()
+                raise ValueError("渲染出错")
+            yield item
+
+    monkeypatch.setattr(generator, "iter_range", broken)
+    kwargs = {"shard_size": 10} if method == "generate_shard_range" else {}
+    with pytest.raises(ValueError, match="渲染出错"):
+        getattr(generator, method)(0, 4, 1, REPORT_TIME, str(tmp_path), writers=1, **kwargs)
@@ -0,0 +1,119 @@
+"""文字栅格化缓存
+
+报告中大量文字是重复的（项目名称、单位、参考值、数字、↑/↓、常见姓名），
+每次都交给 FreeType 栅格化很浪费。这里把栅格化后的文字蒙版放进有界 LRU 缓存，
+绘制时直接把蒙版贴到画布上；结果数值则由缓存的单个字符拼接而成。
+"""
+from collections import OrderedDict
+
+from PIL import ImageColor, ImageFont
+
+
+class TextMaskCache:
+    """以 (文字, 字体, 蒙版模式) 为键的文字蒙版 LRU 缓存
+
+    蒙版与颜色无关，颜色在贴图时才应用，因此同一段文字换颜色也能命中缓存。
+    """
+
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._masks = OrderedDict()
+        self._advances = {}
+        self._inks = {}
+
+    @staticmethod
+    def font_key(font):
+        return (getattr(font, "path", None), getattr(font, "size", None), getattr(font, "index", 0))
+
+    def get_mask(self, text, font, mode="L"):
+        """获取 (蒙版, 偏移)，未命中时栅格化并放入缓存"""
+        key = (text, self.font_key(font), mode)
+        entry = self._masks.get(key)
+        if entry is not None:
+            self.hits += 1
+            self._masks.move_to_end(key)
+            return entry
+
+        self.misses += 1
+        entry = font.getmask2(text, mode)
+        self._masks[key] = entry
+        if len(self._masks) > self.maxsize:
+            self._masks.popitem(last=False)
+        return entry
+
+    def get_advance(self, char, font):
+        """单个字符的横向步进宽度"""
+        key = (char, self.font_key(font))
+        advance = self._advances.get(key)
+        if advance is None:
+            advance = font.getlength(char)
+            self._advances[key] = advance
+        return advance
+
+    def _get_ink(self, draw, fill):
+        key = (fill, draw.mode)
+        ink = self._inks.get(key)
+        if ink is None:
+            color = ImageColor.getcolor(fill, draw.mode) if isinstance(fill, str) else fill
+            ink = draw.draw.draw_ink(color)
+            self._inks[key] = ink
+        return ink
+
+    def draw_text(self, draw, position, text, font, fill):
+        """与 draw.text(position, text, font=font, fill=fill) 输出一致，但复用缓存的蒙版
+
+        返回文字的像素包围盒 (x0, y0, x1, y1)，与 draw.textbbox 相同；空文本返回 None。
+        """
+        if not text:
+            return None
+        if not isinstance(font, ImageFont.FreeTypeFont):
+            draw.text(position, text, font=font, fill=fill)
+            return draw.textbbox(position, text, font=font)
+        mask, offset = self.get_mask(text, font, draw.fontmode)
+        x0, y0 = int(position[0]) + offset[0], int(position[1]) + offset[1]
+        draw.draw.draw_bitmap((x0, y0), mask, self._get_ink(draw, fill))
+        width, height = mask.size
+        return x0, y0, x0 + width, y0 + height
+
+    def draw_glyphs(self, draw, position, text, font, fill):
+        """逐字符拼接绘制（用于取值变化很多的数字），每个字符的蒙版都来自缓存
+
+        返回整段文字的像素包围盒。
+        """
+        if not isinstance(font, ImageFont.FreeTypeFont):
+            draw.text(position, text, font=font, fill=fill)
+            return draw.textbbox(position, text, font=font)
+        x, y = position
+        pen = float(x)
+        bbox = None
+        for char in text:
+            char_bbox = self.draw_text(draw, (int(round(pen)), y), char, font, fill)
+            pen += self.get_advance(char, font)
+            if char_bbox is None or char_bbox[0] == char_bbox[2]:
+                continue
+            if bbox is None:
+                bbox = char_bbox
+            else:
+                bbox = (min(bbox[0], char_bbox[0]), min(bbox[1], char_bbox[1]),
+                        max(bbox[2], char_bbox[2]), max(bbox[3], char_bbox[3]))
+        return bbox
+
+    def clear(self):
+        self._masks.clear()
+        self._advances.clear()
+        self._inks.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        """命中/未命中计数"""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._masks),
+            "maxsize": self.maxsize,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
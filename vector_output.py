@@ -0,0 +1,658 @@
+"""矢量输出：PDF / SVG，不经过位图
+
+有的使用方要的是可打印、可搜索文字的报告，而不是位图：为了交付先把 2480×1748 的 PNG 栅格化一遍纯属浪费。
+这里提供一个与 ImageDraw 接口相同的记录页面（VectorPage，只实现绘制计划用到的 text / textbbox / line），
+生成器用同一份 DrawPlan 和同样的患者数据在上面绘制，再由文档写入器把每一页直接写成矢量指令：
+
+    PDF  多页文档，文字为 Type0 / CIDFontType2 字体（Identity-H 编码 + ToUnicode，可复制、可搜索），
+         静态内容写成一个 Form XObject，每页只引用一次
+    SVG  单个文件内纵向排列的多页，文字为 <text>，字体子集以 @font-face 内嵌，静态内容为 <use> 引用的 <g>
+
+两种格式都是流式写入：每一页画完立即写进文件，内存中只保留用到的字形集合和对象偏移，
+一个文件可以写上万页。字体在文件末尾按实际用到的字形生成子集后内嵌（只支持 TrueType 轮廓即 glyf 的字体，
+包括 .ttc 中的字体；CFF 轮廓的 .otf 会报错）。坐标沿用版面的像素单位，PDF 页面尺寸按 dpi 换算成点。
+
+文档先写到同目录的临时文件，close() 写完后才原子替换为目标路径；出错时 discard() 删掉临时文件，
+不会留下截断的文档，同一文档被两个进程重做时也不会互相截断。
+"""
+import base64
+import contextlib
+import glob
+import hashlib
+import os
+import re
+import struct
+import uuid
+import zlib
+from xml.sax.saxutils import escape, quoteattr
+
+from PIL import ImageColor
+
+# 格式 -> 文件扩展名
+VECTOR_FORMATS = {"pdf": "pdf", "svg": "svg"}
+
+DEFAULT_DPI = 300
+
+# 子集字体中原样保留的表（其余的 glyf / loca / hmtx / cmap / post / head / hhea / maxp 重写，
+# 位图、排版、竖排等表丢弃）
+_KEEP_TABLES = ("OS/2", "cvt ", "fpgm", "gasp", "name", "prep")
+
+# 组合字形部件的标志位
+_ARG_WORDS, _HAVE_SCALE, _MORE_COMPONENTS, _XY_SCALE, _TWO_BY_TWO = 0x1, 0x8, 0x20, 0x40, 0x80
+
+
+def _checksum(data):
+    data += b"\0" * (-len(data) % 4)
+    return sum(struct.unpack(f">{len(data) // 4}I", data)) & 0xFFFFFFFF
+
+
+def _components(glyph):
+    """组合字形中各部件编号的 (字节偏移, 字形编号)"""
+    pos = 10
+    while True:
+        flags, component = struct.unpack(">HH", glyph[pos:pos + 4])
+        yield pos + 2, component
+        pos += 4 + (4 if flags & _ARG_WORDS else 2)
+        if flags & _HAVE_SCALE:
+            pos += 2
+        elif flags & _XY_SCALE:
+            pos += 4
+        elif flags & _TWO_BY_TWO:
+            pos += 8
+        if not flags & _MORE_COMPONENTS:
+            return
+
+
+class TrueTypeFont:
+    """TrueType 字体（.ttf，或 .ttc 中第 index 个字体）的最小解析器：字符映射、字宽和按字形生成子集"""
+
+    def __init__(self, path, index=0):
+        with open(path, "rb") as f:
+            data = f.read()
+        offset = 0
+        if data[:4] == b"ttcf":
+            count = struct.unpack(">I", data[8:12])[0]
+            if not 0 <= index < count:
+                raise ValueError(f"字体集合 {path} 中没有第 {index} 个字体")
+            offset = struct.unpack(">I", data[12 + 4 * index:16 + 4 * index])[0]
+        if data[offset:offset + 4] == b"OTTO":
+            raise ValueError(f"矢量输出需要 TrueType 轮廓（glyf）的字体，{path} 为 CFF 轮廓，"
+                             "请用环境变量 BLOOD_REPORT_FONT 指定其他字体")
+        table_count = struct.unpack(">H", data[offset + 4:offset + 6])[0]
+        self.tables = {}
+        for i in range(table_count):
+            entry = offset + 12 + 16 * i
+            tag, _, table_offset, length = struct.unpack(">4sIII", data[entry:entry + 16])
+            self.tables[tag.decode("latin-1")] = data[table_offset:table_offset + length]
+        for tag in ("head", "hhea", "hmtx", "maxp", "cmap", "loca", "glyf"):
+            if tag not in self.tables:
+                raise ValueError(f"字体 {path} 缺少 {tag} 表，无法用于矢量输出")
+
+        self.path = path
+        head = self.tables["head"]
+        self.units_per_em = struct.unpack(">H", head[18:20])[0]
+        self.bbox = struct.unpack(">hhhh", head[36:44])
+        long_loca = struct.unpack(">h", head[50:52])[0] == 1
+        self.glyph_count = struct.unpack(">H", self.tables["maxp"][4:6])[0]
+        self.ascent, self.descent = struct.unpack(">hh", self.tables["hhea"][4:8])
+
+        metric_count = struct.unpack(">H", self.tables["hhea"][34:36])[0]
+        hmtx = self.tables["hmtx"]
+        metrics = list(struct.iter_unpack(">Hh", hmtx[:4 * metric_count]))
+        extra = self.glyph_count - metric_count
+        lsbs = struct.unpack(f">{extra}h", hmtx[4 * metric_count:4 * metric_count + 2 * extra]) if extra > 0 else ()
+        self.metrics = metrics + [(metrics[-1][0], lsb) for lsb in lsbs]
+
+        loca = self.tables["loca"]
+        count = self.glyph_count + 1
+        if long_loca:
+            self.loca = struct.unpack(f">{count}I", loca[:4 * count])
+        else:
+            self.loca = [value * 2 for value in struct.unpack(f">{count}H", loca[:2 * count])]
+        self.cmap = self._parse_cmap()
+        self.postscript_name = self._postscript_name() or re.sub(r"[^A-Za-z0-9-]", "", os.path.basename(path))
+
+    def _parse_cmap(self):
+        cmap = self.tables["cmap"]
+        subtables = {}
+        for i in range(struct.unpack(">H", cmap[2:4])[0]):
+            platform, encoding, offset = struct.unpack(">HHI", cmap[4 + 8 * i:12 + 8 * i])
+            subtables[(platform, encoding, struct.unpack(">H", cmap[offset:offset + 2])[0])] = offset
+        for key in ((3, 10, 12), (0, 4, 12), (0, 6, 12), (3, 1, 4), (0, 3, 4), (0, 1, 4), (0, 0, 4)):
+            if key in subtables:
+                offset = subtables[key]
+                return self._cmap_format12(cmap, offset) if key[2] == 12 else self._cmap_format4(cmap, offset)
+        raise ValueError(f"字体 {self.path} 没有 Unicode 字符映射")
+
+    @staticmethod
+    def _cmap_format12(cmap, offset):
+        mapping = {}
+        count = struct.unpack(">I", cmap[offset + 12:offset + 16])[0]
+        for start, end, glyph in struct.iter_unpack(">III", cmap[offset + 16:offset + 16 + 12 * count]):
+            for code in range(start, end + 1):
+                mapping[code] = glyph + code - start
+        return mapping
+
+    @staticmethod
+    def _cmap_format4(cmap, offset):
+        mapping = {}
+        seg_count = struct.unpack(">H", cmap[offset + 6:offset + 8])[0] // 2
+        ends_at = offset + 14
+        starts_at = ends_at + 2 * seg_count + 2
+        deltas_at = starts_at + 2 * seg_count
+        ranges_at = deltas_at + 2 * seg_count
+        ends = struct.unpack(f">{seg_count}H", cmap[ends_at:ends_at + 2 * seg_count])
+        starts = struct.unpack(f">{seg_count}H", cmap[starts_at:starts_at + 2 * seg_count])
+        deltas = struct.unpack(f">{seg_count}H", cmap[deltas_at:deltas_at + 2 * seg_count])
+        ranges = struct.unpack(f">{seg_count}H", cmap[ranges_at:ranges_at + 2 * seg_count])
+        for i, (start, end, delta, range_offset) in enumerate(zip(starts, ends, deltas, ranges)):
+            if start == 0xFFFF:
+                continue
+            for code in range(start, end + 1):
+                if range_offset == 0:
+                    glyph = (code + delta) & 0xFFFF
+                else:
+                    at = ranges_at + 2 * i + range_offset + 2 * (code - start)
+                    glyph = struct.unpack(">H", cmap[at:at + 2])[0]
+                    if glyph:
+                        glyph = (glyph + delta) & 0xFFFF
+                if glyph:
+                    mapping[code] = glyph
+        return mapping
+
+    def _postscript_name(self):
+        table = self.tables.get("name")
+        if not table:
+            return None
+        count, string_offset = struct.unpack(">HH", table[2:6])
+        for i in range(count):
+            platform, _, _, name_id, length, offset = struct.unpack(">HHHHHH", table[6 + 12 * i:18 + 12 * i])
+            if name_id != 6:
+                continue
+            raw = table[string_offset + offset:string_offset + offset + length]
+            name = raw.decode("utf-16-be" if platform in (0, 3) else "latin-1", errors="ignore")
+            name = re.sub(r"[^A-Za-z0-9-]", "", name)
+            if name:
+                return name
+        return None
+
+    def glyph_id(self, char):
+        """字符对应的字形编号，字体中没有时为 0（.notdef）"""
+        return self.cmap.get(ord(char), 0)
+
+    def advance(self, glyph):
+        """字宽（字体单位）"""
+        return self.metrics[glyph][0]
+
+    def _glyph_data(self, glyph):
+        return self.tables["glyf"][self.loca[glyph]:self.loca[glyph + 1]]
+
+    def subset(self, glyphs, chars):
+        """只保留 glyphs（及其组合部件、.notdef）轮廓的字体文件字节
+
+        字形编号保持不变（PDF 中的 CID 即字形编号），没用到的字形为空轮廓、零字宽；
+        字符映射只包含 chars 中的字符。
+        """
+        keep = {0}
+        pending = list(glyphs)
+        while pending:
+            glyph = pending.pop()
+            if glyph in keep or not 0 <= glyph < self.glyph_count:
+                continue
+            keep.add(glyph)
+            data = self._glyph_data(glyph)
+            if len(data) > 10 and struct.unpack(">h", data[:2])[0] < 0:
+                pending.extend(component for _, component in _components(data))
+
+        glyf = bytearray()
+        loca = []
+        hmtx = bytearray()
+        for glyph in range(self.glyph_count):
+            loca.append(len(glyf))
+            if glyph in keep:
+                data = self._glyph_data(glyph)
+                glyf += data + b"\0" * (-len(data) % 4)
+                hmtx += struct.pack(">Hh", *self.metrics[glyph])
+            else:
+                hmtx += b"\0\0\0\0"
+        loca.append(len(glyf))
+
+        tables = {tag: self.tables[tag] for tag in _KEEP_TABLES if tag in self.tables}
+        tables["glyf"] = bytes(glyf)
+        tables["loca"] = struct.pack(f">{len(loca)}I", *loca)
+        tables["hmtx"] = bytes(hmtx)
+        hhea = self.tables["hhea"]
+        tables["hhea"] = hhea[:34] + struct.pack(">H", self.glyph_count) + hhea[36:]
+        tables["maxp"] = self.tables["maxp"]
+        post = self.tables.get("post", b"\0" * 32)
+        tables["post"] = struct.pack(">I", 0x00030000) + post[4:32]
+        head = bytearray(self.tables["head"])
+        head[8:12] = b"\0\0\0\0"
+        head[50:52] = struct.pack(">h", 1)
+        tables["head"] = bytes(head)
+        tables["cmap"] = _build_cmap({ord(char): self.glyph_id(char) for char in chars if self.glyph_id(char)})
+        return _build_font(tables)
+
+
+def _build_cmap(mapping):
+    """Unicode 字符映射表：BMP 字符为格式 4（3,1），有 BMP 以外的字符时另加格式 12（3,10）"""
+    bmp = sorted((code, glyph) for code, glyph in mapping.items() if code < 0xFFFF)
+    segments = []  # [起始字符, 结束字符, 起始字形]
+    for code, glyph in bmp:
+        if segments and code == segments[-1][1] + 1 and glyph - code == segments[-1][2] - segments[-1][0]:
+            segments[-1][1] = code
+        else:
+            segments.append([code, code, glyph])
+    segments.append([0xFFFF, 0xFFFF, 1])
+    seg_count = len(segments)
+    search_range = 2 * 2 ** (seg_count.bit_length() - 1)
+    body = struct.pack(f">{seg_count}H", *(end for _, end, _ in segments)) + b"\0\0"
+    body += struct.pack(f">{seg_count}H", *(start for start, _, _ in segments))
+    body += struct.pack(f">{seg_count}H", *((glyph - start) & 0xFFFF for start, _, glyph in segments))
+    body += b"\0\0" * seg_count
+    format4 = struct.pack(">HHHHHHH", 4, 14 + len(body), 0, 2 * seg_count, search_range,
+                          search_range.bit_length() - 2, 2 * seg_count - search_range) + body
+
+    subtables = [((3, 1), format4)]
+    if any(code > 0xFFFF for code in mapping):
+        groups = [struct.pack(">III", code, code, glyph) for code, glyph in sorted(mapping.items())]
+        subtables.append(((3, 10), struct.pack(">HHIII", 12, 0, 16 + 12 * len(groups), 0, len(groups))
+                          + b"".join(groups)))
+    header = struct.pack(">HH", 0, len(subtables))
+    offset = 4 + 8 * len(subtables)
+    records = b""
+    for (platform, encoding), data in subtables:
+        records += struct.pack(">HHI", platform, encoding, offset)
+        offset += len(data)
+    return header + records + b"".join(data for _, data in subtables)
+
+
+def _build_font(tables):
+    """由 {表名: 字节} 组装 TrueType 文件，并填写 head 的 checksumAdjustment"""
+    tags = sorted(tables)
+    count = len(tags)
+    search_range = 16 * 2 ** (count.bit_length() - 1)
+    directory = struct.pack(">IHHHH", 0x00010000, count, search_range, count.bit_length() - 1,
+                            16 * count - search_range)
+    offset = 12 + 16 * count
+    body = b""
+    for tag in tags:
+        data = tables[tag]
+        directory += struct.pack(">4sIII", tag.encode("latin-1"), _checksum(data), offset, len(data))
+        padded = data + b"\0" * (-len(data) % 4)
+        body += padded
+        offset += len(padded)
+    font = bytearray(directory + body)
+    head_at = 12 + 16 * count + sum(len(tables[tag]) + (-len(tables[tag]) % 4) for tag in tags[:tags.index("head")])
+    font[head_at + 8:head_at + 12] = struct.pack(">I", (0xB1B0AFBA - _checksum(bytes(font))) & 0xFFFFFFFF)
+    return bytes(font)
+
+
+# 同一进程内每个字体文件只解析一次
+_font_files = {}
+
+
+def load_truetype(path, index=0):
+    key = (path, index)
+    if key not in _font_files:
+        _font_files[key] = TrueTypeFont(path, index)
+    return _font_files[key]
+
+
+class VectorPage:
+    """一页报告的绘制记录，提供绘制计划用到的 ImageDraw 接口（text / textbbox / line）"""
+
+    def __init__(self):
+        self.ops = []
+
+    def text(self, position, text, font=None, fill=None):
+        self.ops.append(("text", position, text, font, fill))
+
+    def textbbox(self, position, text, font=None):
+        left, top, right, bottom = font.getbbox(text)
+        return position[0] + left, position[1] + top, position[0] + right, position[1] + bottom
+
+    def line(self, points, fill=None, width=0):
+        self.ops.append(("line", [tuple(point) for point in points], fill, width))
+
+
+class _FontUse:
+    """文档中用到的一个字体：资源名和用到的字形（字形编号 -> 字符）"""
+
+    def __init__(self, name, font):
+        self.name = name
+        self.font = font
+        self.glyphs = {}
+
+    def encode(self, text):
+        glyphs = []
+        for char in text:
+            glyph = self.font.glyph_id(char)
+            self.glyphs.setdefault(glyph, char)
+            glyphs.append(glyph)
+        return glyphs
+
+    def subset(self):
+        glyphs = {glyph for glyph in self.glyphs if glyph}
+        return self.font.subset(glyphs, [char for glyph, char in self.glyphs.items() if glyph])
+
+    def subset_name(self):
+        """子集字体名：6 个大写字母的标签 + PostScript 名"""
+        digest = hashlib.md5(repr(sorted(self.glyphs)).encode()).digest()
+        return "".join(chr(65 + b % 26) for b in digest[:6]) + "+" + self.font.postscript_name
+
+
+def _num(value):
+    """PDF / SVG 中的数字：整数原样输出，小数最多保留 3 位"""
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+    return f"{value:.3f}".rstrip("0").rstrip(".")
+
+
+class _VectorDocument:
+    """流式矢量文档的公共部分：页面管理、字体登记、基线位置"""
+
+    extension = None
+
+    def __init__(self, path, width, height, dpi=DEFAULT_DPI, background="white"):
+        self.path = path
+        self.width = width
+        self.height = height
+        self.dpi = dpi
+        self.background = background
+        self.page_count = 0
+        self.fonts = {}
+        self._ascents = {}
+        self._template = None
+        self._template_written = False
+        self._page = None
+        self._tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        self._file = open(self._tmp_path, "wb")
+        self._offset = 0
+        self._begin()
+
+    def _write(self, data):
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        self._file.write(data)
+        self._offset += len(data)
+
+    def _font(self, font):
+        """登记 PIL 字体对应的字体文件，返回 _FontUse"""
+        path = getattr(font, "path", None)
+        if not isinstance(path, (str, os.PathLike)):
+            raise ValueError("矢量输出需要从字体文件加载的 TrueType 字体（ImageFont.truetype）")
+        key = (path, getattr(font, "index", 0))
+        if key not in self.fonts:
+            self.fonts[key] = _FontUse(f"F{len(self.fonts)}", load_truetype(*key))
+        return self.fonts[key]
+
+    def _baseline(self, font, y):
+        """Pillow 以字体上沿（ascender）定位文字，这里换算成基线"""
+        ascent = self._ascents.get(id(font))
+        if ascent is None:
+            ascent = self._ascents[id(font)] = font.getmetrics()[0]
+        return y + ascent
+
+    def template(self):
+        """返回绘制静态内容的页面：只绘制一次，写在每一页最底层；必须在第一页之前调用"""
+        if self.page_count or self._template is not None:
+            raise RuntimeError("静态内容只能在第一页之前设置一次")
+        self._template = VectorPage()
+        return self._template
+
+    def new_page(self):
+        """结束上一页并开始新的一页，返回用于绘制的 VectorPage"""
+        self._finish_page()
+        if self._template is not None and not self._template_written:
+            self._write_template(self._template.ops)
+            self._template_written = True
+        self._page = VectorPage()
+        return self._page
+
+    def _finish_page(self):
+        if self._page is not None:
+            self._write_page(self._page.ops)
+            self.page_count += 1
+            self._page = None
+
+    def close(self):
+        """写完文档并替换到 path；可重复调用"""
+        if self._file.closed:
+            return
+        try:
+            self._finish_page()
+            self._end()
+        except BaseException:
+            self.discard()
+            raise
+        self._file.close()
+        os.replace(self._tmp_path, self.path)
+
+    def discard(self):
+        """放弃写了一半的文档：关闭并删除临时文件，path 保持原样"""
+        if self._file.closed:
+            return
+        self._file.close()
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(self._tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+    @property
+    def bytes_written(self):
+        return self._offset
+
+
+def _rgb(fill):
+    return ImageColor.getrgb(fill if fill is not None else "black")[:3]
+
+
+def _hex(fill):
+    return "#%02x%02x%02x" % _rgb(fill)
+
+
+class PdfDocument(_VectorDocument):
+    """流式多页 PDF：每页写完即落盘，字体、页面树和交叉引用表在关闭时写出"""
+
+    extension = "pdf"
+    _CATALOG, _PAGES, _RESOURCES = 1, 2, 3
+
+    def _begin(self):
+        self._objects = {}
+        self._next_id = 4
+        self._kids = []
+        self._template_id = None
+        self._write(b"%PDF-1.7\n%\xe2\xe3\xcf\xd3\n")
+        self.scale = 72 / self.dpi
+
+    def _reserve(self):
+        obj_id = self._next_id
+        self._next_id += 1
+        return obj_id
+
+    def _object(self, obj_id, dictionary, stream=None):
+        self._objects[obj_id] = self._offset
+        if stream is None:
+            self._write(f"{obj_id} 0 obj\n{dictionary}\nendobj\n")
+            return
+        self._write(f"{obj_id} 0 obj\n<< {dictionary} /Length {len(stream)} >>\nstream\n")
+        self._write(stream)
+        self._write(b"\nendstream\nendobj\n")
+
+    def _content(self, ops):
+        """绘制记录 -> PDF 内容流（坐标系已翻转为 y 向下的像素坐标）"""
+        out = []
+        fill = stroke = None
+        for op in ops:
+            if op[0] == "text":
+                _, (x, y), text, font, color = op
+                if not text:
+                    continue
+                use = self._font(font)
+                rgb = _rgb(color)
+                if rgb != fill:
+                    out.append("%s %s %s rg" % tuple(_num(c / 255) for c in rgb))
+                    fill = rgb
+                glyphs = "".join(f"{glyph:04X}" for glyph in use.encode(text))
+                out.append(f"BT /{use.name} {_num(font.size)} Tf 1 0 0 -1 {_num(x)} {_num(self._baseline(font, y))} Tm "
+                           f"<{glyphs}> Tj ET")
+            else:
+                _, points, color, width = op
+                rgb = _rgb(color)
+                if rgb != stroke:
+                    out.append("%s %s %s RG" % tuple(_num(c / 255) for c in rgb))
+                    stroke = rgb
+                path = " ".join(f"{_num(px)} {_num(py)} {'m' if i == 0 else 'l'}" for i, (px, py) in enumerate(points))
+                out.append(f"{_num(max(width, 1))} w {path} S")
+        return "\n".join(out).encode("latin-1")
+
+    def _write_template(self, ops):
+        self._template_id = self._reserve()
+        stream = zlib.compress(self._content(ops))
+        self._object(self._template_id, f"/Type /XObject /Subtype /Form /BBox [0 0 {self.width} {self.height}] "
+                                        f"/Resources {self._RESOURCES} 0 R /Filter /FlateDecode", stream)
+
+    def _write_page(self, ops):
+        page_width, page_height = self.width * self.scale, self.height * self.scale
+        parts = [f"q {_num(self.scale)} 0 0 {_num(-self.scale)} 0 {_num(page_height)} cm"]
+        if _rgb(self.background) != (255, 255, 255):
+            parts.append("%s %s %s rg 0 0 %d %d re f" % (*(_num(c / 255) for c in _rgb(self.background)),
+                                                        self.width, self.height))
+        if self._template_id is not None:
+            parts.append("/T0 Do")
+        content = "\n".join(parts).encode("latin-1") + b"\n" + self._content(ops) + b"\nQ"
+        content_id, page_id = self._reserve(), self._reserve()
+        self._object(content_id, "/Filter /FlateDecode", zlib.compress(content))
+        self._object(page_id, f"<< /Type /Page /Parent {self._PAGES} 0 R "
+                              f"/MediaBox [0 0 {_num(page_width)} {_num(page_height)}] "
+                              f"/Resources {self._RESOURCES} 0 R /Contents {content_id} 0 R >>")
+        self._kids.append(page_id)
+
+    def _write_font(self, use):
+        font = use.font
+        per_em = 1000 / font.units_per_em
+        name = use.subset_name()
+        data = use.subset()
+        file_id, descriptor_id, cid_id, unicode_id, font_id = (self._reserve() for _ in range(5))
+        self._object(file_id, f"/Length1 {len(data)} /Filter /FlateDecode", zlib.compress(data))
+        bbox = " ".join(str(round(v * per_em)) for v in font.bbox)
+        self._object(descriptor_id, f"<< /Type /FontDescriptor /FontName /{name} /Flags 4 /FontBBox [{bbox}] "
+                                    f"/ItalicAngle 0 /Ascent {round(font.ascent * per_em)} "
+                                    f"/Descent {round(font.descent * per_em)} /CapHeight {round(font.ascent * per_em)} "
+                                    f"/StemV 80 /FontFile2 {file_id} 0 R >>")
+        widths = " ".join(f"{glyph} [{round(font.advance(glyph) * per_em)}]" for glyph in sorted(use.glyphs))
+        self._object(cid_id, f"<< /Type /Font /Subtype /CIDFontType2 /BaseFont /{name} "
+                             f"/CIDSystemInfo << /Registry (Adobe) /Ordering (Identity) /Supplement 0 >> "
+                             f"/FontDescriptor {descriptor_id} 0 R /W [{widths}] /CIDToGIDMap /Identity >>")
+        self._object(unicode_id, "/Filter /FlateDecode", zlib.compress(_to_unicode_cmap(use.glyphs)))
+        self._object(font_id, f"<< /Type /Font /Subtype /Type0 /BaseFont /{name} /Encoding /Identity-H "
+                              f"/DescendantFonts [{cid_id} 0 R] /ToUnicode {unicode_id} 0 R >>")
+        return font_id
+
+    def _end(self):
+        fonts = " ".join(f"/{use.name} {self._write_font(use)} 0 R" for use in self.fonts.values())
+        xobjects = f"/XObject << /T0 {self._template_id} 0 R >> " if self._template_id is not None else ""
+        self._object(self._RESOURCES, f"<< /Font << {fonts} >> {xobjects}/ProcSet [/PDF /Text] >>")
+        kids = " ".join(f"{kid} 0 R" for kid in self._kids)
+        self._object(self._PAGES, f"<< /Type /Pages /Kids [{kids}] /Count {len(self._kids)} >>")
+        self._object(self._CATALOG, f"<< /Type /Catalog /Pages {self._PAGES} 0 R >>")
+        xref_at = self._offset
+        entries = ["0000000000 65535 f "] + [f"{self._objects.get(i, 0):010d} 00000 n " for i in range(1, self._next_id)]
+        self._write(f"xref\n0 {self._next_id}\n" + "\n".join(entries) + "\n")
+        self._write(f"trailer\n<< /Size {self._next_id} /Root {self._CATALOG} 0 R >>\nstartxref\n{xref_at}\n%%EOF\n")
+
+
+def _to_unicode_cmap(glyphs):
+    """字形编号 -> Unicode 的 ToUnicode CMap，使 PDF 中的文字可以复制和搜索"""
+    lines = ["/CIDInit /ProcSet findresource begin", "12 dict begin", "begincmap",
+             "/CIDSystemInfo << /Registry (Adobe) /Ordering (UCS) /Supplement 0 >> def",
+             "/CMapName /Adobe-Identity-UCS def", "/CMapType 2 def",
+             "1 begincodespacerange", "<0000> <FFFF>", "endcodespacerange"]
+    entries = [(glyph, char) for glyph, char in sorted(glyphs.items()) if glyph]
+    for i in range(0, len(entries), 100):
+        block = entries[i:i + 100]
+        lines.append(f"{len(block)} beginbfchar")
+        lines.extend(f"<{glyph:04X}> <{char.encode('utf-16-be').hex().upper()}>" for glyph, char in block)
+        lines.append("endbfchar")
+    lines += ["endcmap", "CMapName currentdict /CMap defineresource pop", "end", "end"]
+    return "\n".join(lines).encode("latin-1")
+
+
+class SvgDocument(_VectorDocument):
+    """单个 SVG 文件中纵向排列的多页；字体子集在文件末尾以 @font-face 内嵌"""
+
+    extension = "svg"
+    _HEIGHT_FIELD = 20  # viewBox 中总高度预留的宽度，关闭时回填
+
+    def _begin(self):
+        self._write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                    '<svg xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink" '
+                    f'xml:space="preserve" viewBox="0 0 {self.width} ')
+        self._height_at = self._offset
+        self._write(" " * self._HEIGHT_FIELD + '">\n')
+
+    def _elements(self, ops):
+        out = []
+        for op in ops:
+            if op[0] == "text":
+                _, (x, y), text, font, color = op
+                if not text:
+                    continue
+                use = self._font(font)
+                use.encode(text)
+                out.append(f'<text x="{_num(x)}" y="{_num(self._baseline(font, y))}" font-family="{use.name}" '
+                           f'font-size="{_num(font.size)}" fill="{_hex(color)}">{escape(text)}</text>')
+            else:
+                _, points, color, width = op
+                coords = " ".join(f"{_num(px)},{_num(py)}" for px, py in points)
+                out.append(f'<polyline points="{coords}" fill="none" stroke="{_hex(color)}" '
+                           f'stroke-width="{_num(max(width, 1))}"/>')
+        return "\n".join(out)
+
+    def _write_template(self, ops):
+        self._write(f'<defs><g id="static">\n{self._elements(ops)}\n</g></defs>\n')
+
+    def _write_page(self, ops):
+        background = _hex(self.background)
+        use = '<use xlink:href="#static"/>\n' if self._template is not None else ""
+        self._write(f'<g id="page-{self.page_count + 1}" transform="translate(0 {self.page_count * self.height})">\n'
+                    f'<rect width="{self.width}" height="{self.height}" fill="{background}"/>\n'
+                    f"{use}{self._elements(ops)}\n</g>\n")
+
+    def _end(self):
+        faces = []
+        for use in self.fonts.values():
+            data = base64.b64encode(use.subset()).decode("ascii")
+            faces.append(f'@font-face {{ font-family: {quoteattr(use.name)}; '
+                         f'src: url(data:font/ttf;base64,{data}) format("truetype"); }}')
+        self._write("<style>\n" + "\n".join(faces) + "\ntext { white-space: pre; }\n</style>\n</svg>\n")
+        self._file.seek(self._height_at)
+        self._file.write(str(max(self.page_count, 1) * self.height).ljust(self._HEIGHT_FIELD).encode("ascii"))
+
+
+def document_path(output_dir, document_id, format):
+    """第 document_id 个文档的路径（与 tar 分片一样按 shard_size 份切分）"""
+    return os.path.join(output_dir, f"reports-{document_id:06d}.{VECTOR_FORMATS[format]}")
+
+
+def remove_partial_documents(output_dir):
+    """删除崩溃的进程留下的临时文档"""
+    for format in VECTOR_FORMATS.values():
+        for path in glob.glob(os.path.join(output_dir, f"reports-*.{format}.*.tmp")):
+            os.remove(path)
+
+
+def open_document(path, width, height, format="pdf", dpi=DEFAULT_DPI, background="white"):
+    """按格式打开流式矢量文档（PdfDocument / SvgDocument）"""
+    if format not in VECTOR_FORMATS:
+        raise ValueError(f"未知的矢量格式: {format}，可选 {', '.join(VECTOR_FORMATS)}")
+    document = PdfDocument if format == "pdf" else SvgDocument
+    return document(path, width, height, dpi=dpi, background=background)
@@ -0,0 +1,368 @@
+"""基于共享文件系统的分布式生成（协调者 / 工作进程）
+
+集群之间只有共享文件系统、没有消息队列时，用租约文件分发序号区间：
+
+    <队列目录>/job.pkl            任务描述：生成器类、构造参数、区间列表、区间参数、租约时长
+    <队列目录>/leases/<起始>.lease 区间的租约（O_EXCL 创建，内容为持有者和第几次尝试）
+    <队列目录>/done/<起始>.json    区间完成记录：持有者、结果、写出统计
+    <队列目录>/failed/<起始>.json  区间多次失败后的错误信息
+    <队列目录>/manifest.json      全部完成后合并的输出清单
+
+工作进程从任意位置领取没有租约的区间（起点按工作进程编号错开，减少争抢），领完后去抢租约已过期的区间；
+持有租约期间后台线程定期刷新租约的修改时间，所以只有崩溃或失联的工作进程的租约会过期。
+抢占过期租约时先用 O_EXCL 拿到该区间的抢占锁，确认仍然过期后再原子替换租约，同一时刻只有一方成功。
+每份报告只由 (批次种子, 序号) 决定，同一区间被重做时写出的文件与第一次完全相同。
+分片、标注分片等整个文件先写临时文件再原子替换，租约被接手后原持有者仍在写也不会与接手者互相截断；
+原持有者写完后发现租约已不属于自己，就不写完成记录。
+
+协调者（generate_report(distributed=True)）写入任务、可选地启动本机工作进程，按序号顺序收集完成记录，
+最后合并输出清单。其他机器上的工作进程用：
+
+    python work_queue.py worker <输出目录>/_queue
+"""
+import argparse
+import contextlib
+import importlib
+import json
+import os
+import pickle
+import socket
+import subprocess
+import sys
+import threading
+import time
+import traceback
+import uuid
+import zlib
+
+from write_pipeline import PipelineStats
+
+QUEUE_DIRNAME = "_queue"
+JOB_FILENAME = "job.pkl"
+MANIFEST_FILENAME = "manifest.json"
+DEFAULT_LEASE_SECONDS = 60.0
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_POLL_SECONDS = 0.5
+
+
+def _write_atomic(path, data):
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _read_json(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _factory_module(factory):
+    """工作进程导入生成器类用的模块名（以脚本方式运行时 __module__ 为 __main__）"""
+    module = factory.__module__
+    if module == "__main__":
+        module = os.path.splitext(os.path.basename(sys.modules["__main__"].__file__))[0]
+    return module
+
+
+class WorkQueue:
+    """一个队列目录"""
+
+    def __init__(self, queue_dir):
+        self.queue_dir = queue_dir
+        self.lease_dir = os.path.join(queue_dir, "leases")
+        self.done_dir = os.path.join(queue_dir, "done")
+        self.failed_dir = os.path.join(queue_dir, "failed")
+
+    @property
+    def job_path(self):
+        return os.path.join(self.queue_dir, JOB_FILENAME)
+
+    def lease_path(self, start):
+        return os.path.join(self.lease_dir, f"{start:012d}.lease")
+
+    def done_path(self, start):
+        return os.path.join(self.done_dir, f"{start:012d}.json")
+
+    def failed_path(self, start):
+        return os.path.join(self.failed_dir, f"{start:012d}.json")
+
+    def create(self, job):
+        """写入新任务（清掉同一目录中上一个任务的租约和记录）"""
+        for directory in (self.lease_dir, self.done_dir, self.failed_dir):
+            os.makedirs(directory, exist_ok=True)
+            for name in os.listdir(directory):
+                os.remove(os.path.join(directory, name))
+        _write_atomic(self.job_path, pickle.dumps(job))
+
+    def load_job(self):
+        try:
+            with open(self.job_path, "rb") as f:
+                return pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+
+    def done_record(self, job_id, start):
+        record = _read_json(self.done_path(start))
+        return record if record is not None and record.get("job_id") == job_id else None
+
+    def failed_record(self, job_id, start):
+        record = _read_json(self.failed_path(start))
+        return record if record is not None and record.get("job_id") == job_id else None
+
+    def is_finished(self, job_id, start):
+        return self.done_record(job_id, start) is not None or self.failed_record(job_id, start) is not None
+
+    # 租约
+
+    def _read_lease(self, start):
+        return _read_json(self.lease_path(start))
+
+    def _lease_age(self, path):
+        return time.time() - os.stat(path).st_mtime
+
+    def try_claim(self, job, start, worker_id):
+        """尝试领取区间，成功时返回本次是第几次尝试，否则返回 None"""
+        path = self.lease_path(start)
+        lease = json.dumps({"job_id": job["job_id"], "worker": worker_id, "attempt": 1}).encode("utf-8")
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return self._try_steal(job, start, worker_id)
+        with os.fdopen(fd, "wb") as f:
+            f.write(lease)
+        return 1
+
+    def _try_steal(self, job, start, worker_id):
+        """租约过期（持有者崩溃或失联）时接手"""
+        path = self.lease_path(start)
+        try:
+            if self._lease_age(path) < job["lease_seconds"]:
+                return None
+        except FileNotFoundError:
+            return None
+        lock_path = path + ".steal"
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            # 抢占锁的持有者也可能崩溃了：锁同样按租约时长过期
+            try:
+                if self._lease_age(lock_path) >= job["lease_seconds"]:
+                    os.remove(lock_path)
+            except FileNotFoundError:
+                pass
+            return None
+        try:
+            os.close(fd)
+            try:
+                if self._lease_age(path) < job["lease_seconds"]:
+                    return None  # 拿到锁之前已被别人接手或刷新
+            except FileNotFoundError:
+                return None
+            previous = self._read_lease(start) or {}
+            attempt = previous.get("attempt", 1) + 1
+            _write_atomic(path, json.dumps({"job_id": job["job_id"], "worker": worker_id,
+                                            "attempt": attempt}).encode("utf-8"))
+            return attempt
+        finally:
+            # 锁过期时可能已被别的工作进程删掉
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(lock_path)
+
+    def owns(self, start, worker_id):
+        lease = self._read_lease(start)
+        return lease is not None and lease.get("worker") == worker_id
+
+    def renew(self, start, worker_id):
+        """刷新自己持有的租约"""
+        if self.owns(start, worker_id):
+            try:
+                os.utime(self.lease_path(start))
+            except FileNotFoundError:
+                pass
+
+    def release(self, start, worker_id):
+        if self.owns(start, worker_id):
+            try:
+                os.remove(self.lease_path(start))
+            except FileNotFoundError:
+                pass
+
+
+class _Heartbeat:
+    """持有租约期间定期刷新"""
+
+    def __init__(self, queue, start, worker_id, interval):
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(queue, start, worker_id, interval), daemon=True)
+
+    def _run(self, queue, start, worker_id, interval):
+        while not self._stop.wait(interval):
+            queue.renew(start, worker_id)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def new_worker_id():
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+
+def run_worker(queue_dir, worker_id=None, poll_seconds=DEFAULT_POLL_SECONDS, wait_for_job=False):
+    """工作进程主循环：领取区间并生成，直到任务的所有区间都完成，返回本进程完成的区间数
+
+    wait_for_job=True 时队列目录中还没有任务也一直等待。
+    """
+    queue = WorkQueue(queue_dir)
+    worker_id = worker_id or new_worker_id()
+    job = queue.load_job()
+    while job is None:
+        if not wait_for_job:
+            raise FileNotFoundError(f"队列目录中没有任务: {queue.job_path}")
+        time.sleep(poll_seconds)
+        job = queue.load_job()
+
+    module = importlib.import_module(job["module"])
+    generator = getattr(module, job["factory"])(**job["factory_kwargs"])
+    chunks = job["chunks"]
+    # 起点按工作进程编号错开，各进程先从不同位置领取
+    offset = zlib.crc32(worker_id.encode("utf-8")) % len(chunks) if chunks else 0
+    order = chunks[offset:] + chunks[:offset]
+    finished = set()
+    completed = 0
+    while len(finished) < len(order):
+        current = queue.load_job()
+        if current is None or current["job_id"] != job["job_id"]:
+            return completed  # 协调者已换了新任务
+        claimed = False
+        for start, stop in order:
+            if start in finished:
+                continue
+            if queue.is_finished(job["job_id"], start):
+                finished.add(start)
+                continue
+            attempt = queue.try_claim(job, start, worker_id)
+            if attempt is None:
+                continue
+            claimed = True
+            if queue.is_finished(job["job_id"], start):  # 领取前刚被别人完成
+                queue.release(start, worker_id)
+                finished.add(start)
+                continue
+            if attempt > job["max_attempts"]:
+                _write_atomic(queue.failed_path(start), json.dumps(
+                    {"job_id": job["job_id"], "start": start, "stop": stop, "worker": worker_id,
+                     "error": f"租约已过期 {attempt - 1} 次，放弃"}, ensure_ascii=False).encode("utf-8"))
+                queue.release(start, worker_id)
+                finished.add(start)
+                continue
+            try:
+                with _Heartbeat(queue, start, worker_id, job["lease_seconds"] / 4):
+                    result, stats = getattr(generator, job["method"])(start, stop, **job["task_kwargs"])
+            except Exception:
+                _write_atomic(queue.failed_path(start), json.dumps(
+                    {"job_id": job["job_id"], "start": start, "stop": stop, "worker": worker_id,
+                     "error": traceback.format_exc()}, ensure_ascii=False).encode("utf-8"))
+                queue.release(start, worker_id)
+                raise
+            if not queue.owns(start, worker_id):
+                # 租约在生成期间过期并被接手：输出文件内容相同且原子替换，完成记录留给接手者写。
+                # 区间只有出现完成 / 失败记录才算结束，接手者也崩溃时租约再次过期，由这里重新领取
+                print(f"区间 [{start}, {stop}) 的租约已被其他工作进程接手，不写完成记录", file=sys.stderr)
+                continue
+            _write_atomic(queue.done_path(start), json.dumps(
+                {"job_id": job["job_id"], "start": start, "stop": stop, "worker": worker_id, "attempt": attempt,
+                 "result": list(result), "stats": stats.to_state()}, ensure_ascii=False).encode("utf-8"))
+            queue.release(start, worker_id)
+            finished.add(start)
+            completed += 1
+        if not claimed and len(finished) < len(order):
+            # 其余区间都在别人手里：等它们完成或租约过期
+            time.sleep(poll_seconds)
+    return completed
+
+
+def _launch_local_workers(queue_dir, count):
+    script = os.path.abspath(__file__)
+    return [subprocess.Popen([sys.executable, script, "worker", queue_dir]) for _ in range(count)]
+
+
+def run_queue(generator, factory, factory_kwargs, method, total, workers=1, chunk_size=64, task_kwargs=None,
+              with_stats=False, chunks=None, on_chunk=None, queue_dir=None, lease_seconds=DEFAULT_LEASE_SECONDS,
+              max_attempts=DEFAULT_MAX_ATTEMPTS, poll_seconds=DEFAULT_POLL_SECONDS):
+    """协调者：与 batch_runner.run_chunks 参数和返回值相同，区间改由队列目录中的工作进程执行
+
+    workers 为在本机启动的工作进程数（0 表示只等待其他机器上的工作进程）。
+    全部完成后把各区间的完成记录合并为 <queue_dir>/manifest.json。
+    """
+    from batch_runner import chunk_ranges
+
+    task_kwargs = task_kwargs or {}
+    chunks = list(chunk_ranges(0, total, chunk_size)) if chunks is None else list(chunks)
+    queue = WorkQueue(queue_dir)
+    job_id = uuid.uuid4().hex
+    queue.create({"job_id": job_id, "module": _factory_module(factory), "factory": factory.__name__,
+                  "factory_kwargs": factory_kwargs, "method": method, "chunks": chunks,
+                  "task_kwargs": task_kwargs, "lease_seconds": lease_seconds, "max_attempts": max_attempts})
+    processes = _launch_local_workers(queue_dir, workers)
+
+    results = []
+    stats = None
+    entries = []
+    try:
+        for start, stop in chunks:
+            while True:
+                record = queue.done_record(job_id, start)
+                if record is not None:
+                    break
+                failed = queue.failed_record(job_id, start)
+                if failed is not None:
+                    raise RuntimeError(f"区间 [{start}, {stop}) 生成失败（{failed['worker']}）:\n{failed['error']}")
+                if processes and all(process.poll() is not None for process in processes):
+                    raise RuntimeError(f"本机工作进程已全部退出，区间 [{start}, {stop}) 仍未完成")
+                time.sleep(poll_seconds)
+            chunk_stats = PipelineStats.from_state(record["stats"])
+            stats = chunk_stats if stats is None else stats.merge(chunk_stats)
+            if on_chunk is not None:
+                on_chunk(start, stop, record["result"])
+            results.extend(record["result"])
+            entries.append({key: record[key] for key in ("start", "stop", "worker", "attempt", "result")})
+    finally:
+        unfinished = len(entries) < len(chunks)
+        for process in processes:
+            if unfinished and process.poll() is None:
+                process.terminate()
+            process.wait()
+
+    workers_summary = {}
+    for entry in entries:
+        workers_summary[entry["worker"]] = workers_summary.get(entry["worker"], 0) + 1
+    manifest = {"job_id": job_id, "chunks": entries, "workers": workers_summary,
+                "stats": (stats or PipelineStats()).as_dict()}
+    _write_atomic(os.path.join(queue_dir, MANIFEST_FILENAME),
+                  json.dumps(manifest, ensure_ascii=False, indent=2).encode("utf-8"))
+    return (results, stats) if with_stats else results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="分布式生成的工作进程")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    worker = subparsers.add_parser("worker", help="领取并执行队列目录中的区间")
+    worker.add_argument("queue_dir", help="协调者的队列目录（<输出目录>/_queue）")
+    worker.add_argument("--id", help="工作进程编号（默认 主机名-进程号-随机串）")
+    worker.add_argument("--wait", action="store_true", help="队列中还没有任务时等待")
+    args = parser.parse_args(argv)
+    completed = run_worker(args.queue_dir, worker_id=args.id, wait_for_job=args.wait)
+    print(f"工作进程结束，完成 {completed} 个区间")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+"""渲染与写盘解耦的写出流水线
+
+原来的循环每画完一份报告就同步调用 image.save：编码和写盘时 CPU 空闲，渲染时磁盘空闲。
+WritePipeline 是一个生产者/消费者流水线：渲染线程把图片放进有界队列，后台写线程池负责编码和写文件
+（不做 fsync）。队列满时 submit 会阻塞，从而限制内存中待写图片的数量（背压）。
+Pillow 的编码和文件写入会释放 GIL，所以写线程与渲染可以真正重叠。
+
+writers=0 时退化为同步写出，行为与原来相同，同样会记录统计。
+"""
+import queue
+import threading
+import time
+
+from stage_timer import StageTimer
+
+DEFAULT_WRITERS = 2
+DEFAULT_MAX_PENDING = 8
+
+_STOP = object()
+
+
+class PipelineStats:
+    """写出统计，可跨区间/进程合并"""
+
+    def __init__(self):
+        self.reports = 0
+        self.bytes = 0
+        self.encode_seconds = 0.0
+        self.write_seconds = 0.0
+        self.wait_seconds = 0.0     # 生产者因队列已满而阻塞的时间
+        self.max_depth = 0
+        self.depth_sum = 0
+        self.depth_samples = 0
+        self.stages = None          # 启用分阶段计时时为 stage_timer.StageTimer
+        self.peak_rss = None        # 各进程峰值常驻内存的最大值（字节）
+
+    def merge(self, other):
+        self.reports += other.reports
+        self.bytes += other.bytes
+        self.encode_seconds += other.encode_seconds
+        self.write_seconds += other.write_seconds
+        self.wait_seconds += other.wait_seconds
+        self.max_depth = max(self.max_depth, other.max_depth)
+        self.depth_sum += other.depth_sum
+        self.depth_samples += other.depth_samples
+        if other.stages is not None:
+            self.stages = other.stages if self.stages is None else self.stages.merge(other.stages)
+        if other.peak_rss is not None:
+            self.peak_rss = max(self.peak_rss or 0, other.peak_rss)
+        return self
+
+    def to_state(self):
+        """完整状态（可 JSON 序列化），跨机器传递后用 from_state 还原再合并"""
+        state = {key: value for key, value in vars(self).items() if key != "stages"}
+        state["stages"] = dict(vars(self.stages)) if self.stages is not None else None
+        return state
+
+    @classmethod
+    def from_state(cls, state):
+        stats = cls()
+        for key, value in state.items():
+            if key != "stages":
+                setattr(stats, key, value)
+        if state.get("stages") is not None:
+            stats.stages = StageTimer()
+            vars(stats.stages).update(state["stages"])
+        return stats
+
+    @property
+    def mean_depth(self):
+        return self.depth_sum / self.depth_samples if self.depth_samples else 0.0
+
+    def as_dict(self):
+        result = {"reports": self.reports, "bytes": self.bytes,
+                  "encode_seconds": round(self.encode_seconds, 3),
+                  "write_seconds": round(self.write_seconds, 3),
+                  "wait_seconds": round(self.wait_seconds, 3),
+                  "mean_queue_depth": round(self.mean_depth, 2), "max_queue_depth": self.max_depth,
+                  "peak_rss": self.peak_rss}
+        if self.stages is not None:
+            result["profile"] = self.stages.as_dict()
+        return result
+
+    def summary(self, elapsed):
+        """单行汇总，elapsed 为整批的墙钟时间（秒）"""
+        rate = self.reports / elapsed if elapsed > 0 else 0.0
+        text = (f"写出统计: {self.reports} 份, {rate:.1f} 份/秒, {self.bytes / 1e6:.1f} MB, "
+                f"编码 {self.encode_seconds:.2f}s, 写盘 {self.write_seconds:.2f}s, "
+                f"队列深度 平均 {self.mean_depth:.1f} / 最大 {self.max_depth}, "
+                f"背压等待 {self.wait_seconds:.2f}s")
+        if self.peak_rss:
+            text += f", 单进程峰值内存 {self.peak_rss / 2 ** 20:.0f} MB"
+        return text
+
+
+def _write_file(path, data):
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+class WritePipeline:
+    """有界队列 + 写线程池
+
+    encoder:     encoders.ImageEncoder
+    writers:     写线程数，0 为同步写出
+    max_pending: 队列中最多等待的图片数；内存中的图片约为 max_pending + writers 张
+
+    submit(image, target) 的 target 为文件路径，或接收编码后字节串的可调用对象
+    （如写入 tar 分片；需要保持顺序时用 writers=1）。
+    release(image) 在图片编码完成后调用（如把画布还给 canvas_pool.CanvasPool）。
+    """
+
+    def __init__(self, encoder, writers=DEFAULT_WRITERS, max_pending=DEFAULT_MAX_PENDING, release=None):
+        if writers < 0:
+            raise ValueError(f"写线程数不能为负: {writers}")
+        if max_pending < 1:
+            raise ValueError(f"队列长度至少为 1: {max_pending}")
+        self.encoder = encoder
+        self.release = release
+        self.stats = PipelineStats()
+        self._lock = threading.Lock()
+        self._error = None
+        self._closed = False
+        self._queue = queue.Queue(maxsize=max_pending) if writers else None
+        self._threads = [threading.Thread(target=self._worker, name=f"report-writer-{i}", daemon=True)
+                         for i in range(writers)]
+        for thread in self._threads:
+            thread.start()
+
+    def _process(self, image, target):
+        t0 = time.perf_counter()
+        try:
+            data = self.encoder.encode(image)
+        finally:
+            # 编码失败也要归还画布，否则画布池会被耗尽
+            if self.release is not None:
+                self.release(image)
+        t1 = time.perf_counter()
+        if callable(target):
+            target(data)
+        else:
+            _write_file(target, data)
+        t2 = time.perf_counter()
+        with self._lock:
+            self.stats.reports += 1
+            self.stats.bytes += len(data)
+            self.stats.encode_seconds += t1 - t0
+            self.stats.write_seconds += t2 - t1
+
+    def _worker(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is _STOP:
+                    return
+                if self._error is None:  # 出错后只排空队列，不再写
+                    self._process(*item)
+                elif self.release is not None:
+                    self.release(item[0])
+            except BaseException as e:
+                with self._lock:
+                    if self._error is None:
+                        self._error = e
+            finally:
+                self._queue.task_done()
+
+    def _raise_error(self):
+        if self._error is not None:
+            raise self._error
+
+    def submit(self, image, target):
+        """提交一张图片；队列已满时阻塞，写线程出错时在这里抛出"""
+        if self._closed:
+            raise RuntimeError("写出流水线已关闭")
+        self._raise_error()
+        if self._queue is None:
+            self._process(image, target)
+            return
+        depth = self._queue.qsize()
+        self.stats.max_depth = max(self.stats.max_depth, depth)
+        self.stats.depth_sum += depth
+        self.stats.depth_samples += 1
+        t0 = time.perf_counter()
+        self._queue.put((image, target))
+        self.stats.wait_seconds += time.perf_counter() - t0
+
+    def close(self, raise_error=True):
+        """等待队列写完并停止写线程，返回统计；可重复调用
+
+        写线程出错时默认在这里抛出。调用方自己正在处理异常时传 raise_error=False，
+        避免写线程的错误覆盖原来的异常。
+        """
+        if not self._closed:
+            self._closed = True
+            for _ in self._threads:
+                self._queue.put(_STOP)
+            for thread in self._threads:
+                thread.join()
+        if raise_error:
+            self._raise_error()
+        return self.stats
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.close(raise_error=exc_type is None)